@@ -0,0 +1,187 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import *
+
+from elf import ElfFile
+from elfgen import generate_corpus
+from reloc import join_reltabs
+from symtab import read_symtab
+
+'''
+读取器各阶段的性能测试
+
+在生成的文件上分别测量每个阶段的耗时（多次运行取最小值）和峰值内存（tracemalloc），
+每个阶段依赖的前置阶段不计入测量
+
+python src/bench.py
+python src/bench.py --sizes 1000,100000 --json > base.json
+python src/bench.py --sizes 1000,100000 --baseline base.json
+'''
+
+
+def read_names(elf: ElfFile):
+    symtab = read_symtab(elf)
+    return symtab.names if symtab is not None else []
+
+
+def read_needed(elf: ElfFile):
+    # 通过 DT_STRTAB 找到 .dynstr，取出所有 DT_NEEDED
+    return elf.dyns.needed if elf.dyns else []
+
+
+# 阶段名, 前置阶段, 测量的函数
+STAGES = [
+    ('header', (), ElfFile.read_header),
+    ('shdrs', ('header', ), ElfFile.read_shdrs),
+    ('symbols', ('header', 'shdrs'), ElfFile.read_symbols),
+    ('symtab', ('header', 'shdrs'), read_names),
+    ('relocations', ('header', 'shdrs'), ElfFile.read_rel),
+    ('reltabs', ('header', 'shdrs'), join_reltabs),
+    ('phdrs', ('header', ), ElfFile.read_phdrs),
+    ('dyns', ('header', 'phdrs'), ElfFile.read_dyns),
+    ('needed', ('header', 'phdrs', 'dyns'), read_needed),
+    ('got', ('header', 'shdrs'), ElfFile.read_got),
+]
+
+FUNCTIONS = {name: function for name, _, function in STAGES}
+
+
+def prepare(elf: ElfFile, requires: Iterable[str]):
+    for name in requires:
+        FUNCTIONS[name](elf)
+
+
+def measure_time(filename, requires, function, repeat=5) -> float:
+    best = None
+    for _ in range(repeat):
+        with ElfFile(filename) as elf:
+            prepare(elf, requires)
+            start = time.perf_counter()
+            result = function(elf)
+            elapsed = time.perf_counter() - start
+            del result
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def measure_memory(filename, requires, function) -> int:
+    with ElfFile(filename) as elf:
+        prepare(elf, requires)
+        tracemalloc.start()
+        try:
+            result = function(elf)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del result
+    return peak
+
+
+def run(filenames: Iterable[str], stages: Iterable[str] = None, repeat=5) -> Iterator[dict]:
+    for filename in filenames:
+        for name, requires, function in STAGES:
+            if stages and name not in stages:
+                continue
+            yield {
+                'file': os.path.basename(filename),
+                'stage': name,
+                'time': measure_time(filename, requires, function, repeat),
+                'peak': measure_memory(filename, requires, function),
+            }
+
+
+def load_baseline(filename) -> Dict[Tuple[str, str], dict]:
+    baseline = {}
+    with open(filename) as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            result = json.loads(line)
+            baseline[(result['file'], result['stage'])] = result
+    return baseline
+
+
+def format_change(value, base) -> str:
+    if not base:
+        return ''
+    return f'{(value - base) / base * 100:+.1f}%'
+
+
+def report(results: Iterable[dict], baseline: dict = None, file=sys.stdout):
+    columns = ['file', 'stage', 'time(ms)', 'peak(KiB)']
+    if baseline is not None:
+        columns.extend(['time', 'peak'])
+    file.write(f'{columns[0]:<28}{columns[1]:<14}' + ''.join(f'{column:>12}' for column in columns[2:]) + '\n')
+
+    for result in results:
+        line = f"{result['file']:<28}{result['stage']:<14}{result['time'] * 1000:>12.3f}{result['peak'] / 1024:>12.1f}"
+        if baseline is not None:
+            base = baseline.get((result['file'], result['stage']))
+            if base is None:
+                line += f"{'':>12}{'':>12}"
+            else:
+                line += f"{format_change(result['time'], base['time']):>12}"
+                line += f"{format_change(result['peak'], base['peak']):>12}"
+        file.write(line + '\n')
+        file.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='benchmark each stage of the elf reader')
+    parser.add_argument('files', nargs='*', help='elf files to measure, default is a generated corpus')
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='comma separated symbol counts of the generated corpus')
+    parser.add_argument('--classes', default='32,64', help='comma separated elf classes of the generated corpus')
+    parser.add_argument('--byteorder', default='little', choices=('little', 'big'))
+    parser.add_argument('--corpus', help='directory to keep the generated corpus, default is a temporary one')
+    parser.add_argument('-s', '--stage', action='append', default=[],
+                        choices=[name for name, _, _ in STAGES], help='stages to measure, default is all')
+    parser.add_argument('-n', '--repeat', type=int, default=5, help='runs per stage, the fastest is reported')
+    parser.add_argument('--json', action='store_true', help='print json lines instead of a table')
+    parser.add_argument('--baseline', help='json lines from an earlier run to compare with')
+    args = parser.parse_args(argv)
+
+    temp = None
+    filenames = args.files
+    if not filenames:
+        directory = args.corpus
+        if directory is None:
+            temp = tempfile.TemporaryDirectory()
+            directory = temp.name
+        filenames = generate_corpus(
+            directory,
+            [int(size) for size in args.sizes.split(',')],
+            [int(bits) for bits in args.classes.split(',')],
+            args.byteorder)
+
+    try:
+        results = run(filenames, args.stage, args.repeat)
+        if args.json:
+            for result in results:
+                sys.stdout.write(json.dumps(result) + '\n')
+                sys.stdout.flush()
+        else:
+            baseline = load_baseline(args.baseline) if args.baseline else None
+            report(results, baseline)
+    finally:
+        if temp is not None:
+            temp.cleanup()
+
+
+if __name__ == '__main__':
+    main()
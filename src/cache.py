@@ -0,0 +1,343 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+from array import array
+from typing import *
+
+from elf import ElfFile, Elf32_Shdr, Elf32_Dyn, DynamicTable
+from strtab import StringTable
+from symtab import read_symtab
+
+'''
+解析结果的磁盘缓存
+
+以 路径 + 大小 + 修改时间（可选再加内容摘要）为键，
+每个文件的节表、符号表各列和动态段保存为一个缓存文件：
+
+    magic | 元数据长度 | JSON 元数据 | 按 8 字节对齐的各列原始数据
+
+读取时直接 mmap 缓存文件，各列以 memoryview 的形式给出，不做拷贝
+'''
+
+MAGIC = b'ELFC\x01\0\0\0'
+HEADER = struct.Struct('<8sQ')
+SUFFIX = '.elfc'
+
+
+def align(value, alignment=8):
+    return (value + alignment - 1) // alignment * alignment
+
+
+class CachedElf(object):
+
+    '''
+    从缓存文件中加载的解析结果
+
+    tables 为 表名 -> 列名 -> memoryview，表名有 sections, symtab, dynsym, dynamic，
+    blobs 为字符串表的原始数据，可以用 get_strtab 取得对应的 StringTable
+    '''
+
+    def __init__(self, filename):
+        self.file = open(filename, 'rb')
+        self.map = None
+        self.view = None
+        self.tables = {}
+        self.strtabs = {}
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self.map)
+            self.load(filename)
+        except BaseException:
+            self.close()
+            raise
+
+    def load(self, filename):
+        magic, size = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{filename} is not an elf cache file')
+        if HEADER.size + size > len(self.map):
+            raise ValueError(f'{filename} is truncated')
+        self.meta = json.loads(bytes(self.view[HEADER.size:HEADER.size + size]))
+
+        for name, table in self.meta['tables'].items():
+            columns = self.tables[name] = {}
+            for column, (typecode, offset, count) in table.items():
+                end = offset + count * array(typecode).itemsize
+                if end > len(self.map):
+                    raise ValueError(f'{filename} is truncated')
+                columns[column] = self.view[offset:end].cast(typecode)
+        for name, (offset, size) in self.meta['blobs'].items():
+            if offset + size > len(self.map):
+                raise ValueError(f'{filename} is truncated')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        for table in self.tables.values():
+            for column in table.values():
+                column.release()
+        self.tables = {}
+        self.strtabs = {}
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def get_strtab(self, name) -> Optional[StringTable]:
+        if name not in self.meta['blobs']:
+            return None
+        if name not in self.strtabs:
+            offset, size = self.meta['blobs'][name]
+            self.strtabs[name] = StringTable(self.map, offset, size)
+        return self.strtabs[name]
+
+    @property
+    def section_names(self) -> List[str]:
+        strtab = self.get_strtab('shstrtab')
+        if strtab is None:
+            return []
+        return list(map(strtab.get, self.tables['sections']['sh_name']))
+
+    def symbol_names(self, table='symtab') -> List[str]:
+        strtab = self.get_strtab(table)
+        if strtab is None:
+            return []
+        return list(map(strtab.get, self.tables[table]['st_name']))
+
+    @property
+    def needed(self) -> List[str]:
+        dynamic = self.tables.get('dynamic')
+        strtab = self.get_strtab('dynamic')
+        if dynamic is None or strtab is None:
+            return []
+        return [
+            strtab.get(val)
+            for tag, val in zip(dynamic['d_tag'], dynamic['d_val'])
+            if tag == Elf32_Dyn.DT.DT_NEEDED
+        ]
+
+
+class CacheWriter(object):
+
+    '''
+    先算出布局，再把所有列写入一个预先分配好的 bytearray
+    '''
+
+    def __init__(self):
+        self.tables = {}
+        self.blobs = {}
+
+    def add_table(self, name, columns: Dict[str, array]):
+        self.tables[name] = columns
+
+    def add_blob(self, name, data):
+        self.blobs[name] = data
+
+    def build(self, meta: dict) -> bytearray:
+        # 元数据中的偏移依赖元数据本身的长度，反复计算直到长度不再变化
+        items = []
+        for name, columns in self.tables.items():
+            for column, data in columns.items():
+                items.append((name, column, data))
+
+        layout = {'tables': {}, 'blobs': {}}
+        start = 0
+        while True:
+            offset = align(HEADER.size + start)
+            for name, column, data in items:
+                layout['tables'].setdefault(name, {})[column] = [
+                    data.typecode, offset, len(data)]
+                offset = align(offset + len(data) * data.itemsize)
+            for name, data in self.blobs.items():
+                layout['blobs'][name] = [offset, len(data)]
+                offset = align(offset + len(data))
+            meta.update(layout)
+            encoded = json.dumps(meta).encode('utf8')
+            if len(encoded) == start:
+                break
+            start = len(encoded)
+
+        buf = bytearray(offset)
+        HEADER.pack_into(buf, 0, MAGIC, len(encoded))
+        buf[HEADER.size:HEADER.size + len(encoded)] = encoded
+        for name, column, data in items:
+            position = layout['tables'][name][column][1]
+            buf[position:position + len(data) * data.itemsize] = data.tobytes()
+        for name, data in self.blobs.items():
+            position = layout['blobs'][name][0]
+            buf[position:position + len(data)] = data
+        return buf
+
+
+class ElfCache(object):
+
+    '''
+    ELF 解析结果的磁盘缓存，总大小超过 limit 时删除最久未使用的条目，直到低于 limit 的 LOW_WATER；
+    总大小只在第一次写入和淘汰时扫描目录统计，其余时候按写入的大小累加
+    '''
+
+    LOW_WATER = 0.75
+
+    def __init__(self, directory=None, limit=256 * 1024 * 1024, digest=False):
+        if directory is None:
+            base = os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+            directory = os.path.join(base, 'compiler-elf')
+        self.directory = directory
+        self.limit = limit
+        self.digest = digest
+        self.size = None
+        os.makedirs(directory, exist_ok=True)
+
+    def get_key(self, filename) -> str:
+        filename = os.path.abspath(filename)
+        stat = os.stat(filename)
+        key = f'{filename}\0{stat.st_size}\0{stat.st_mtime_ns}'
+        if self.digest:
+            digest = hashlib.sha256()
+            with open(filename, 'rb') as file:
+                for chunk in iter(lambda: file.read(1 << 20), b''):
+                    digest.update(chunk)
+            key += '\0' + digest.hexdigest()
+        return key
+
+    def get_path(self, key) -> str:
+        name = hashlib.sha1(key.encode('utf8')).hexdigest()
+        return os.path.join(self.directory, name + SUFFIX)
+
+    def get(self, filename) -> Optional[CachedElf]:
+        key = self.get_key(filename)
+        path = self.get_path(key)
+        try:
+            cached = CachedElf(path)
+        except (OSError, ValueError, KeyError, TypeError, struct.error):
+            return None
+        if cached.meta.get('key') != key:
+            cached.close()
+            return None
+        # 修改时间作为最近使用时间，淘汰时使用；其它进程可能刚好把它删掉了，当作没有命中
+        try:
+            os.utime(path)
+        except OSError:
+            cached.close()
+            return None
+        return cached
+
+    def put(self, filename) -> CachedElf:
+        key = self.get_key(filename)
+        path = self.get_path(key)
+
+        writer = CacheWriter()
+        with ElfFile(filename) as elf:
+            elf.read_header()
+            elf.read_shdrs()
+            meta = {
+                'key': key,
+                'class': elf.layout.bits,
+                'byteorder': elf.layout.byteorder,
+                'type': elf.header.e_type,
+                'machine': elf.header.e_machine,
+            }
+            self.add_elf(writer, elf)
+            buf = writer.build(meta)
+
+        if self.size is None:
+            self.size = self.scan()[0]
+        try:
+            self.size -= os.stat(path).st_size
+        except OSError:
+            pass
+
+        temp = f'{path}.{os.getpid()}.tmp'
+        with open(temp, 'wb') as file:
+            file.write(buf)
+        os.replace(temp, path)
+
+        self.size += len(buf)
+        if self.size > self.limit:
+            self.evict(keep=path)
+        return CachedElf(path)
+
+    def add_elf(self, writer: CacheWriter, elf: ElfFile):
+        shdrs = elf.shdrs
+        if shdrs:
+            writer.add_table('sections', shdrs.columns)
+            writer.add_blob('shstrtab', shdrs[elf.header.e_shstrndx].data or b'')
+
+        for name, sh_type in (
+            ('symtab', Elf32_Shdr.SHT.SHT_SYMTAB),
+            ('dynsym', Elf32_Shdr.SHT.SHT_DYNSYM),
+        ):
+            symtab = read_symtab(elf, sh_type)
+            if symtab is None:
+                continue
+            writer.add_table(name, {
+                'st_name': symtab.st_name,
+                'st_value': symtab.st_value,
+                'st_size': symtab.st_size,
+                'st_info': symtab.st_info,
+                'st_other': symtab.st_other,
+                'st_shndx': symtab.st_shndx,
+            })
+            writer.add_blob(name, shdrs[symtab.shdr.sh_link].data or b'')
+
+        for shdr in shdrs:
+            if shdr.sh_type != Elf32_Shdr.SHT.SHT_DYNAMIC:
+                continue
+            writer.add_table('dynamic', DynamicTable(elf, shdr.data, shdr.sh_entsize).columns)
+            writer.add_blob('dynamic', shdrs[shdr.sh_link].data or b'')
+            break
+
+    def load(self, filename) -> CachedElf:
+        cached = self.get(filename)
+        if cached is None:
+            cached = self.put(filename)
+        return cached
+
+    def scan(self, keep=None) -> Tuple[int, List[Tuple[float, int, str]]]:
+        '''
+        返回 (总大小, 除 keep 以外的 (修改时间, 大小, 路径))
+        '''
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            total += stat.st_size
+            if entry.path != keep:
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return total, entries
+
+    def evict(self, keep=None):
+        total, entries = self.scan(keep)
+        target = self.limit * self.LOW_WATER
+        entries.sort()
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self.size = total
@@ -0,0 +1,171 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import sys
+from array import array
+
+'''
+表格型数据（符号表、重定位表等）的批量解码
+
+一次性把整张表按字段拆成 array 列，不为每个表项创建对象
+'''
+
+# 字段大小 -> array 类型码
+TYPECODES = {
+    1: 'B',
+    2: 'H',
+    4: 'I',
+    8: 'Q',
+}
+
+
+def decode_column(data: memoryview, entsize, offset, size, byteorder='little', signed=False) -> array:
+    count = len(data) // entsize
+    data = data[:count * entsize]
+
+    # 不足 2 的幂的字段（如 r_info 中 24 位的符号索引）按更宽的类型存放，高位补零
+    itemsize = min(width for width in TYPECODES if width >= size)
+    if byteorder == 'little':
+        start = 0
+    else:
+        start = itemsize - size
+
+    # 逐字节跨步拷贝，字段在表项中无需对齐
+    buf = bytearray(count * itemsize)
+    for index in range(size):
+        buf[start + index::itemsize] = data[offset + index::entsize]
+
+    typecode = TYPECODES[itemsize]
+    if signed:
+        typecode = typecode.lower()
+    column = array(typecode)
+    column.frombytes(buf)
+    if byteorder != sys.byteorder:
+        column.byteswap()
+    return column
+
+
+def decode_columns(data, entsize, layout, byteorder='little', signed=()) -> dict:
+    '''
+    layout 为 (name, offset, size) 的列表，signed 中的字段按有符号数解码
+    '''
+    if data is None:
+        data = memoryview(b'')
+    data = memoryview(data).cast('B')
+
+    columns = {}
+    for name, offset, size in layout:
+        columns[name] = decode_column(
+            data, entsize, offset, size, byteorder, name in signed)
+    return columns
+
+
+def struct_layout(cls) -> list:
+    # 直接使用 ctypes 结构体中的字段偏移和大小，包括从父类继承的字段
+    names = []
+    for klass in reversed(cls.__mro__):
+        names.extend(name for name, _ in vars(klass).get('_fields_', []))
+    return [
+        (name, getattr(cls, name).offset, getattr(cls, name).size)
+        for name in names
+    ]
+
+
+def encode_column(data: memoryview, entsize, offset, size, column: array, byteorder='little'):
+    '''
+    decode_column 的逆操作，把一列写回到表中对应的字段
+    '''
+    if byteorder != sys.byteorder:
+        column = array(column.typecode, column)
+        column.byteswap()
+    itemsize = column.itemsize
+    raw = memoryview(column).cast('B')
+
+    if byteorder == 'little':
+        start = 0
+    else:
+        start = itemsize - size
+    for index in range(size):
+        data[offset + index::entsize] = raw[start + index::itemsize]
+
+
+def encode_columns(data, entsize, layout, columns: dict, byteorder='little'):
+    '''
+    把 columns 中的各列按 layout 写入 data，data 的长度应为 表项数 * entsize
+    '''
+    data = memoryview(data).cast('B')
+    for name, offset, size in layout:
+        if name in columns:
+            encode_column(data, entsize, offset, size, columns[name], byteorder)
+
+
+class Record(object):
+
+    '''
+    表中的一行，只保存所在的表和行号，字段在访问时从列中取出；
+    子类由 ColumnTable 按列名生成对应的属性
+    '''
+
+    __slots__ = ('table', 'index')
+
+    FIELDS = ()
+
+    def __init__(self, table: 'ColumnTable', index):
+        self.table = table
+        self.index = index
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in cls.FIELDS:
+            if name not in vars(cls):
+                setattr(cls, name, column_property(name))
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.table is other.table and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.table), self.index))
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)}' for name in self.FIELDS)
+        return f'{type(self).__name__}({fields})'
+
+
+def column_property(name):
+    def getter(self):
+        return self.table.columns[name][self.index]
+    return property(getter)
+
+
+class ColumnTable(object):
+
+    '''
+    列式存储的结构体表，columns 为 列名 -> array，
+    RECORD 为行的类型，行只在访问时创建，不常驻内存
+    '''
+
+    RECORD = Record
+
+    def __init__(self, columns: dict):
+        self.columns = columns
+        self.count = len(next(iter(columns.values()))) if columns else 0
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(f'{type(self).__name__} index out of range')
+        return self.RECORD(self, index)
+
+    def __iter__(self):
+        record = self.RECORD
+        for index in range(self.count):
+            yield record(self, index)
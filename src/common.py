@@ -10,3 +10,6 @@ u8 = ctypes.c_uint8
 u16 = ctypes.c_uint16
 u32 = ctypes.c_uint32
 u64 = ctypes.c_uint64
+
+i32 = ctypes.c_int32
+i64 = ctypes.c_int64
@@ -0,0 +1,186 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import zlib
+from collections import OrderedDict
+from ctypes import sizeof
+from typing import *
+
+from elf import ElfFile, Elf32_Chdr, Elf32_Shdr, Section
+
+'''
+压缩节的按需解压
+
+SHF_COMPRESSED 的节以 Chdr 开头，随后是压缩的数据；
+旧的 GNU 格式 .zdebug_* 以 'ZLIB' 和 8 字节大端的原始大小开头。
+只在访问 contents 时解压，结果放在 ElfFile 上按大小限制的 LRU 缓存中；
+iter_contents 按块流式解压，不保留完整的结果。
+zstd 需要可选的 zstandard 包，只在遇到时导入
+'''
+
+ZDEBUG_PREFIX = '.zdebug'
+ZDEBUG_MAGIC = b'ZLIB'
+ZDEBUG_HEADER = 12
+
+CHUNK_SIZE = 64 * 1024
+
+ZLIB = Elf32_Chdr.ELFCOMPRESS.ELFCOMPRESS_ZLIB
+ZSTD = Elf32_Chdr.ELFCOMPRESS.ELFCOMPRESS_ZSTD
+
+
+class DecompressCache(object):
+
+    '''
+    解压结果的 LRU 缓存，总大小超过 limit 时丢弃最久未使用的项，
+    单个超过 limit 的结果不缓存
+    '''
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.size = 0
+        self.items = OrderedDict()
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, key) -> Optional[bytes]:
+        data = self.items.get(key)
+        if data is not None:
+            self.items.move_to_end(key)
+        return data
+
+    def put(self, key, data: bytes):
+        old = self.items.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        if len(data) > self.limit:
+            return
+        self.items[key] = data
+        self.size += len(data)
+        while self.size > self.limit:
+            _, old = self.items.popitem(last=False)
+            self.size -= len(old)
+
+    def clear(self):
+        self.items.clear()
+        self.size = 0
+
+
+def get_cache(elf: ElfFile) -> DecompressCache:
+    if elf.decompressed is None:
+        elf.decompressed = DecompressCache(elf.DECOMPRESS_LIMIT)
+    return elf.decompressed
+
+
+def get_compression(section: Section) -> Optional[Tuple[int, int, int]]:
+    '''
+    返回 (压缩格式, 解压后的大小, 压缩数据在节内的偏移)，没有压缩时返回 None
+    '''
+    if section.sh_type == Elf32_Shdr.SHT.SHT_NOBITS:
+        return None
+
+    elf = section.elf
+    if section.sh_flags & Elf32_Shdr.SHF.SHF_COMPRESSED:
+        cls = elf.layout.Chdr
+        if section.sh_size < sizeof(cls):
+            raise ValueError(f'compressed section {section.name} is truncated')
+        chdr = elf.read_struct(cls, section.sh_offset)
+        return chdr.ch_type, chdr.ch_size, sizeof(cls)
+
+    if section.sh_size >= ZDEBUG_HEADER and section.name.startswith(ZDEBUG_PREFIX):
+        header = elf.get_data(section.sh_offset, ZDEBUG_HEADER)
+        if header[:4] == ZDEBUG_MAGIC:
+            return ZLIB, int.from_bytes(header[4:], 'big'), ZDEBUG_HEADER
+    return None
+
+
+def iter_zlib(data: memoryview, chunk_size) -> Iterator[bytes]:
+    decompressor = zlib.decompressobj()
+    for start in range(0, len(data), chunk_size):
+        buffer = data[start:start + chunk_size]
+        # max_length 限制每次输出的大小，剩余的输入留在 unconsumed_tail 中
+        while buffer:
+            chunk = decompressor.decompress(buffer, chunk_size)
+            if chunk:
+                yield chunk
+            buffer = decompressor.unconsumed_tail
+        if decompressor.eof:
+            break
+    chunk = decompressor.flush()
+    if chunk:
+        yield chunk
+
+
+def iter_zstd(data: memoryview, chunk_size) -> Iterator[bytes]:
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError('zstd compressed sections require the zstandard package')
+
+    decompressor = zstandard.ZstdDecompressor().decompressobj()
+    for start in range(0, len(data), chunk_size):
+        chunk = decompressor.decompress(data[start:start + chunk_size])
+        if chunk:
+            yield chunk
+
+
+DECOMPRESSORS = {
+    ZLIB: iter_zlib,
+    ZSTD: iter_zstd,
+}
+
+
+def iter_contents(section: Section, chunk_size=CHUNK_SIZE) -> Iterator[memoryview]:
+    '''
+    按块给出节解压后的内容，未压缩的节直接切分 data
+    '''
+    data = section.data
+    if data is None:
+        return
+
+    compression = get_compression(section)
+    if compression is None:
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+        return
+
+    type, size, offset = compression
+    decompress = DECOMPRESSORS.get(type)
+    if decompress is None:
+        raise ValueError(f'section {section.name} has unknown compression type {type}')
+
+    total = 0
+    for chunk in decompress(data[offset:], chunk_size):
+        total += len(chunk)
+        yield memoryview(chunk)
+    if total != size:
+        raise ValueError(f'section {section.name} decompressed to {total} bytes, expected {size}')
+
+
+def get_contents(section: Section) -> Optional[memoryview]:
+    '''
+    节解压后的全部内容，压缩的节按节头的偏移缓存
+    '''
+    compression = get_compression(section)
+    if compression is None:
+        return section.data
+
+    cache = get_cache(section.elf)
+    key = section.sh_offset
+    contents = cache.get(key)
+    if contents is None:
+        type, size, offset = compression
+        if type == ZLIB:
+            data = section.data[offset:]
+            contents = zlib.decompress(data, bufsize=max(size, 1))
+            if len(contents) != size:
+                raise ValueError(f'section {section.name} decompressed to {len(contents)} bytes, expected {size}')
+        else:
+            contents = b''.join(iter_contents(section))
+        cache.put(key, contents)
+    return memoryview(contents)
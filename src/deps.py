@@ -0,0 +1,303 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import argparse
+import glob
+import json
+import os
+import sys
+from typing import *
+
+from elf import ElfFile
+from scan import is_elf, walk
+
+'''
+共享库依赖图
+
+按动态链接器的规则查找 DT_NEEDED：DT_RPATH（没有 DT_RUNPATH 时）、LD_LIBRARY_PATH、
+DT_RUNPATH、/etc/ld.so.conf 中的目录、默认目录，只接受 class 和 machine 相同的文件。
+每个库只解析一次，同一个名字在同样的搜索路径下只查找一次，
+传递闭包按强连通分量计算并缓存，共享同一批库的大量文件只需要付出各库一次的代价
+
+python src/deps.py /usr/bin/python3
+python src/deps.py --json /usr/bin
+'''
+
+DEFAULT_PATHS = {
+    32: ['/lib', '/usr/lib', '/lib32', '/usr/lib32'],
+    64: ['/lib', '/usr/lib', '/lib64', '/usr/lib64'],
+}
+
+
+def read_ld_so_conf(filename='/etc/ld.so.conf', seen: Set[str] = None) -> List[str]:
+    if seen is None:
+        seen = set()
+    filename = os.path.realpath(filename)
+    if filename in seen:
+        return []
+    seen.add(filename)
+
+    paths = []
+    try:
+        with open(filename) as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return paths
+
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        if line.startswith('include'):
+            pattern = line[len('include'):].strip()
+            if not os.path.isabs(pattern):
+                pattern = os.path.join(os.path.dirname(filename), pattern)
+            for name in sorted(glob.glob(pattern)):
+                paths.extend(read_ld_so_conf(name, seen))
+        else:
+            paths.append(line)
+    return paths
+
+
+class Library(object):
+
+    '''
+    从一个 ELF 文件中取出的依赖信息，解析失败时 error 为错误信息
+    '''
+
+    __slots__ = ('path', 'bits', 'machine', 'soname', 'needed', 'rpath', 'runpath', 'error')
+
+    def __init__(self, path):
+        self.path = path
+        self.bits = None
+        self.machine = None
+        self.soname = None
+        self.needed = []
+        self.rpath = []
+        self.runpath = []
+        self.error = None
+
+    @classmethod
+    def load(cls, path) -> 'Library':
+        library = cls(path)
+        try:
+            with ElfFile(path) as elf:
+                elf.read_header()
+                elf.read_phdrs()
+                elf.read_dyns()
+                library.bits = elf.layout.bits
+                library.machine = elf.header.e_machine
+                dyns = elf.dyns
+                if dyns:
+                    library.soname = dyns.soname
+                    library.needed = dyns.needed
+                    library.rpath = dyns.rpath
+                    library.runpath = dyns.runpath
+        except (OSError, ValueError, IndexError) as e:
+            library.error = str(e)
+        return library
+
+    def expand(self, paths: List[str]) -> List[str]:
+        origin = os.path.dirname(self.path)
+        result = []
+        for path in paths:
+            path = path.replace('${ORIGIN}', origin).replace('$ORIGIN', origin)
+            result.append(path)
+        return result
+
+
+class DependencyGraph(object):
+
+    '''
+    libraries: 真实路径 -> Library
+    lookups: (名字, 搜索目录, class, machine) -> 真实路径，找不到时为 None
+    edges: 真实路径 -> [(DT_NEEDED 名字, 真实路径或 None)]
+    closures: 真实路径 -> 可以到达的全部库（不含自身）
+    '''
+
+    def __init__(self, library_path: List[str] = None, system_paths: List[str] = None):
+        if library_path is None:
+            library_path = [path for path in os.environ.get('LD_LIBRARY_PATH', '').split(':') if path]
+        if system_paths is None:
+            system_paths = read_ld_so_conf()
+        self.library_path = list(library_path)
+        self.system_paths = list(system_paths)
+
+        self.libraries = {}
+        self.lookups = {}
+        self.edges = {}
+        self.closures = {}
+
+    def load(self, path) -> Library:
+        path = os.path.realpath(path)
+        library = self.libraries.get(path)
+        if library is None:
+            library = self.libraries[path] = Library.load(path)
+        return library
+
+    def search_dirs(self, library: Library) -> Tuple[str, ...]:
+        # 动态链接器还会使用加载者的 DT_RPATH，这里只使用文件自身的
+        dirs = []
+        if not library.runpath:
+            dirs.extend(library.expand(library.rpath))
+        dirs.extend(self.library_path)
+        dirs.extend(library.expand(library.runpath))
+        dirs.extend(self.system_paths)
+        dirs.extend(DEFAULT_PATHS.get(library.bits, []))
+        return tuple(dirs)
+
+    def find(self, name, library: Library) -> Optional[str]:
+        if '/' in name:
+            path = name if os.path.isabs(name) else os.path.join(os.path.dirname(library.path), name)
+            return os.path.realpath(path) if os.path.isfile(path) else None
+
+        dirs = self.search_dirs(library)
+        key = (name, dirs, library.bits, library.machine)
+        if key in self.lookups:
+            return self.lookups[key]
+
+        result = None
+        for directory in dirs:
+            candidate = os.path.join(directory, name)
+            if not os.path.isfile(candidate):
+                continue
+            found = self.load(candidate)
+            # 与请求者的 class 和 machine 不同的文件会被动态链接器跳过
+            if found.error is None and found.bits == library.bits and found.machine == library.machine:
+                result = found.path
+                break
+        self.lookups[key] = result
+        return result
+
+    def dependencies(self, path) -> List[Tuple[str, Optional[str]]]:
+        path = os.path.realpath(path)
+        edges = self.edges.get(path)
+        if edges is None:
+            library = self.load(path)
+            edges = self.edges[path] = [(name, self.find(name, library)) for name in library.needed]
+        return edges
+
+    def neighbors(self, path) -> List[str]:
+        return [dep for _, dep in self.dependencies(path) if dep is not None]
+
+    def closure(self, path) -> FrozenSet[str]:
+        '''
+        path 可以到达的全部库，用 Tarjan 算法按强连通分量计算，
+        途经的每个库的结果都会缓存
+        '''
+        path = os.path.realpath(path)
+        if path in self.closures:
+            return self.closures[path]
+
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        work = [(path, iter(self.neighbors(path)))]
+        index[path] = low[path] = 0
+        stack.append(path)
+        on_stack.add(path)
+
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child in self.closures:
+                    continue
+                if child not in index:
+                    index[child] = low[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(self.neighbors(child))))
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    self.close_component(node, stack, on_stack)
+
+        return self.closures[path]
+
+    def close_component(self, root, stack: List[str], on_stack: Set[str]):
+        members = []
+        while True:
+            member = stack.pop()
+            on_stack.discard(member)
+            members.append(member)
+            if member == root:
+                break
+
+        # 分量之外的依赖都已经计算完毕；分量内的库（包括依赖自身的库）直接放入结果，
+        # 它们的闭包此时还没有算出
+        reach = set(members)
+        for member in members:
+            for child in self.neighbors(member):
+                if child in reach:
+                    continue
+                reach.add(child)
+                reach.update(self.closures[child])
+        for member in members:
+            self.closures[member] = frozenset(reach - {member})
+
+    def missing(self, path) -> List[str]:
+        '''
+        path 及其全部依赖中找不到的 DT_NEEDED 名字
+        '''
+        path = os.path.realpath(path)
+        names = []
+        for node in [path, *sorted(self.closure(path))]:
+            names.extend(name for name, dep in self.dependencies(node) if dep is None)
+        return sorted(set(names))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='resolve shared library dependencies')
+    parser.add_argument('paths', nargs='+', help='files or directories')
+    parser.add_argument('-L', '--library-path', action='append', default=None,
+                        help='directories searched before the system ones, default is LD_LIBRARY_PATH')
+    parser.add_argument('--json', action='store_true', help='print one json line per file')
+    args = parser.parse_args(argv)
+
+    graph = DependencyGraph(args.library_path)
+    write = sys.stdout.write
+    for filename in walk(args.paths):
+        if not is_elf(filename):
+            continue
+        library = graph.load(filename)
+        if library.error is not None:
+            result = {'path': filename, 'error': library.error}
+        else:
+            closure = graph.closure(filename)
+            result = {
+                'path': filename,
+                'needed': dict(graph.dependencies(filename)),
+                'closure': sorted(closure),
+                'missing': graph.missing(filename),
+            }
+
+        if args.json:
+            write(json.dumps(result) + '\n')
+            continue
+
+        lines = [f'{filename}:']
+        if 'error' in result:
+            lines.append(f"\terror: {result['error']}")
+        else:
+            for name, dep in result['needed'].items():
+                lines.append(f"\t{name} => {dep or 'not found'}")
+            lines.append(f"\t{len(result['closure'])} libraries in closure")
+            if result['missing']:
+                lines.append(f"\tmissing: {' '.join(result['missing'])}")
+        write('\n'.join(lines) + '\n')
+
+
+if __name__ == '__main__':
+    main()
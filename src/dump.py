@@ -0,0 +1,398 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import argparse
+import json
+import sys
+from typing import *
+
+from elf import ElfFile, ElfIdent, Elf32_Ehdr, Elf32_Shdr, Elf32_Sym, Elf32_Phdr, Elf32_Dyn, DynamicTable
+from reloc import RelocationTable
+from symtab import SymbolTable
+
+'''
+readelf 风格的批量输出
+
+每张表先整体生成行数据，文本模式下格式化后一次写出，JSON 模式下输出原始数值
+
+python src/dump.py -a build/test.so
+python src/dump.py -s --json build/test.so
+'''
+
+SHF_LETTERS = {
+    Elf32_Shdr.SHF.SHF_WRITE: 'W',
+    Elf32_Shdr.SHF.SHF_ALLOC: 'A',
+    Elf32_Shdr.SHF.SHF_EXECINSTR: 'X',
+    Elf32_Shdr.SHF.SHF_MERGE: 'M',
+    Elf32_Shdr.SHF.SHF_STRINGS: 'S',
+    Elf32_Shdr.SHF.SHF_INFO_LINK: 'I',
+    Elf32_Shdr.SHF.SHF_LINK_ORDER: 'L',
+    Elf32_Shdr.SHF.SHF_OS_NONCONFORMING: 'O',
+    Elf32_Shdr.SHF.SHF_GROUP: 'G',
+    Elf32_Shdr.SHF.SHF_TLS: 'T',
+    Elf32_Shdr.SHF.SHF_COMPRESSED: 'C',
+    Elf32_Shdr.SHF.SHF_EXCLUDE: 'E',
+}
+
+PF_LETTERS = (
+    (Elf32_Phdr.PF.PF_R, 'R'),
+    (Elf32_Phdr.PF.PF_W, 'W'),
+    (Elf32_Phdr.PF.PF_X, 'E'),
+)
+
+SHN_NAMES = {
+    Elf32_Shdr.SHN.SHN_UNDEF: 'UND',
+    Elf32_Shdr.SHN.SHN_ABS: 'ABS',
+    Elf32_Shdr.SHN.SHN_COMMON: 'COM',
+}
+
+# 动态段中值为字符串表偏移的类型
+DT_STRINGS = {
+    Elf32_Dyn.DT.DT_NEEDED: 'Shared library',
+    Elf32_Dyn.DT.DT_SONAME: 'Library soname',
+    Elf32_Dyn.DT.DT_RPATH: 'Library rpath',
+    Elf32_Dyn.DT.DT_RUNPATH: 'Library runpath',
+}
+
+# 文件头中以十六进制显示的字段
+HEADER_HEX = {'Entry point address', 'Flags'}
+
+TABLES = ('header', 'sections', 'segments', 'symbols', 'relocations', 'dynamic')
+
+
+def short_name(constant, value) -> str:
+    # 去掉常量名的前缀，例如 SHT_PROGBITS -> PROGBITS，未知的值输出为十六进制
+    name = constant.get_name(value)
+    if not isinstance(name, str) or name == 'undefined':
+        return f'0x{value:x}'
+    return name.split('_', 1)[-1]
+
+
+def name_table(constant, size) -> List[str]:
+    # 值较小的常量预先建表，整列转换时直接按下标取
+    return [short_name(constant, value) for value in range(size)]
+
+
+def section_flags(flags) -> str:
+    return ''.join(letter for bit, letter in SHF_LETTERS.items() if flags & bit)
+
+
+def segment_flags(flags) -> str:
+    return ''.join(letter if flags & bit else ' ' for bit, letter in PF_LETTERS)
+
+
+def format_struct(instance) -> str:
+    cls = type(instance)
+    lines = []
+    for klass in reversed(cls.__mro__):
+        for name, _ in vars(klass).get('_fields_', []):
+            value = getattr(instance, name)
+            if isinstance(value, int):
+                value = f'0x{value:x}'
+            lines.append(f'{cls.__name__} {name} --> {value}')
+    return '\n'.join(lines)
+
+
+class Dumper(object):
+
+    '''
+    把 ElfFile 的各张表格式化输出到 file
+
+    *_rows 方法返回 (列名, 行) 供文本和 JSON 两种模式共用，
+    行中保存原始数值，只有文本模式才做格式化
+    '''
+
+    def __init__(self, elf: ElfFile, file=None):
+        self.elf = elf
+        self.file = sys.stdout if file is None else file
+
+        if elf.header is None:
+            elf.read_header()
+        if not elf.shdrs and elf.header.e_shnum:
+            elf.read_shdrs()
+        if not elf.phdrs and elf.header.e_phnum:
+            elf.read_phdrs()
+
+        self.width = elf.layout.bits // 4
+        self.names = []
+        if elf.shdrs:
+            shstrtab = elf.get_strtab(elf.shdrs[elf.header.e_shstrndx])
+            self.names = [shstrtab.get(shdr.sh_name) for shdr in elf.shdrs]
+        self.symtabs = {}
+
+    def write(self, lines: List[str]):
+        # 每张表只写一次，表之间空一行
+        lines.extend(('', ''))
+        self.file.write('\n'.join(lines))
+
+    def get_symtab(self, index) -> SymbolTable:
+        symtab = self.symtabs.get(index)
+        if symtab is None:
+            symtab = self.symtabs[index] = SymbolTable(self.elf, self.elf.shdrs[index])
+        return symtab
+
+    def header_rows(self) -> List[Tuple[str, Any]]:
+        header = self.elf.header
+        ident = header.e_ident
+        return [
+            ('Magic', ' '.join(f'{byte:02x}' for byte in bytes(ident))),
+            ('Class', short_name(ElfIdent.CLASS, ident.ei_class)),
+            ('Data', short_name(ElfIdent.DATA, ident.ei_data)),
+            ('Version', ident.ei_version),
+            ('Type', short_name(Elf32_Ehdr.ET, header.e_type)),
+            ('Machine', short_name(Elf32_Ehdr.EM, header.e_machine)),
+            ('Entry point address', header.e_entry),
+            ('Start of program headers', header.e_phoff),
+            ('Start of section headers', header.e_shoff),
+            ('Flags', header.e_flags),
+            ('Size of this header', header.e_ehsize),
+            ('Size of program headers', header.e_phentsize),
+            ('Number of program headers', header.e_phnum),
+            ('Size of section headers', header.e_shentsize),
+            ('Number of section headers', header.e_shnum),
+            ('Section header string table index', header.e_shstrndx),
+        ]
+
+    def section_rows(self) -> Tuple[tuple, list]:
+        columns = ('index', 'name', 'type', 'address', 'offset', 'size', 'entsize', 'flags', 'link', 'info', 'align')
+        rows = [
+            (index, self.names[index], short_name(Elf32_Shdr.SHT, shdr.sh_type), shdr.sh_addr,
+             shdr.sh_offset, shdr.sh_size, shdr.sh_entsize, section_flags(shdr.sh_flags),
+             shdr.sh_link, shdr.sh_info, shdr.sh_addralign)
+            for index, shdr in enumerate(self.elf.shdrs)
+        ]
+        return columns, rows
+
+    def segment_rows(self) -> Tuple[tuple, list]:
+        columns = ('type', 'offset', 'vaddr', 'paddr', 'filesz', 'memsz', 'flags', 'align')
+        rows = [
+            (short_name(Elf32_Phdr.PT, phdr.p_type), phdr.p_offset, phdr.p_vaddr, phdr.p_paddr,
+             phdr.p_filesz, phdr.p_memsz, segment_flags(phdr.p_flags), phdr.p_align)
+            for phdr in self.elf.phdrs
+        ]
+        return columns, rows
+
+    def symbol_tables(self) -> Iterator[Tuple[str, tuple, list]]:
+        columns = ('num', 'value', 'size', 'type', 'bind', 'visibility', 'ndx', 'name')
+        types = name_table(Elf32_Sym.STT, 16)
+        binds = name_table(Elf32_Sym.STB, 16)
+        visibilities = name_table(Elf32_Sym.STV, 4)
+        for index, shdr in enumerate(self.elf.shdrs):
+            if shdr.sh_type not in (Elf32_Shdr.SHT.SHT_SYMTAB, Elf32_Shdr.SHT.SHT_DYNSYM):
+                continue
+            symtab = self.get_symtab(index)
+            # 整列转换，不为每个符号创建对象
+            rows = list(zip(
+                range(len(symtab)),
+                symtab.st_value,
+                symtab.st_size,
+                map(types.__getitem__, symtab.type),
+                map(binds.__getitem__, symtab.bind),
+                (visibilities[other & 3] for other in symtab.st_other),
+                (SHN_NAMES.get(shndx, shndx) for shndx in symtab.st_shndx),
+                symtab.names,
+            ))
+            yield self.names[index], columns, rows
+
+    def relocation_tables(self) -> Iterator[Tuple[str, int, tuple, list]]:
+        elf = self.elf
+        shift = elf.layout.r_shift
+        R = elf.layout.Rel.R
+        for index, shdr in enumerate(elf.shdrs):
+            if shdr.sh_type not in (Elf32_Shdr.SHT.SHT_REL, Elf32_Shdr.SHT.SHT_RELA):
+                continue
+            reltab = RelocationTable(elf, shdr)
+            columns = ('offset', 'info', 'type', 'value', 'name')
+            parts = [
+                reltab.r_offset,
+                [(sym << shift) | typ for sym, typ in zip(reltab.r_sym, reltab.r_type)],
+                list(map(R.get_name, reltab.r_type)),
+            ]
+            if reltab.link:
+                joined = reltab.join(self.get_symtab(reltab.link))
+                parts.extend((joined.value, joined.name))
+            else:
+                parts.extend(([0] * len(reltab), [''] * len(reltab)))
+            if reltab.rela:
+                columns += ('addend', )
+                parts.append(reltab.r_addend)
+            yield self.names[index], shdr.sh_offset, columns, list(zip(*parts))
+
+    def dynamic_rows(self) -> Tuple[tuple, list]:
+        elf = self.elf
+        columns = ('tag', 'type', 'value', 'string')
+        dyns = []
+        strtab = None
+        for shdr in elf.shdrs:
+            if shdr.sh_type == Elf32_Shdr.SHT.SHT_DYNAMIC:
+                dyns = DynamicTable(elf, shdr.data, shdr.sh_entsize)
+                strtab = elf.get_strtab(elf.shdrs[shdr.sh_link])
+                break
+        else:
+            # 没有节头表时只能从 PT_DYNAMIC 中读取，不解析字符串
+            if not elf.dyns:
+                elf.read_dyns()
+            dyns = elf.dyns
+
+        rows = []
+        for dyn in dyns:
+            tag = dyn.d_tag
+            value = dyn.d_un.d_val
+            string = None
+            if strtab is not None and tag in DT_STRINGS:
+                string = strtab.get(value)
+            rows.append((tag, short_name(Elf32_Dyn.DT, tag), value, string))
+            if tag == Elf32_Dyn.DT.DT_NULL:
+                break
+        return columns, rows
+
+    def header(self):
+        self.write(['ELF Header:'] + [
+            f'  {name + ":":<35}{hex(value) if name in HEADER_HEX else value}'
+            for name, value in self.header_rows()
+        ])
+
+    def sections(self):
+        w = self.width
+        _, rows = self.section_rows()
+        lines = [
+            f'There are {len(rows)} section headers, starting at offset 0x{self.elf.header.e_shoff:x}:',
+            '',
+            'Section Headers:',
+            f'  [Nr] {"Name":<17} {"Type":<15} {"Address":<{w}} Off    Size   ES Flg Lk Inf Al',
+        ]
+        lines.extend(
+            f'  [{index:2}] {name:<17} {type:<15} {addr:0{w}x} {offset:06x} {size:06x} {entsize:02x} '
+            f'{flags:>3} {link:2} {info:3} {align:2}'
+            for index, name, type, addr, offset, size, entsize, flags, link, info, align in rows
+        )
+        self.write(lines)
+
+    def segments(self):
+        w = self.width
+        _, rows = self.segment_rows()
+        lines = [
+            'Program Headers:',
+            f'  {"Type":<14} Offset   {"VirtAddr":<{w + 2}} {"PhysAddr":<{w + 2}} FileSiz  MemSiz   Flg Align',
+        ]
+        lines.extend(
+            f'  {type:<14} 0x{offset:06x} 0x{vaddr:0{w}x} 0x{paddr:0{w}x} 0x{filesz:06x} 0x{memsz:06x} {flags} 0x{align:x}'
+            for type, offset, vaddr, paddr, filesz, memsz, flags, align in rows
+        )
+        self.write(lines)
+
+    def symbols(self):
+        w = self.width
+        for name, _, rows in self.symbol_tables():
+            lines = [
+                f"Symbol table '{name}' contains {len(rows)} entries:",
+                f'   Num: {"Value":>{w}}  Size Type    Bind   Vis      Ndx Name',
+            ]
+            lines.extend(
+                f'{num:6}: {value:0{w}x} {size:5} {type:<7} {bind:<6} {vis:<8} {ndx:>3} {symbol}'
+                for num, value, size, type, bind, vis, ndx, symbol in rows
+            )
+            self.write(lines)
+
+    def relocations(self):
+        w = self.width
+        for name, offset, columns, rows in self.relocation_tables():
+            lines = [
+                f"Relocation section '{name}' at offset 0x{offset:x} contains {len(rows)} entries:",
+                f' {"Offset":<{w}} {"Info":<{w}} {"Type":<16} {"Sym. Value":<{w}} Sym. Name',
+            ]
+            if len(columns) == 5:
+                lines.extend(
+                    f' {offset:0{w}x} {info:0{w}x} {type:<16} {value:0{w}x} {symbol}'
+                    for offset, info, type, value, symbol in rows
+                )
+            else:
+                lines.extend(
+                    f' {offset:0{w}x} {info:0{w}x} {type:<16} {value:0{w}x} {symbol} {addend:+x}'
+                    for offset, info, type, value, symbol, addend in rows
+                )
+            self.write(lines)
+
+    def dynamic(self):
+        w = self.width
+        _, rows = self.dynamic_rows()
+        lines = [
+            f'Dynamic section contains {len(rows)} entries:',
+            f'  {"Tag":<{w + 2}} {"Type":<20} Name/Value',
+        ]
+        for tag, type, value, string in rows:
+            if string is not None:
+                value = f'{DT_STRINGS[tag]}: [{string}]'
+            else:
+                value = f'0x{value:x}'
+            lines.append(f'  0x{tag & ((1 << w * 4) - 1):0{w}x} {"(" + type + ")":<20} {value}')
+        self.write(lines)
+
+    def as_dict(self, tables: Iterable[str] = TABLES) -> dict:
+        result = {}
+        for table in tables:
+            if table == 'header':
+                result['header'] = dict(self.header_rows())
+            elif table == 'sections':
+                columns, rows = self.section_rows()
+                result['sections'] = [dict(zip(columns, row)) for row in rows]
+            elif table == 'segments':
+                columns, rows = self.segment_rows()
+                result['segments'] = [dict(zip(columns, row)) for row in rows]
+            elif table == 'symbols':
+                result['symbols'] = {
+                    name: [dict(zip(columns, row)) for row in rows]
+                    for name, columns, rows in self.symbol_tables()
+                }
+            elif table == 'relocations':
+                result['relocations'] = {
+                    name: [dict(zip(columns, row)) for row in rows]
+                    for name, _, columns, rows in self.relocation_tables()
+                }
+            elif table == 'dynamic':
+                columns, rows = self.dynamic_rows()
+                result['dynamic'] = [dict(zip(columns, row)) for row in rows]
+        return result
+
+    def dump(self, tables: Iterable[str] = TABLES):
+        for table in tables:
+            getattr(self, table)()
+
+    def dump_json(self, tables: Iterable[str] = TABLES):
+        # json.dump 会分很多次写入，先整体编码再一次写出
+        self.file.write(json.dumps(self.as_dict(tables)) + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='display information about elf files')
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('-a', '--all', action='store_true', help='all tables')
+    parser.add_argument('-H', '--file-header', dest='tables', action='append_const', const='header')
+    parser.add_argument('-S', '--section-headers', dest='tables', action='append_const', const='sections')
+    parser.add_argument('-l', '--program-headers', dest='tables', action='append_const', const='segments')
+    parser.add_argument('-s', '--symbols', dest='tables', action='append_const', const='symbols')
+    parser.add_argument('-r', '--relocs', dest='tables', action='append_const', const='relocations')
+    parser.add_argument('-d', '--dynamic', dest='tables', action='append_const', const='dynamic')
+    parser.add_argument('--json', action='store_true', help='print one json object per file')
+    args = parser.parse_args(argv)
+
+    tables = TABLES if args.all or not args.tables else [table for table in TABLES if table in args.tables]
+
+    for filename in args.files:
+        with ElfFile(filename) as elf:
+            dumper = Dumper(elf)
+            if args.json:
+                dumper.dump_json(tables)
+            else:
+                if len(args.files) > 1:
+                    dumper.file.write(f'\nFile: {filename}\n')
+                dumper.dump(tables)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,16 +7,14 @@
 # coding=utf-8
 
 import ctypes
-import struct
-import types
-import unittest
-from io import BytesIO
+import mmap
 
 from ctypes import Structure, sizeof
-from typing import *
 
+from columns import ColumnTable, Record, decode_columns, struct_layout
 from common import *
-from logger import logger
+from stats import stage
+from strtab import StringTable
 
 '''
 定义基础数据类型
@@ -27,14 +25,14 @@ Elf32_Half = u16
 Elf64_Half = u16
 
 Elf32_Word = u32
-Elf32_Sword = u32
+Elf32_Sword = i32
 Elf64_Word = u32
-Elf64_Sword = u32
+Elf64_Sword = i32
 
 Elf32_Xword = u64
-Elf32_Sxword = u64
-Elf32_Sxword = u64
-Elf64_Sxword = u64
+Elf32_Sxword = i64
+Elf64_Xword = u64
+Elf64_Sxword = i64
 
 Elf32_Addr = u32
 Elf64_Addr = u64
@@ -59,17 +57,87 @@ Elf64_Versym = u64
 
 class Constant(object):
 
+    '''
+    常量类，值 -> 名字 的查找表在第一次查找时才建立，
+    只导入模块而不查名字时不需要为上百个常量建表
+
+    多个名字对应同一个值时（例如 SHN_LORESERVE, SHN_LOPROC, SHN_BEFORE），
+    以最先定义的名字为准，全部名字保存在 ALIASES 中
+    '''
+
+    # 小于该值的常量存放在按值索引的列表中
+    DENSE_LIMIT = 0x400
+
+    NAMES = None
+    DENSE = None
+    ALIASES = None
+    FLAGS = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.NAMES = None
+        cls.DENSE = None
+        cls.ALIASES = None
+        cls.FLAGS = None
+
+    @classmethod
+    def build(cls):
+        names = {}
+        aliases = {}
+        # 常量按值的类型挑选，名字可以有小写 (SHT_GNU_verdef)，
+        # 跳过 __module__ 等和 Constant 自身的 DENSE_LIMIT、NAMES 等
+        helpers = vars(Constant)
+        for klass in reversed(cls.__mro__):
+            for name, var in vars(klass).items():
+                if name.startswith('__') or name in helpers or not isinstance(var, (int, str)):
+                    continue
+                aliases.setdefault(var, []).append(name)
+                names.setdefault(var, name)
+
+        values = [var for var in names if isinstance(var, int) and 0 <= var < cls.DENSE_LIMIT]
+        dense = [None] * (max(values, default=-1) + 1)
+        for var in values:
+            dense[var] = names[var]
+
+        cls.NAMES = names
+        cls.ALIASES = aliases
+        cls.FLAGS = {}
+        cls.DENSE = dense
+        return dense
+
     @classmethod
     def get_name(cls, value):
-        if not hasattr(cls, 'NAMES'):
-            cls.NAMES = {}
-            for name in dir(cls):
-                var = getattr(cls, name)
-                if isinstance(var, (int, str)):
-                    cls.NAMES[var] = name
-        if value in cls.NAMES:
-            return cls.NAMES[value]
-        return "undefined"
+        dense = cls.DENSE
+        if dense is None:
+            dense = cls.build()
+        if type(value) is int and 0 <= value < len(dense):
+            name = dense[value]
+        else:
+            name = cls.NAMES.get(value)
+        if name is None:
+            return "undefined"
+        return name
+
+    @classmethod
+    def get_flags(cls, value) -> tuple:
+        '''
+        把位标志拆成名字，同样的组合只解码一次
+        '''
+        if cls.DENSE is None:
+            cls.build()
+        flags = cls.FLAGS.get(value)
+        if flags is not None:
+            return flags
+
+        names = []
+        bits = value
+        while bits:
+            bit = bits & -bits
+            names.append(cls.get_name(bit))
+            bits ^= bit
+        flags = tuple(names)
+        cls.FLAGS[value] = flags
+        return flags
 
 
 class BaseStructure(ctypes.LittleEndianStructure):
@@ -78,6 +146,12 @@ class BaseStructure(ctypes.LittleEndianStructure):
     _fields_ = []
 
 
+class BaseBigEndianStructure(ctypes.BigEndianStructure):
+
+    _pack_ = 1
+    _fields_ = []
+
+
 class BaseUnion(ctypes.Union):
 
     _pack_ = 1
@@ -445,8 +519,25 @@ class Elf32_Shdr(BaseStructure):
         SHF_ALLOC = (1 << 1)  # Occupies memory during execution
         SHF_EXECINSTR = (1 << 2)  # Executable
         SHF_MERGE = (1 << 4)  # Might be merged
+        SHF_STRINGS = (1 << 5)  # Contains nul-terminated strings
+        SHF_INFO_LINK = (1 << 6)  # `sh_info' contains SHT index
+        SHF_LINK_ORDER = (1 << 7)  # Preserve order after combining
+        SHF_OS_NONCONFORMING = (1 << 8)  # Non-standard OS specific handling required
+        SHF_GROUP = (1 << 9)  # Section is member of a group.
+        SHF_TLS = (1 << 10)  # Section hold thread-local data.
+        SHF_COMPRESSED = (1 << 11)  # Section with compressed data.
+        SHF_GNU_RETAIN = (1 << 21)  # Not to be GCed by linker.
+        SHF_ORDERED = (1 << 30)  # Special ordering requirement (Solaris).
+        SHF_EXCLUDE = (1 << 31)  # Section is excluded unless referenced or allocated (Solaris).
+        SHF_MASKOS = 0x0ff00000  # OS-specific.
         SHF_MASKPROC = 0xf0000000  # Processor-specific
 
+    def body_range(self):
+        # .bss 之类的节在文件中不占空间
+        if self.sh_type == self.SHT.SHT_NOBITS:
+            return self.sh_offset, 0
+        return self.sh_offset, self.sh_size
+
 
 class Elf32_Sym(BaseStructure):
 
@@ -497,6 +588,13 @@ class Elf32_Sym(BaseStructure):
         STT_LOPROC = 13  # Start of processor-specific
         STT_HIPROC = 15  # End of processor-specific
 
+    class STV(Constant):
+        # st_other 的低 2 位
+        STV_DEFAULT = 0  # Default symbol visibility rules
+        STV_INTERNAL = 1  # Processor specific hidden class
+        STV_HIDDEN = 2  # Sym unavailable in other modules
+        STV_PROTECTED = 3  # Not preemptible, not exported
+
 
 class Elf32_Rel(BaseStructure):
 
@@ -570,9 +668,8 @@ class Elf32_Rela(Elf32_Rel):
     } Elf32_Rela;
     '''
 
+    # r_offset 和 r_info 继承自 Elf32_Rel
     _fields_ = [
-        ('r_offset', Elf32_Addr),
-        ('r_info', Elf32_Word),
         ('r_addend', Elf32_Sword),
     ]
 
@@ -632,8 +729,11 @@ class Elf32_Phdr(BaseStructure):
         PF_MASKOS = 0x0ff00000  # OS-specific
         PF_MASKPROC = 0xf0000000  # Processor-specific
 
+    def body_range(self):
+        return self.p_offset, self.p_filesz
+
 
-class Elf32_Dyn(Structure):
+class Elf32_Dyn(BaseStructure):
     '''
     typedef struct
     {
@@ -742,314 +842,853 @@ class Elf32_Dyn(Structure):
         DT_FILTER = 0x7fffffff  # Shared object to get values from
 
 
-class ElfTestCase(unittest.TestCase):
+class Elf32_Chdr(BaseStructure):
 
-    def setUp(self) -> None:
-        super().setUp()
-        import os
-        dirname = os.path.dirname(__file__)
-        # filename = os.path.join(dirname, "../build/test.o")
-        # filename = os.path.join(dirname, "../build/test")
-        filename = os.path.join(dirname, "../build/test.so")
-        self.file = open(filename, 'rb')
-        self.shdrs = []
+    '''
+    SHF_COMPRESSED 节开头的压缩头
 
-    def tearDown(self) -> None:
-        self.file.close()
-        super().tearDown()
+    typedef struct
+    {
+        Elf32_Word	ch_type;		/* Compression format.  */
+        Elf32_Word	ch_size;		/* Uncompressed data size.  */
+        Elf32_Word	ch_addralign;	/* Uncompressed data alignment.  */
+    } Elf32_Chdr;
+    '''
 
-    def read_header(self):
-        data = self.file.read(sizeof(Elf32_Ehdr))
-        # logger.debug(data)
-        header = Elf32_Ehdr.from_buffer_copy(data)
-        self.header = header
+    _fields_ = [
+        ('ch_type', Elf32_Word),
+        ('ch_size', Elf32_Word),
+        ('ch_addralign', Elf32_Word),
+    ]
 
-    def print_header(self):
-        header = self.header
-        logger.info("elf magic %s", header.e_ident.ei_magic.to_bytes(4, byteorder='little'))
-        logger.info("elf class %s", ElfIdent.CLASS.get_name(header.e_ident.ei_class))
-        logger.info("elf data %s", ElfIdent.DATA.get_name(header.e_ident.ei_data))
+    class ELFCOMPRESS(Constant):
+        ELFCOMPRESS_ZLIB = 1  # ZLIB/DEFLATE algorithm.
+        ELFCOMPRESS_ZSTD = 2  # Zstandard algorithm.
+        ELFCOMPRESS_LOOS = 0x60000000  # Start of OS-specific.
+        ELFCOMPRESS_HIOS = 0x6fffffff  # End of OS-specific.
+        ELFCOMPRESS_LOPROC = 0x70000000  # Start of processor-specific.
+        ELFCOMPRESS_HIPROC = 0x7fffffff  # End of processor-specific.
 
-        self.splitter()
 
-        logger.info("elf type --> %s", Elf32_Ehdr.ET.get_name(header.e_type))
-        logger.info("elf machine --> %s", Elf32_Ehdr.EM.get_name(header.e_machine))
-        logger.info("elf version --> %s", Elf32_Ehdr.EV.get_name(header.e_version))
+class Elf64_Ehdr(BaseStructure):
 
-        for name, _ in Elf32_Ehdr._fields_:
-            if name in {"e_type", "e_machine", "e_version", 'e_ident'}:
-                continue
-            logger.info(f"elf {name} --> 0x{getattr(header, name):x}")
+    _fields_ = [
+        ('e_ident', ElfIdent),
+        ('e_type', Elf64_Half),
+        ('e_machine', Elf64_Half),
+        ('e_version', Elf64_Word),
+        ('e_entry', Elf64_Addr),
+        ('e_phoff', Elf64_Off),
+        ('e_shoff', Elf64_Off),
+        ('e_flags', Elf64_Word),
+        ('e_ehsize', Elf64_Half),
+        ('e_phentsize', Elf64_Half),
+        ('e_phnum', Elf64_Half),
+        ('e_shentsize', Elf64_Half),
+        ('e_shnum', Elf64_Half),
+        ('e_shstrndx', Elf64_Half),
+    ]
 
-        self.splitter()
+    ET = Elf32_Ehdr.ET
+    EM = Elf32_Ehdr.EM
+    EV = Elf32_Ehdr.EV
 
-    def read_shdrs(self):
-        self.shdrs = []
 
-        file = self.file
-        header = self.header
+class Elf64_Shdr(BaseStructure):
 
-        file.seek(header.e_shoff)
+    '''
+    typedef struct
+    {
+    Elf64_Word	sh_name;		/* Section name (string tbl index) */
+    Elf64_Word	sh_type;		/* Section type */
+    Elf64_Xword	sh_flags;		/* Section flags */
+    Elf64_Addr	sh_addr;		/* Section virtual addr at execution */
+    Elf64_Off	sh_offset;		/* Section file offset */
+    Elf64_Xword	sh_size;		/* Section size in bytes */
+    Elf64_Word	sh_link;		/* Link to another section */
+    Elf64_Word	sh_info;		/* Additional section information */
+    Elf64_Xword	sh_addralign;		/* Section alignment */
+    Elf64_Xword	sh_entsize;		/* Entry size if section holds table */
+    } Elf64_Shdr;
+    '''
 
-        for _ in range(header.e_shnum):
-            data = file.read(header.e_shentsize)
-            shdr = Elf32_Shdr.from_buffer_copy(data)
-            self.shdrs.append(shdr)
+    _fields_ = [
+        ('sh_name', Elf64_Word),
+        ('sh_type', Elf64_Word),
+        ('sh_flags', Elf64_Xword),
+        ('sh_addr', Elf64_Addr),
+        ('sh_offset', Elf64_Off),
+        ('sh_size', Elf64_Xword),
+        ('sh_link', Elf64_Word),
+        ('sh_info', Elf64_Word),
+        ('sh_addralign', Elf64_Xword),
+        ('sh_entsize', Elf64_Xword),
+    ]
 
-            # for name, _ in Elf32_Shdr._fields_:
-            #     logger.info("%s --> %s", name, getattr(shdr, name))
+    SHN = Elf32_Shdr.SHN
+    SHT = Elf32_Shdr.SHT
+    SHF = Elf32_Shdr.SHF
 
-            # self.splitter(1)
+    body_range = Elf32_Shdr.body_range
 
-        for shdr in self.shdrs:
-            if shdr.sh_size == 0:
-                shdr.data = None
-            else:
-                file.seek(shdr.sh_offset)
-                shdr.data = file.read(shdr.sh_size)
 
-    def get_str(self, data: bytes, index) -> str:
-        end = data.find(b'\0', index)
-        if end == -1:
+class Elf64_Sym(BaseStructure):
+
+    '''
+    typedef struct
+    {
+    Elf64_Word	st_name;		/* Symbol name (string tbl index) */
+    unsigned char	st_info;		/* Symbol type and binding */
+    unsigned char st_other;		/* Symbol visibility */
+    Elf64_Section	st_shndx;		/* Section index */
+    Elf64_Addr	st_value;		/* Symbol value */
+    Elf64_Xword	st_size;		/* Symbol size */
+    } Elf64_Sym;
+    '''
+
+    _fields_ = [
+        ('st_name', Elf64_Word),
+        ('st_info', u8),
+        ('st_other', u8),
+        ('st_shndx', Elf64_Section),
+        ('st_value', Elf64_Addr),
+        ('st_size', Elf64_Xword),
+    ]
+
+    STB = Elf32_Sym.STB
+    STT = Elf32_Sym.STT
+    STV = Elf32_Sym.STV
+
+
+class Elf64_Rel(BaseStructure):
+
+    '''
+    typedef struct
+    {
+        Elf64_Addr	r_offset;		/* Address */
+        Elf64_Xword	r_info;			/* Relocation type and symbol index */
+    } Elf64_Rel;
+    '''
+
+    _fields_ = [
+        ('r_offset', Elf64_Addr),
+        ('r_info', Elf64_Xword),
+    ]
+
+    class R(Constant):
+        R_X86_64_NONE = 0  # No reloc
+        R_X86_64_64 = 1  # Direct 64 bit
+        R_X86_64_PC32 = 2  # PC relative 32 bit signed
+        R_X86_64_GOT32 = 3  # 32 bit GOT entry
+        R_X86_64_PLT32 = 4  # 32 bit PLT address
+        R_X86_64_COPY = 5  # Copy symbol at runtime
+        R_X86_64_GLOB_DAT = 6  # Create GOT entry
+        R_X86_64_JUMP_SLOT = 7  # Create PLT entry
+        R_X86_64_RELATIVE = 8  # Adjust by program base
+        R_X86_64_GOTPCREL = 9  # 32 bit signed PC relative offset to GOT
+        R_X86_64_32 = 10  # Direct 32 bit zero extended
+        R_X86_64_32S = 11  # Direct 32 bit sign extended
+        R_X86_64_16 = 12  # Direct 16 bit zero extended
+        R_X86_64_PC16 = 13  # 16 bit sign extended pc relative
+        R_X86_64_8 = 14  # Direct 8 bit sign extended
+        R_X86_64_PC8 = 15  # 8 bit sign extended pc relative
+        R_X86_64_DTPMOD64 = 16  # ID of module containing symbol
+        R_X86_64_DTPOFF64 = 17  # Offset in module's TLS block
+        R_X86_64_TPOFF64 = 18  # Offset in initial TLS block
+        R_X86_64_TLSGD = 19  # 32 bit signed PC relative offset to two GOT entries for GD symbol
+        R_X86_64_TLSLD = 20  # 32 bit signed PC relative offset to two GOT entries for LD symbol
+        R_X86_64_DTPOFF32 = 21  # Offset in TLS block
+        R_X86_64_GOTTPOFF = 22  # 32 bit signed PC relative offset to GOT entry for IE symbol
+        R_X86_64_TPOFF32 = 23  # Offset in initial TLS block
+        R_X86_64_PC64 = 24  # PC relative 64 bit
+        R_X86_64_GOTOFF64 = 25  # 64 bit offset to GOT
+        R_X86_64_GOTPC32 = 26  # 32 bit signed pc relative offset to GOT
+        R_X86_64_GOT64 = 27  # 64-bit GOT entry offset
+        R_X86_64_GOTPCREL64 = 28  # 64-bit PC relative offset to GOT entry
+        R_X86_64_GOTPC64 = 29  # 64-bit PC relative offset to GOT
+        R_X86_64_GOTPLT64 = 30  # like GOT64, says PLT entry needed
+        R_X86_64_PLTOFF64 = 31  # 64-bit GOT relative offset to PLT entry
+        R_X86_64_SIZE32 = 32  # Size of symbol plus 32-bit addend
+        R_X86_64_SIZE64 = 33  # Size of symbol plus 64-bit addend
+        R_X86_64_GOTPC32_TLSDESC = 34  # GOT offset for TLS descriptor.
+        R_X86_64_TLSDESC_CALL = 35  # Marker for call through TLS descriptor.
+        R_X86_64_TLSDESC = 36  # TLS descriptor.
+        R_X86_64_IRELATIVE = 37  # Adjust indirectly by program base
+        R_X86_64_RELATIVE64 = 38  # 64-bit adjust by program base
+        R_X86_64_GOTPCRELX = 41  # Load from 32 bit signed pc relative offset to GOT entry without REX prefix, relaxable.
+        R_X86_64_REX_GOTPCRELX = 42  # Load from 32 bit signed pc relative offset to GOT entry with REX prefix, relaxable.
+        R_X86_64_NUM = 43
+
+
+class Elf64_Rela(Elf64_Rel):
+
+    '''
+    typedef struct
+    {
+        Elf64_Addr	r_offset;		/* Address */
+        Elf64_Xword	r_info;			/* Relocation type and symbol index */
+        Elf64_Sxword	r_addend;		/* Addend */
+    } Elf64_Rela;
+    '''
+
+    # r_offset 和 r_info 继承自 Elf64_Rel
+    _fields_ = [
+        ('r_addend', Elf64_Sxword),
+    ]
+
+
+class Elf64_Phdr(BaseStructure):
+
+    '''
+    typedef struct
+    {
+        Elf64_Word	p_type;			/* Segment type */
+        Elf64_Word	p_flags;		/* Segment flags */
+        Elf64_Off	p_offset;		/* Segment file offset */
+        Elf64_Addr	p_vaddr;		/* Segment virtual address */
+        Elf64_Addr	p_paddr;		/* Segment physical address */
+        Elf64_Xword	p_filesz;		/* Segment size in file */
+        Elf64_Xword	p_memsz;		/* Segment size in memory */
+        Elf64_Xword	p_align;		/* Segment alignment */
+    } Elf64_Phdr;
+    '''
+
+    _fields_ = [
+        ('p_type', Elf64_Word),
+        ('p_flags', Elf64_Word),
+        ('p_offset', Elf64_Off),
+        ('p_vaddr', Elf64_Addr),
+        ('p_paddr', Elf64_Addr),
+        ('p_filesz', Elf64_Xword),
+        ('p_memsz', Elf64_Xword),
+        ('p_align', Elf64_Xword),
+    ]
+
+    PT = Elf32_Phdr.PT
+    PF = Elf32_Phdr.PF
+
+    body_range = Elf32_Phdr.body_range
+
+
+class Elf64_Dyn(BaseStructure):
+    '''
+    typedef struct
+    {
+    Elf64_Sxword	d_tag;			/* Dynamic entry type */
+    union
+        {
+        Elf64_Xword d_val;		/* Integer value */
+        Elf64_Addr d_ptr;			/* Address value */
+        } d_un;
+    } Elf64_Dyn;
+    '''
+
+    class Dun(BaseUnion):
+
+        _fields_ = [
+            ('d_val', Elf64_Xword),
+            ('d_ptr', Elf64_Addr),
+        ]
+
+    _fields_ = [
+        ('d_tag', Elf64_Sxword),
+        ('d_un', Dun),
+    ]
+
+    DT = Elf32_Dyn.DT
+
+
+class Elf64_Chdr(BaseStructure):
+
+    '''
+    typedef struct
+    {
+        Elf64_Word	ch_type;		/* Compression format.  */
+        Elf64_Word	ch_reserved;
+        Elf64_Xword	ch_size;		/* Uncompressed data size.  */
+        Elf64_Xword	ch_addralign;	/* Uncompressed data alignment.  */
+    } Elf64_Chdr;
+    '''
+
+    _fields_ = [
+        ('ch_type', Elf64_Word),
+        ('ch_reserved', Elf64_Word),
+        ('ch_size', Elf64_Xword),
+        ('ch_addralign', Elf64_Xword),
+    ]
+
+    ELFCOMPRESS = Elf32_Chdr.ELFCOMPRESS
+
+
+# 字节序相反的结构体缓存
+SWAPPED = {}
+
+
+def swap_union(cls):
+    # 当前版本的 ctypes 不支持非本机字节序的 union，
+    # d_un 的各成员大小相同，改为只有一个成员的结构体，其余成员作为别名
+    name, typ = cls._fields_[0]
+    namespace = {
+        '_pack_': 1,
+        '_fields_': [(name, typ)],
+    }
+    for alias, _ in cls._fields_[1:]:
+        namespace[alias] = property(lambda self, name=name: getattr(self, name))
+    return type(cls.__name__, (ctypes.BigEndianStructure, ), namespace)
+
+
+def swap_byteorder(cls):
+    '''
+    生成大端字节序的同名结构体，常量和方法保持不变
+    '''
+    if cls in SWAPPED:
+        return SWAPPED[cls]
+
+    bases = []
+    for base in cls.__bases__:
+        if base is BaseStructure:
+            base = BaseBigEndianStructure
+        elif issubclass(base, ctypes.Structure):
+            base = swap_byteorder(base)
+        bases.append(base)
+
+    fields = []
+    for name, typ in vars(cls).get('_fields_', []):
+        if issubclass(typ, ctypes.Union):
+            typ = swap_union(typ)
+        fields.append((name, typ))
+
+    names = {name for name, _ in fields}
+    namespace = {
+        name: var for name, var in vars(cls).items()
+        if name not in names and not name.startswith('__') and name != '_fields_'
+    }
+    namespace['_fields_'] = fields
+
+    swapped = type(cls.__name__, tuple(bases), namespace)
+    SWAPPED[cls] = swapped
+    return swapped
+
+
+class ElfLayout(object):
+
+    '''
+    根据 e_ident 中的 class 和 data 选出的一组结构体
+
+    每种组合只生成一次，读取时直接使用对应的结构体，不再逐个字段判断
+    '''
+
+    LAYOUTS = {}
+
+    def __init__(self, ei_class, ei_data):
+        if ei_class == ElfIdent.CLASS.ELFCLASS32:
+            structs = (Elf32_Ehdr, Elf32_Shdr, Elf32_Sym, Elf32_Rel, Elf32_Rela, Elf32_Phdr, Elf32_Dyn, Elf32_Chdr)
+            self.bits = 32
+            # ELF32_R_SYM / ELF32_R_TYPE
+            self.r_shift = 8
+        elif ei_class == ElfIdent.CLASS.ELFCLASS64:
+            structs = (Elf64_Ehdr, Elf64_Shdr, Elf64_Sym, Elf64_Rel, Elf64_Rela, Elf64_Phdr, Elf64_Dyn, Elf64_Chdr)
+            self.bits = 64
+            # ELF64_R_SYM / ELF64_R_TYPE
+            self.r_shift = 32
+        else:
+            raise ValueError(f'invalid elf class {ei_class}')
+        self.r_mask = (1 << self.r_shift) - 1
+
+        if ei_data == ElfIdent.DATA.ELFDATA2LSB:
+            self.byteorder = 'little'
+        elif ei_data == ElfIdent.DATA.ELFDATA2MSB:
+            self.byteorder = 'big'
+            structs = tuple(swap_byteorder(cls) for cls in structs)
+        else:
+            raise ValueError(f'invalid elf data encoding {ei_data}')
+
+        self.ei_class = ei_class
+        self.ei_data = ei_data
+        self.Ehdr, self.Shdr, self.Sym, self.Rel, self.Rela, self.Phdr, self.Dyn, self.Chdr = structs
+
+    @classmethod
+    def get(cls, ei_class, ei_data) -> 'ElfLayout':
+        key = (ei_class, ei_data)
+        layout = cls.LAYOUTS.get(key)
+        if layout is None:
+            layout = cls(ei_class, ei_data)
+            cls.LAYOUTS[key] = layout
+        return layout
+
+
+class Section(Record):
+
+    '''
+    节头表中的一项，内容 data 每次访问时从文件中取出，不缓存在对象上；
+    contents 为解压后的内容，未压缩的节与 data 相同
+    '''
+
+    __slots__ = ()
+
+    FIELDS = ('sh_name', 'sh_type', 'sh_flags', 'sh_addr', 'sh_offset',
+              'sh_size', 'sh_link', 'sh_info', 'sh_addralign', 'sh_entsize')
+
+    SHT = Elf32_Shdr.SHT
+    SHF = Elf32_Shdr.SHF
+    SHN = Elf32_Shdr.SHN
+
+    body_range = Elf32_Shdr.body_range
+
+    @property
+    def elf(self):
+        return self.table.elf
+
+    @property
+    def data(self):
+        return self.table.elf.get_data(*self.body_range())
+
+    def release(self):
+        self.table.elf.release_data(*self.body_range())
+
+    @property
+    def name(self) -> str:
+        return self.table.get_name(self.index)
+
+    # 压缩的节在访问时才解压，compress 模块依赖本模块，只能在使用时导入
+
+    @property
+    def compression(self):
+        from compress import get_compression
+        return get_compression(self)
+
+    @property
+    def contents(self):
+        from compress import get_contents
+        return get_contents(self)
+
+    def iter_contents(self, chunk_size=0x10000):
+        from compress import iter_contents
+        return iter_contents(self, chunk_size)
+
+
+class Segment(Record):
+
+    '''
+    程序头表中的一项
+    '''
+
+    __slots__ = ()
+
+    FIELDS = ('p_type', 'p_flags', 'p_offset', 'p_vaddr', 'p_paddr',
+              'p_filesz', 'p_memsz', 'p_align')
+
+    PT = Elf32_Phdr.PT
+    PF = Elf32_Phdr.PF
+
+    body_range = Elf32_Phdr.body_range
+
+    @property
+    def elf(self):
+        return self.table.elf
+
+    @property
+    def data(self):
+        return self.table.elf.get_data(*self.body_range())
+
+    def release(self):
+        self.table.elf.release_data(*self.body_range())
+
+
+class Dynamic(Record):
+
+    '''
+    动态段中的一项，d_un 的两个成员共用 d_val 一列
+    '''
+
+    __slots__ = ()
+
+    FIELDS = ('d_tag', 'd_val')
+
+    DT = Elf32_Dyn.DT
+
+    @property
+    def d_ptr(self):
+        return self.d_val
+
+    @property
+    def d_un(self):
+        # 兼容 dyn.d_un.d_val 的写法
+        return self
+
+
+class SectionTable(ColumnTable):
+
+    '''
+    列式存储的节头表，节名以 sh_name 偏移保存，需要时才从 .shstrtab 中取出
+    '''
+
+    RECORD = Section
+
+    def __init__(self, elf: 'ElfFile', data, entsize):
+        layout = elf.layout
+        super().__init__(decode_columns(data, entsize, struct_layout(layout.Shdr), layout.byteorder))
+        self.elf = elf
+
+    def get_name(self, index) -> str:
+        elf = self.elf
+        shstrndx = elf.header.e_shstrndx
+        if not shstrndx or shstrndx >= self.count:
             return ''
-        string = data[index:end]
-        return string.decode("utf8")
-
-    def print_shdrs(self):
-        strtab = self.shdrs[self.header.e_shstrndx]
-        data = strtab.data
-        for index, shdr in enumerate(self.shdrs):
-            logger.info(f'section index {index}')
-            logger.info(f'section name {self.get_str(data, shdr.sh_name)}')
-            logger.info(f'section type {Elf32_Shdr.SHT.get_name(shdr.sh_type)}')
-            flags = set([shdr.sh_flags & (1 << var) for var in range(32)])
-            logger.info(f'section flags {[Elf32_Shdr.SHF.get_name(flag) for flag in flags if flag ]}')
-            logger.info(f'section addr 0x{shdr.sh_addr:X}')
-            # logger.info(f'section offset 0x{shdr.sh_offset:X}')
-            # logger.info(f'section size 0x{shdr.sh_size:X}')
-            logger.info(f'section link 0x{shdr.sh_link:X}')
-            logger.info(f'section info 0x{shdr.sh_info:X}')
-            # logger.info(f'section align {shdr.sh_addralign}')
-            # logger.info(f'section esize {shdr.sh_entsize}')
-
-            self.splitter(1)
-        self.splitter()
-
-    def splitter(self, indent=0):
-        start = indent * 4
-        logger.info(f"{' ' * start}{'-' * (50 - start)}")
+        return elf.get_str(self[shstrndx], self.columns['sh_name'][index])
 
-    def get_st_bind(self, info):
 
-        return info >> 4
+class SegmentTable(ColumnTable):
 
-    def get_st_type(self, info):
+    RECORD = Segment
 
-        return info & 0xf
+    def __init__(self, elf: 'ElfFile', data, entsize):
+        layout = elf.layout
+        super().__init__(decode_columns(data, entsize, struct_layout(layout.Phdr), layout.byteorder))
+        self.elf = elf
 
-    def get_st_info(self, bind, type):
 
-        return (bind << 4) | (type & 0xf)
+class DynamicTable(ColumnTable):
+
+    '''
+    动态段，按 tag 建立索引
+
+    字符串类的项（DT_NEEDED, DT_SONAME, DT_RPATH, DT_RUNPATH）通过 DT_STRTAB 解析，
+    DT_STRTAB 是虚拟地址，经程序头表换算为文件偏移，不依赖节头表
+    '''
 
-    def print_struct(self, instance: BaseStructure):
-        cls = type(instance)
-        for name, _ in cls._fields_:
-            value = getattr(instance, name)
-            if isinstance(value, int):
-                content = f"0x{value:x}"
+    RECORD = Dynamic
+
+    def __init__(self, elf: 'ElfFile', data, entsize=0):
+        layout = elf.layout
+        cls = layout.Dyn
+        super().__init__(decode_columns(
+            data, entsize or sizeof(cls),
+            [('d_tag', cls.d_tag.offset, cls.d_tag.size), ('d_val', cls.d_un.offset, cls.d_un.size)],
+            layout.byteorder, signed=('d_tag', )))
+        self.elf = elf
+        self.tags = None
+        self._strtab = None
+
+    def build(self):
+        # tag -> 按出现顺序排列的值，DT_NULL 之后的内容不计入
+        tags = {}
+        for tag, val in zip(self.columns['d_tag'], self.columns['d_val']):
+            if tag == Elf32_Dyn.DT.DT_NULL:
+                break
+            values = tags.get(tag)
+            if values is None:
+                tags[tag] = [val]
             else:
-                content = value
-            logger.info(f"{cls.__name__} {name} --> {content}")
+                values.append(val)
+        self.tags = tags
+
+    def __contains__(self, tag):
+        if self.tags is None:
+            self.build()
+        return tag in self.tags
+
+    def get(self, tag, default=None):
+        if self.tags is None:
+            self.build()
+        values = self.tags.get(tag)
+        return values[0] if values else default
+
+    def get_all(self, tag) -> list:
+        if self.tags is None:
+            self.build()
+        return self.tags.get(tag, [])
+
+    @property
+    def strtab(self) -> 'Optional[StringTable]':
+        if self._strtab is None:
+            addr = self.get(Elf32_Dyn.DT.DT_STRTAB)
+            size = self.get(Elf32_Dyn.DT.DT_STRSZ)
+            if addr is None or size is None:
+                return None
+            offset = self.elf.vaddr_to_offset(addr)
+            if offset < 0:
+                return None
+            self._strtab = self.elf.get_strtab_at(offset, size)
+        return self._strtab
+
+    def get_strings(self, tag) -> list:
+        strtab = self.strtab
+        if strtab is None:
+            return []
+        return [strtab.get(val) for val in self.get_all(tag)]
+
+    def get_string(self, tag) -> str:
+        strings = self.get_strings(tag)
+        return strings[0] if strings else None
+
+    @property
+    def needed(self) -> list:
+        return self.get_strings(Elf32_Dyn.DT.DT_NEEDED)
+
+    @property
+    def soname(self) -> str:
+        return self.get_string(Elf32_Dyn.DT.DT_SONAME)
+
+    @property
+    def rpath(self) -> list:
+        return split_path(self.get_string(Elf32_Dyn.DT.DT_RPATH))
+
+    @property
+    def runpath(self) -> list:
+        return split_path(self.get_string(Elf32_Dyn.DT.DT_RUNPATH))
+
+
+def split_path(value) -> list:
+    # DT_RPATH / DT_RUNPATH 为冒号分隔的目录列表
+    if not value:
+        return []
+    return [path for path in value.split(':') if path]
+
+
+class ElfFile(object):
 
-    def read_symbols(self):
-        shdrs = self.shdrs
-        for shdr in self.shdrs:
-            if shdr.sh_type != Elf32_Shdr.SHT.SHT_SYMTAB:
+    '''
+    基于 mmap 的 ELF 文件读取器
+
+    文件只映射一次，单个结构体通过 from_buffer 直接覆盖在映射上，
+    节头表、程序头表、动态段和符号表按列解码（SectionTable 等），每一项不单独创建对象，
+    节和段的内容以 memoryview 切片的形式给出，读取过程中不做拷贝。
+
+    传入 stats (ElfStats) 时记录各个 read_* 阶段的统计
+    '''
+
+    stats = None
+
+    # 解压结果缓存的总大小
+    DECOMPRESS_LIMIT = 64 << 20
+
+    def __init__(self, filename, stats=None):
+        self.filename = filename
+        self.stats = stats
+        self.file = open(filename, 'rb')
+        try:
+            # ctypes 的 from_buffer 要求缓冲区可写，ACCESS_COPY 为私有映射，不会写回文件
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (OSError, ValueError) as e:
+            # 空文件不能映射
+            self.file.close()
+            raise ValueError(f'{filename} cannot be mapped: {e}') from None
+        self.view = memoryview(self.map)
+        self.reset()
+
+    def reset(self):
+        self.layout = None
+        self.header = None
+        self.shdrs = []
+        self.phdrs = []
+        self.symtab = []
+        self.reltab = []
+        self.dyns = []
+        self.got = None
+        self.strtabs = {}
+        self.decompressed = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.reset()
+
+        self.view.release()
+        try:
+            self.map.close()
+        except BufferError:
+            # 外部仍持有覆盖在映射上的结构体，交给垃圾回收释放
+            pass
+        self.file.close()
+
+    def check_range(self, offset, size):
+        if offset < 0 or size < 0 or offset + size > len(self.map):
+            raise ValueError(f'{self.filename}: range 0x{offset:x}+0x{size:x} is out of file (0x{len(self.map):x} bytes)')
+
+    def get_buffer(self, offset, size):
+        # 返回包含文件中 [offset, offset + size) 的缓冲区，以及这段内容在缓冲区中的位置
+        self.check_range(offset, size)
+        return self.map, offset
+
+    def read_struct(self, cls, offset):
+        buffer, start = self.get_buffer(offset, sizeof(cls))
+        if self.stats is not None:
+            self.stats.structs += 1
+            self.stats.bytes += sizeof(cls)
+        return cls.from_buffer(buffer, start)
+
+    def read_structs(self, cls, offset, count, entsize=0):
+        if not count:
+            return []
+        if not entsize:
+            entsize = sizeof(cls)
+        buffer, start = self.get_buffer(offset, (count - 1) * entsize + sizeof(cls))
+        if self.stats is not None:
+            self.stats.structs += count
+            self.stats.bytes += count * entsize
+        if entsize == sizeof(cls):
+            return list((cls * count).from_buffer(buffer, start))
+        return [cls.from_buffer(buffer, start + index * entsize) for index in range(count)]
+
+    def get_data(self, offset, size):
+        if size == 0:
+            return None
+        self.check_range(offset, size)
+        if self.stats is not None:
+            self.stats.bytes += size
+        return self.view[offset:offset + size]
+
+    def release_data(self, offset, size):
+        # 映射为私有只读使用，丢弃的页面再次访问时会从文件重新读入
+        if not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        start = -(-offset // mmap.PAGESIZE) * mmap.PAGESIZE
+        end = (offset + size) // mmap.PAGESIZE * mmap.PAGESIZE
+        if end > start:
+            self.map.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+    @stage
+    def read_header(self):
+        ident = self.read_struct(ElfIdent, 0)
+        if ident.ei_magic.to_bytes(4, byteorder='little') != ElfIdent.MAGIC.ELFMAG.encode('latin1'):
+            raise ValueError(f'{self.filename} is not an elf file')
+        self.layout = ElfLayout.get(ident.ei_class, ident.ei_data)
+        self.header = self.read_struct(self.layout.Ehdr, 0)
+
+    @stage
+    def read_shdrs(self):
+        header = self.header
+
+        entsize = header.e_shentsize or sizeof(self.layout.Shdr)
+        self.shdrs = SectionTable(self, self.get_data(header.e_shoff, header.e_shnum * entsize), entsize)
+        if self.stats is not None:
+            self.stats.structs += len(self.shdrs)
+
+    def get_strtab(self, shdr: Elf32_Shdr) -> StringTable:
+        return self.get_strtab_at(shdr.sh_offset, shdr.sh_size)
+
+    def get_strtab_at(self, offset, size) -> StringTable:
+        strtab = self.strtabs.get(offset)
+        if strtab is None:
+            buffer, start = self.get_buffer(offset, size)
+            strtab = StringTable(buffer, start, size)
+            self.strtabs[offset] = strtab
+        return strtab
+
+    def vaddr_to_offset(self, vaddr) -> int:
+        '''
+        虚拟地址 -> 文件偏移，通过 PT_LOAD 段换算，不在任何段的文件内容中时返回 -1
+        '''
+        for phdr in self.phdrs:
+            if phdr.p_type != Elf32_Phdr.PT.PT_LOAD:
                 continue
+            if phdr.p_vaddr <= vaddr < phdr.p_vaddr + phdr.p_filesz:
+                return phdr.p_offset + vaddr - phdr.p_vaddr
+        return -1
 
-            stream = BytesIO(shdr.data)
-            stream.seek(0)
+    def get_str(self, strtab: Elf32_Shdr, index) -> str:
+        return self.get_strtab(strtab).get(index)
 
-            strtab = self.shdrs[shdr.sh_link]
-            data = strtab.data
+    def count_strings(self):
+        # 已经解析出的字符串数，用于统计
+        return sum(len(strtab.strings) for strtab in self.strtabs.values())
 
-            self.symtab = []
-            while True:
-                buf = stream.read(shdr.sh_entsize)
-                if not buf:
-                    break
-                sym = Elf32_Sym.from_buffer_copy(buf)
-                sym.name = self.get_str(data, sym.st_name)
-                self.symtab.append(sym)
+    def get_st_bind(self, info):
 
-    def print_symbols(self):
-        for sym in self.symtab:
+        return info >> 4
 
-            logger.info("symbol name %s", sym.name)
-            logger.info(f"symbol value 0x{sym.st_value:x}")
-            logger.info(f"symbol size 0x{sym.st_size:x}")
-            logger.info(f"symbol shndx {Elf32_Shdr.SHN.get_name(sym.st_shndx)}")
-            logger.info("symbol bind %s", Elf32_Sym.STB.get_name(self.get_st_bind(sym.st_info)))
-            logger.info("symbol type %s", Elf32_Sym.STT.get_name(self.get_st_type(sym.st_info)))
+    def get_st_type(self, info):
 
-            self.splitter(1)
-        self.splitter()
+        return info & 0xf
+
+    def get_st_info(self, bind, type):
+
+        return (bind << 4) | (type & 0xf)
+
+    @stage
+    def read_symbols(self):
+        # symtab 模块依赖本模块，只能在使用时导入
+        from symtab import read_symtab
+        self.symtab = read_symtab(self) or []
 
     def get_r_sym(self, info):
 
-        return info >> 8
+        return info >> self.layout.r_shift
 
     def get_r_type(self, info):
 
-        return info & 0xff
+        return info & self.layout.r_mask
 
     def get_r_info(self, sym, type):
 
-        return (sym << 8) | type
+        return (sym << self.layout.r_shift) | type
 
+    @stage
     def read_rel(self):
         self.reltab = []
 
         types = {
-            Elf32_Shdr.SHT.SHT_REL: Elf32_Rel,
-            Elf32_Shdr.SHT.SHT_RELA: Elf32_Rela,
+            Elf32_Shdr.SHT.SHT_REL: self.layout.Rel,
+            Elf32_Shdr.SHT.SHT_RELA: self.layout.Rela,
         }
 
         for shdr in self.shdrs:
             if shdr.sh_type not in types:
                 continue
 
-            stream = BytesIO(shdr.data)
-            stream.seek(0)
-
             cls = types[shdr.sh_type]
+            self.reltab.extend(self.read_structs(
+                cls, shdr.sh_offset, shdr.sh_size // sizeof(cls)))
 
-            while True:
-                data = stream.read(sizeof(cls))
-                if not data:
-                    break
-                rel = cls.from_buffer_copy(data)
-                self.reltab.append(rel)
-
-    def print_rel(self):
-        for rel in self.reltab:
-            cls = type(rel)
-            logger.info(f"rel offset 0x{rel.r_offset:x}")
-            logger.info("rel sym %s", self.get_r_sym(rel.r_info))
-            logger.info("rel type %s", cls.R.get_name(self.get_r_type(rel.r_info)))
-            if isinstance(cls, Elf32_Rela):
-                logger.info(f"rel addend 0x{rel.r_addend:x}")
-
-            self.splitter(1)
-        self.splitter()
-
+    @stage
     def read_phdrs(self):
-        self.phdrs = []
-        file = self.file
         header = self.header
 
-        file.seek(header.e_phoff)
-
-        for _ in range(header.e_phnum):
-            data = file.read(header.e_phentsize)
-            phdr = Elf32_Phdr.from_buffer_copy(data)
-            self.phdrs.append(phdr)
-
-        for phdr in self.phdrs:
-            if phdr.p_filesz == 0:
-                phdr.data = None
-            else:
-                file.seek(phdr.p_offset)
-                phdr.data = file.read(phdr.p_filesz)
-
-    def print_phdrs(self):
-        for phdr in self.phdrs:
-            logger.info(f"phdr type --> {Elf32_Phdr.PT.get_name(phdr.p_type)}")
-            logger.info(f"phdr offset --> 0x{phdr.p_offset:x}")
-            logger.info(f"phdr vaddr --> 0x{phdr.p_vaddr:x}")
-            logger.info(f"phdr paddr --> 0x{phdr.p_paddr:x}")
-            logger.info(f"phdr filesz --> 0x{phdr.p_filesz:x}")
-            logger.info(f"phdr memsz --> 0x{phdr.p_memsz:x}")
-            flags = set([phdr.p_flags & (1 << var) for var in range(32)])
-            logger.info(f'phdr flags --> {[Elf32_Phdr.PF.get_name(flag) for flag in flags if flag ]}')
-            logger.info(f"phdr align --> 0x{phdr.p_align:x}")
-            # logger.info(f"phdr data --> {phdr.data}")
-            self.splitter(1)
-        self.splitter()
+        entsize = header.e_phentsize or sizeof(self.layout.Phdr)
+        self.phdrs = SegmentTable(self, self.get_data(header.e_phoff, header.e_phnum * entsize), entsize)
+        if self.stats is not None:
+            self.stats.structs += len(self.phdrs)
 
+    @stage
     def read_dyns(self):
         self.dyns = []
 
         for phdr in self.phdrs:
             if phdr.p_type != Elf32_Phdr.PT.PT_DYNAMIC:
                 continue
-            # logger.debug(phdr.data)
-
-            stream = BytesIO(phdr.data)
-            stream.seek(0)
 
-            while True:
-                data = stream.read(sizeof(Elf32_Dyn))
-                if not data:
-                    break
-                dyn = Elf32_Dyn.from_buffer_copy(data)
-                self.dyns.append(dyn)
+            self.dyns = DynamicTable(self, phdr.data)
+            if self.stats is not None:
+                self.stats.structs += len(self.dyns)
+            break
 
         # 经测试 .dynamic section 与 PT_DYNAMIC 的内容完全相同
 
-        # for shdr in self.shdrs:
-        #     if shdr.sh_type != Elf32_Shdr.SHT.SHT_DYNAMIC:
-        #         continue
-        #     logger.debug(shdr.data)
-
-    def print_dyns(self):
-
-        for dyn in self.dyns:
-            logger.info(f'dyn tag --> {Elf32_Dyn.DT.get_name(dyn.d_tag)}')
-            logger.info(f'dyn val 0x{dyn.d_un.d_val:x}')
-            # logger.info(f'dyn ptr 0x{dyn.d_un.d_ptr:x}')
-            self.splitter(1)
-        self.splitter()
-
     def elf_hash(self, name: bytes):
+        # .hash 节使用的 SysV 哈希函数
         h = 0
-        g = 0
-
-        index = 0
-        while len(name) < index and name[index]:
-            h = (h << 4) + name[index]
-            if g == (h & 0xf0000000):
+        for char in name:
+            h = ((h << 4) + char) & 0xffffffff
+            g = h & 0xf0000000
+            if g:
                 h ^= g >> 24
             h &= ~g
-            index += 1
         return h
 
-    def read_got(self):
-        pass
-
-    def test(self):
-
-        self.splitter()
-        self.read_header()
-        # self.print_header()
-
-        self.read_shdrs()
-        # self.print_shdrs()
-
-        self.read_symbols()
-        # self.print_symbols()
-
-        self.read_rel()
-        self.print_rel()
-
-        self.read_phdrs()
-        # self.print_phdrs()
-
-        self.read_dyns()
-        # self.print_dyns()
-
-        self.read_got()
-
+    def gnu_hash(self, name: bytes):
+        # .gnu.hash 节使用的 DJB 哈希函数
+        h = 5381
+        for char in name:
+            h = (h * 33 + char) & 0xffffffff
+        return h
 
-if __name__ == '__main__':
-    unittest.main()
+    @stage
+    def read_got(self):
+        # got 模块依赖本模块，只能在使用时导入
+        from got import read_plt
+        self.got = read_plt(self)
@@ -0,0 +1,274 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import argparse
+import os
+from array import array
+from ctypes import sizeof
+from typing import *
+
+from columns import struct_layout, encode_columns
+from elf import ElfIdent, ElfLayout, Elf32_Ehdr, Elf32_Shdr, Elf32_Sym, Elf32_Phdr, Elf32_Dyn
+from strtab import build_strtab
+
+'''
+生成指定规模的 ELF 文件，用于测试和性能测试
+
+生成的文件为共享库，只有一个覆盖整个文件的 PT_LOAD 段，节的布局为：
+
+    .text.0 ... .text.N, .symtab, .strtab, .rel(a).text.0, .dynamic, .dynstr, .shstrtab
+
+python src/elfgen.py -b 64 -s 100000 -r 100000 build/gen64.so
+'''
+
+CLASSES = {
+    32: ElfIdent.CLASS.ELFCLASS32,
+    64: ElfIdent.CLASS.ELFCLASS64,
+}
+
+DATAS = {
+    'little': ElfIdent.DATA.ELFDATA2LSB,
+    'big': ElfIdent.DATA.ELFDATA2MSB,
+}
+
+MACHINES = {
+    (32, 'little'): Elf32_Ehdr.EM.EM_386,
+    (64, 'little'): Elf32_Ehdr.EM.EM_X86_64,
+    (32, 'big'): Elf32_Ehdr.EM.EM_PPC,
+    (64, 'big'): Elf32_Ehdr.EM.EM_PPC64,
+}
+
+# R_386_32, R_X86_64_64, R_PPC_ADDR32 的值都是 1
+R_TYPE = 1
+
+ALIGN = 8
+
+
+def align(value, alignment=ALIGN):
+    return (value + alignment - 1) // alignment * alignment
+
+
+class Section(object):
+
+    def __init__(self, name, sh_type, data=b'', size=None, flags=0, entsize=0, link=0, info=0):
+        self.name = name
+        self.sh_type = sh_type
+        self.data = data
+        self.size = len(data) if size is None else size
+        self.flags = flags
+        self.entsize = entsize
+        self.link = link
+        self.info = info
+        self.offset = 0
+
+
+def generate(bits=32, byteorder='little', sections=8, symbols=1024, relocations=1024,
+             dynamics=16, section_size=256) -> bytearray:
+    '''
+    生成 ELF 文件的内容
+
+    sections 为 .text.N 节的个数，symbols、relocations 不含索引 0 的空表项，
+    dynamics 为 DT_NEEDED 的个数加上结尾的 DT_NULL，不为 0 时另有指向 .dynstr 的 DT_STRTAB 和 DT_STRSZ
+    '''
+    layout = ElfLayout.get(CLASSES[bits], DATAS[byteorder])
+    SHT = Elf32_Shdr.SHT
+    SHF = Elf32_Shdr.SHF
+    sections = max(sections, 1)
+
+    items = [Section('', SHT.SHT_NULL)]
+    for index in range(sections):
+        items.append(Section(
+            f'.text.{index}', SHT.SHT_PROGBITS, bytes(section_size),
+            flags=SHF.SHF_ALLOC | SHF.SHF_EXECINSTR))
+
+    symtab = Section('.symtab', SHT.SHT_SYMTAB, entsize=sizeof(layout.Sym), info=1)
+    strtab = Section('.strtab', SHT.SHT_STRTAB)
+    rela = bits == 64
+    rel_cls = layout.Rela if rela else layout.Rel
+    reltab = Section(
+        '.rela.text.0' if rela else '.rel.text.0',
+        SHT.SHT_RELA if rela else SHT.SHT_REL,
+        entsize=sizeof(rel_cls), flags=SHF.SHF_INFO_LINK, info=1)
+    dynamic = Section('.dynamic', SHT.SHT_DYNAMIC, entsize=sizeof(layout.Dyn),
+                      flags=SHF.SHF_ALLOC | SHF.SHF_WRITE)
+    dynstr = Section('.dynstr', SHT.SHT_STRTAB, flags=SHF.SHF_ALLOC)
+    shstrtab = Section('.shstrtab', SHT.SHT_STRTAB)
+    items.extend((symtab, strtab, reltab, dynamic, dynstr, shstrtab))
+
+    indices = {id(item): index for index, item in enumerate(items)}
+    symtab.link = indices[id(strtab)]
+    reltab.link = indices[id(symtab)]
+    dynamic.link = indices[id(dynstr)]
+
+    strtab.data, st_names = build_strtab(f'generated_symbol_{index}' for index in range(symbols))
+    strtab.size = len(strtab.data)
+    dynstr.data, d_names = build_strtab(f'libgenerated{index}.so' for index in range(max(dynamics - 1, 0)))
+    dynstr.size = len(dynstr.data)
+    shstrtab.data, sh_names = build_strtab(item.name for item in items)
+    shstrtab.size = len(shstrtab.data)
+
+    symtab.size = (symbols + 1) * symtab.entsize
+    reltab.size = relocations * reltab.entsize
+    dynamic.size = (dynamics + 2) * dynamic.entsize if dynamics else 0
+
+    # 先确定所有偏移，再一次性分配整个文件
+    phnum = 2 if dynamics else 1
+    offset = sizeof(layout.Ehdr) + phnum * sizeof(layout.Phdr)
+    for item in items[1:]:
+        offset = align(offset)
+        item.offset = offset
+        offset += item.size
+    shoff = align(offset)
+    total = shoff + len(items) * sizeof(layout.Shdr)
+
+    buf = bytearray(total)
+    view = memoryview(buf)
+
+    buf[0:4] = ElfIdent.MAGIC.ELFMAG.encode('latin1')
+    buf[4] = CLASSES[bits]
+    buf[5] = DATAS[byteorder]
+    buf[6] = Elf32_Ehdr.EV.EV_CURRENT
+
+    header = layout.Ehdr.from_buffer(buf, 0)
+    header.e_type = Elf32_Ehdr.ET.ET_DYN
+    header.e_machine = MACHINES[(bits, byteorder)]
+    header.e_version = Elf32_Ehdr.EV.EV_CURRENT
+    header.e_phoff = sizeof(layout.Ehdr)
+    header.e_shoff = shoff
+    header.e_ehsize = sizeof(layout.Ehdr)
+    header.e_phentsize = sizeof(layout.Phdr)
+    header.e_phnum = phnum
+    header.e_shentsize = sizeof(layout.Shdr)
+    header.e_shnum = len(items)
+    header.e_shstrndx = indices[id(shstrtab)]
+
+    phdrs = (layout.Phdr * phnum).from_buffer(buf, header.e_phoff)
+    load = phdrs[0]
+    load.p_type = Elf32_Phdr.PT.PT_LOAD
+    load.p_flags = Elf32_Phdr.PF.PF_R | Elf32_Phdr.PF.PF_X
+    load.p_filesz = load.p_memsz = total
+    load.p_align = 0x1000
+    if dynamics:
+        segment = phdrs[1]
+        segment.p_type = Elf32_Phdr.PT.PT_DYNAMIC
+        segment.p_flags = Elf32_Phdr.PF.PF_R | Elf32_Phdr.PF.PF_W
+        segment.p_offset = segment.p_vaddr = segment.p_paddr = dynamic.offset
+        segment.p_filesz = segment.p_memsz = dynamic.size
+        segment.p_align = ALIGN
+
+    for item in items:
+        if item.data:
+            buf[item.offset:item.offset + len(item.data)] = item.data
+
+    # 表格型的节按列写入，不逐项创建结构体
+    text = items[1]
+    if symbols:
+        count = symbols + 1
+        st_shndx = array('Q', [0])
+        st_shndx.extend(1 + index % sections for index in range(symbols))
+        st_value = array('Q', [0])
+        st_value.extend(
+            items[shndx].offset + (index * 16) % section_size
+            for index, shndx in enumerate(st_shndx[1:]))
+        columns = {
+            'st_name': array('Q', [0] + st_names),
+            'st_value': st_value,
+            'st_size': array('Q', [0]) + array('Q', [16]) * symbols,
+            'st_info': array('B', [0]) + array('B', [
+                Elf32_Sym.STB.STB_GLOBAL << 4 | Elf32_Sym.STT.STT_FUNC]) * symbols,
+            'st_shndx': st_shndx,
+        }
+        encode_columns(
+            view[symtab.offset:symtab.offset + count * symtab.entsize],
+            symtab.entsize, struct_layout(layout.Sym), columns, byteorder)
+
+    if relocations:
+        columns = {
+            'r_offset': array('Q', (text.offset + (index * 4) % section_size for index in range(relocations))),
+            'r_info': array('Q', (
+                ((1 + index % symbols) if symbols else 0) << layout.r_shift | R_TYPE
+                for index in range(relocations))),
+        }
+        if rela:
+            columns['r_addend'] = array('q', (index % 16 for index in range(relocations)))
+        encode_columns(
+            view[reltab.offset:reltab.offset + reltab.size],
+            reltab.entsize, struct_layout(rel_cls), columns, byteorder)
+
+    if dynamics:
+        cls = layout.Dyn
+        # 整个文件映射在地址 0，.dynstr 的地址就是它的偏移
+        d_tag = array('Q', [Elf32_Dyn.DT.DT_NEEDED]) * (dynamics - 1)
+        d_tag.extend((Elf32_Dyn.DT.DT_STRTAB, Elf32_Dyn.DT.DT_STRSZ, Elf32_Dyn.DT.DT_NULL))
+        d_val = array('Q', d_names + [dynstr.offset, dynstr.size, 0])
+        encode_columns(
+            view[dynamic.offset:dynamic.offset + dynamic.size], dynamic.entsize,
+            [('d_tag', cls.d_tag.offset, cls.d_tag.size), ('d_val', cls.d_un.offset, cls.d_un.size)],
+            {'d_tag': d_tag, 'd_val': d_val}, byteorder)
+
+    shdrs = (layout.Shdr * len(items)).from_buffer(buf, shoff)
+    for index, item in enumerate(items[1:], 1):
+        shdr = shdrs[index]
+        shdr.sh_name = sh_names[index]
+        shdr.sh_type = item.sh_type
+        shdr.sh_flags = item.flags
+        shdr.sh_addr = item.offset if item.flags & SHF.SHF_ALLOC else 0
+        shdr.sh_offset = item.offset
+        shdr.sh_size = item.size
+        shdr.sh_link = item.link
+        shdr.sh_info = item.info
+        shdr.sh_addralign = ALIGN if item.entsize else 1
+        shdr.sh_entsize = item.entsize
+
+    del header, phdrs, load, shdrs
+    view.release()
+    return buf
+
+
+def write(filename, **kwargs):
+    data = generate(**kwargs)
+    with open(filename, 'wb') as file:
+        file.write(data)
+    return filename
+
+
+def generate_corpus(directory, sizes: Iterable[int] = (1000, 10000, 100000),
+                    classes: Iterable[int] = (32, 64), byteorder='little') -> List[str]:
+    '''
+    按规模生成一组文件，节数为符号数的 1/100，重定位数与符号数相同
+    '''
+    os.makedirs(directory, exist_ok=True)
+    filenames = []
+    for bits in classes:
+        for size in sizes:
+            filename = os.path.join(directory, f'gen{bits}-{byteorder}-{size}.so')
+            write(filename, bits=bits, byteorder=byteorder, sections=max(size // 100, 1),
+                  symbols=size, relocations=size, dynamics=min(size // 100, 1000) + 1)
+            filenames.append(filename)
+    return filenames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='generate synthetic elf files')
+    parser.add_argument('output', help='output file name')
+    parser.add_argument('-b', '--bits', type=int, choices=sorted(CLASSES), default=32)
+    parser.add_argument('-e', '--byteorder', choices=sorted(DATAS), default='little')
+    parser.add_argument('-S', '--sections', type=int, default=8, help='number of .text sections')
+    parser.add_argument('-s', '--symbols', type=int, default=1024)
+    parser.add_argument('-r', '--relocations', type=int, default=1024)
+    parser.add_argument('-d', '--dynamics', type=int, default=16, help='dynamic entries including DT_NULL')
+    parser.add_argument('--section-size', type=int, default=256)
+    args = parser.parse_args(argv)
+
+    write(args.output, bits=args.bits, byteorder=args.byteorder, sections=args.sections,
+          symbols=args.symbols, relocations=args.relocations, dynamics=args.dynamics,
+          section_size=args.section_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+from array import array
+from bisect import bisect_right
+from typing import *
+
+from elf import ElfFile, Elf32_Ehdr, Elf32_Rel, Elf32_Shdr, Elf64_Rel
+from reloc import RelocationTable
+from stats import stage
+from symtab import SymbolTable
+
+'''
+GOT/PLT 解码
+
+GOT 槽的地址和符号来自 JUMP_SLOT/GLOB_DAT 重定位，
+PLT 桩通过解码每一项中的间接跳转找到它使用的 GOT 槽，
+同时支持 .plt, .plt.sec (IBT) 和 .plt.got，不依赖项的顺序和重定位的顺序
+'''
+
+# 每种机器上引用 GOT 槽的重定位类型
+SLOT_TYPES = {
+    Elf32_Ehdr.EM.EM_386: {
+        Elf32_Rel.R.R_386_GLOB_DAT,
+        Elf32_Rel.R.R_386_JMP_SLOT,
+    },
+    Elf32_Ehdr.EM.EM_X86_64: {
+        Elf64_Rel.R.R_X86_64_GLOB_DAT,
+        Elf64_Rel.R.R_X86_64_JUMP_SLOT,
+    },
+}
+
+# PLT 项中的间接跳转：jmp *abs32 / jmp *disp32(%ebx) / jmp *disp32(%rip)
+JMP_ABSOLUTE = b'\xff\x25'
+JMP_EBX = b'\xff\xa3'
+
+# 节名 -> 项的大小，.plt 的第一项是调用动态链接器的公共项，解码出的槽不对应符号
+PLT_SECTIONS = {
+    '.plt': 16,
+    '.plt.sec': 16,
+    '.plt.got': 8,
+}
+
+
+class PltIndex(object):
+
+    '''
+    PLT 桩和 GOT 槽 -> 导入符号 的索引
+
+    slots: GOT 槽地址 -> 符号名
+    stubs: PLT 桩地址 -> 符号名
+    starts, ends, names: 按地址排序的桩区间，lookup 用二分查找定位桩内的任意地址
+    '''
+
+    def __init__(self, elf: ElfFile):
+        self.elf = elf
+        self.slots = {}
+        self.stubs = {}
+        self.starts = array('Q')
+        self.ends = array('Q')
+        self.names = []
+
+        types = SLOT_TYPES.get(elf.header.e_machine)
+        if types is None:
+            return
+
+        self.read_slots(types)
+        self.read_stubs()
+
+    def read_slots(self, types: Set[int]):
+        elf = self.elf
+        relocations = {
+            Elf32_Shdr.SHT.SHT_REL,
+            Elf32_Shdr.SHT.SHT_RELA,
+        }
+
+        # .rel.dyn 和 .rel.plt 通常引用同一张 .dynsym，只解码一次
+        symtabs = {}
+        for shdr in elf.shdrs:
+            if shdr.sh_type not in relocations or not shdr.sh_link:
+                continue
+            reltab = RelocationTable(elf, shdr)
+            symtab = symtabs.get(reltab.link)
+            if symtab is None:
+                symtab = symtabs[reltab.link] = SymbolTable(elf, elf.shdrs[reltab.link])
+
+            for offset, type, sym in zip(reltab.r_offset, reltab.r_type, reltab.r_sym):
+                if type in types and sym:
+                    self.slots[offset] = symtab.get_name(sym)
+
+    def read_stubs(self):
+        elf = self.elf
+        shdrs = elf.shdrs
+
+        # i386 的 PIC 桩相对于 %ebx 跳转，%ebx 指向 .got.plt，没有时指向 .got
+        got = 0
+        for shdr in shdrs:
+            if shdr.name == '.got.plt':
+                got = shdr.sh_addr
+                break
+            if shdr.name == '.got':
+                got = shdr.sh_addr
+
+        bits64 = elf.header.e_machine == Elf32_Ehdr.EM.EM_X86_64
+        stubs = []
+        for shdr in shdrs:
+            entsize = PLT_SECTIONS.get(shdr.name)
+            if entsize is None or shdr.sh_type != Elf32_Shdr.SHT.SHT_PROGBITS:
+                continue
+            data = bytes(shdr.data)
+            for start in range(0, len(data) - entsize + 1, entsize):
+                slot = self.decode_jump(data, start, start + entsize, shdr.sh_addr, got, bits64)
+                name = self.slots.get(slot)
+                if name is not None:
+                    stubs.append((shdr.sh_addr + start, entsize, name))
+
+        stubs.sort()
+        for address, size, name in stubs:
+            self.stubs[address] = name
+            self.starts.append(address)
+            self.ends.append(address + size)
+            self.names.append(name)
+
+    @staticmethod
+    def decode_jump(data: bytes, start, end, base, got, bits64) -> Optional[int]:
+        '''
+        返回 data[start:end] 中第一个间接跳转读取的 GOT 槽地址，
+        跳转指令共 6 字节，2 字节的操作码最晚从 end - 6 开始
+        '''
+        position = data.find(JMP_ABSOLUTE, start, end - 4)
+        if position >= 0:
+            if bits64:
+                displacement = int.from_bytes(data[position + 2:position + 6], 'little', signed=True)
+                return base + position + 6 + displacement
+            return int.from_bytes(data[position + 2:position + 6], 'little')
+
+        if bits64:
+            return None
+        position = data.find(JMP_EBX, start, end - 4)
+        if position >= 0:
+            displacement = int.from_bytes(data[position + 2:position + 6], 'little', signed=True)
+            return (got + displacement) & 0xffffffff
+        return None
+
+    def __len__(self):
+        return len(self.starts)
+
+    def get_slot(self, address) -> Optional[str]:
+        return self.slots.get(address)
+
+    def get_stub(self, address) -> Optional[str]:
+        return self.stubs.get(address)
+
+    def lookup(self, address) -> Optional[Tuple[str, int]]:
+        '''
+        返回 (符号名, 地址相对于桩的偏移)，不在任何桩内时返回 None
+        '''
+        position = bisect_right(self.starts, address) - 1
+        if position < 0 or address >= self.ends[position]:
+            return None
+        return self.names[position], address - self.starts[position]
+
+
+@stage
+def read_plt(elf: ElfFile) -> PltIndex:
+    return PltIndex(elf)
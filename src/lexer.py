@@ -0,0 +1,201 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import mmap
+import re
+import sys
+from array import array
+from bisect import bisect_right
+from typing import *
+
+'''
+C 词法分析
+
+源文件通过 mmap 映射，由一个合并的正则表达式 (PATTERN) 按顺序匹配，
+匹配到的分组号 (lastindex) 查表得到记号的种类，不逐个字符判断。
+记号为元组 (种类, 起始偏移, 结束偏移, 值)，文本只在需要时通过偏移取出；
+标识符和关键字的值为 intern 过的字符串，同一个名字只保存一份，
+运算符的值为表中的字符串常量，其它记号的值为 None。
+
+数字按预处理数 (pp-number) 匹配，再分为整数和浮点数，1e、0x1.p 这样都不是的为 OTHER；
+不能构成任何记号的字符（@、单独的引号等）也是 OTHER，词法分析本身不会出错，
+由预处理或语法分析在用到的时候报告
+'''
+
+
+class Token(object):
+    # 记号的种类
+    EOF = 0
+    NEWLINE = 1
+    IDENTIFIER = 2
+    KEYWORD = 3
+    INTEGER = 4
+    FLOAT = 5
+    CHAR = 6
+    STRING = 7
+    PUNCTUATOR = 8
+    OTHER = 9
+
+
+KEYWORDS = (
+    'auto', 'break', 'case', 'char', 'const', 'continue', 'default', 'do',
+    'double', 'else', 'enum', 'extern', 'float', 'for', 'goto', 'if',
+    'inline', 'int', 'long', 'register', 'restrict', 'return', 'short', 'signed',
+    'sizeof', 'static', 'struct', 'switch', 'typedef', 'union', 'unsigned', 'void',
+    'volatile', 'while', '_Alignas', '_Alignof', '_Atomic', '_Bool', '_Complex', '_Generic',
+    '_Imaginary', '_Noreturn', '_Static_assert', '_Thread_local',
+)
+
+PUNCTUATORS = (
+    '%:%:', '...', '<<=', '>>=',
+    '->', '++', '--', '<<', '>>', '<=', '>=', '==', '!=', '&&', '||',
+    '*=', '/=', '%=', '+=', '-=', '&=', '^=', '|=', '##', '<:', ':>', '<%', '%>', '%:',
+    '[', ']', '(', ')', '{', '}', '.', '&', '*', '+', '-', '~', '!',
+    '/', '%', '<', '>', '^', '|', '?', ':', ';', '=', ',', '#',
+)
+
+# 多字符的运算符在前保证最长匹配，其余的合并为字符类，比逐个尝试 57 个字面量快
+PUNCTUATOR_PATTERN = (
+    rb'\.\.\.|%:%:|<<=|>>=|->|\+\+|--|<<|>>|&&|\|\||##|<:|:>|<%|%>|%:'
+    rb'|[-+*/%&|^!=<>]=?|[\[\](){}.~?:;,#]'
+)
+
+FLOAT_PATTERN = re.compile(
+    rb'(?:0[xX](?:[0-9a-fA-F]*\.[0-9a-fA-F]+|[0-9a-fA-F]+\.?)[pP][+-]?[0-9]+'
+    rb'|(?:[0-9]*\.[0-9]+|[0-9]+\.)(?:[eE][+-]?[0-9]+)?|[0-9]+[eE][+-]?[0-9]+)[fFlL]?')
+INTEGER_PATTERN = re.compile(
+    rb'(?:0[xX][0-9a-fA-F]+|0[bB][01]+|[0-9]+)(?:[uU](?:ll|LL|[lL])?|(?:ll|LL|[lL])[uU]?)?')
+
+# 分组号 -> 种类，顺序即匹配的优先级，最常见的空白、标识符和运算符放在前面；
+# 标识符不匹配字符和字符串的前缀 (L'a', u8"a")，预处理数在运算符之前，.5 不拆成 . 和 5；
+# 最后的 OTHER 把非 ASCII 字符的 UTF-8 序列作为一个记号
+RULES = (
+    (None, rb'(?:[ \t\r\f\v]+|\\\r?\n|//[^\n]*|/\*[\s\S]*?\*/)+'),
+    (Token.IDENTIFIER, rb'(?!(?:u8|[LuU])[\'"])[A-Za-z_][A-Za-z0-9_]*'),
+    # 预处理数，在 tokenize 中再分为整数和浮点数
+    (Token.INTEGER, rb'\.?[0-9](?:[eEpP][+-]|[A-Za-z0-9_.])*'),
+    (Token.PUNCTUATOR, PUNCTUATOR_PATTERN),
+    (Token.NEWLINE, rb'\n'),
+    (Token.CHAR, rb"(?:u8|[LuU])?'(?:[^'\\\n]|\\[\s\S])*'"),
+    (Token.STRING, rb'(?:u8|[LuU])?"(?:[^"\\\n]|\\[\s\S])*"'),
+    (Token.OTHER, rb'[\xc0-\xff][\x80-\xbf]*|[\s\S]'),
+)
+
+PATTERN = re.compile(b'|'.join(b'(' + pattern + b')' for _, pattern in RULES))
+
+# 分组号从 1 开始
+KINDS = (None, ) + tuple(kind for kind, _ in RULES)
+SKIP = 1
+NEWLINE = KINDS.index(Token.NEWLINE)
+IDENTIFIER = KINDS.index(Token.IDENTIFIER)
+NUMBER = KINDS.index(Token.INTEGER)
+PUNCTUATOR = KINDS.index(Token.PUNCTUATOR)
+
+PUNCTUATOR_VALUES = {punctuator.encode('ascii'): sys.intern(punctuator) for punctuator in PUNCTUATORS}
+
+
+def keyword_table() -> Dict[bytes, Tuple[int, str]]:
+    '''
+    名字表的初始内容，名字 -> (种类, intern 过的字符串)
+    '''
+    return {keyword.encode('ascii'): (Token.KEYWORD, sys.intern(keyword)) for keyword in KEYWORDS}
+
+
+def tokenize(data, names: Dict[bytes, Tuple[int, str]] = None, newlines=False,
+             start=0, end=None) -> Iterator[tuple]:
+    '''
+    data 可以是 bytes 或 mmap，names 为名字表，多个文件共用同一张表时相同的名字只保存一份；
+    newlines 为 True 时输出 NEWLINE 记号，供预处理使用
+    '''
+    if names is None:
+        names = keyword_table()
+    if end is None:
+        end = len(data)
+
+    identifier = Token.IDENTIFIER
+    punctuator = Token.PUNCTUATOR
+    kinds = KINDS
+    punctuators = PUNCTUATOR_VALUES
+    integer = INTEGER_PATTERN.fullmatch
+    floating = FLOAT_PATTERN.fullmatch
+    for match in PATTERN.finditer(data, start, end):
+        index = match.lastindex
+        if index == SKIP:
+            continue
+        begin, finish = match.span()
+        if index == IDENTIFIER:
+            text = data[begin:finish]
+            entry = names.get(text)
+            if entry is None:
+                entry = names[text] = (identifier, sys.intern(text.decode('ascii')))
+            yield (entry[0], begin, finish, entry[1])
+        elif index == PUNCTUATOR:
+            yield (punctuator, begin, finish, punctuators[data[begin:finish]])
+        elif index == NUMBER:
+            text = data[begin:finish]
+            if integer(text):
+                yield (Token.INTEGER, begin, finish, None)
+            elif floating(text):
+                yield (Token.FLOAT, begin, finish, None)
+            else:
+                yield (Token.OTHER, begin, finish, None)
+        elif index == NEWLINE:
+            if newlines:
+                yield (Token.NEWLINE, begin, finish, None)
+        else:
+            yield (kinds[index], begin, finish, None)
+
+
+class Lexer(object):
+
+    '''
+    对一个源文件做词法分析，文件只映射一次，记号的文本和行号在需要时才计算
+    '''
+
+    def __init__(self, filename, names: Dict[bytes, Tuple[int, str]] = None):
+        self.filename = filename
+        self.names = keyword_table() if names is None else names
+        self.file = open(filename, 'rb')
+        # 空文件不能映射
+        if self.file.seek(0, 2):
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.data = b''
+        self.lines = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data = b''
+        self.file.close()
+
+    def tokens(self, newlines=False) -> Iterator[tuple]:
+        return tokenize(self.data, self.names, newlines)
+
+    __iter__ = tokens
+
+    def text(self, token: tuple) -> str:
+        if token[3] is not None:
+            return token[3]
+        return str(self.data[token[1]:token[2]], 'utf8')
+
+    def position(self, offset) -> Tuple[int, int]:
+        '''
+        偏移 -> (行号, 列号)，都从 1 开始，换行的位置只在第一次查询时统计
+        '''
+        if self.lines is None:
+            self.lines = array('Q', (match.end() for match in re.finditer(b'\n', self.data)))
+        line = bisect_right(self.lines, offset)
+        start = self.lines[line - 1] if line else 0
+        return line + 1, offset - start + 1
@@ -0,0 +1,532 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import argparse
+import os
+import struct
+from array import array
+from collections import namedtuple
+from ctypes import sizeof
+from typing import *
+
+from columns import encode_columns, struct_layout
+from elf import ElfFile, ElfIdent, ElfLayout, Elf32_Ehdr, Elf32_Phdr, Elf32_Rel, Elf32_Shdr, Elf32_Sym
+from elfgen import align
+from logger import logger
+from reloc import read_reltabs
+from strtab import build_strtab
+from symtab import SymbolTable, read_symtab
+
+'''
+i386 静态链接
+
+读入 ELF32 可重定位文件，按节名合并为 .text, .rodata, .data, .bss，
+全局符号通过名字 -> 定义 的字典解析，R_386_32 / R_386_PC32 按重定位表整表应用，
+输出的可执行文件布局与 ld -m elf_i386 -static 相同：
+
+    R (文件头和程序头), R E (.text), R (.rodata), RW (.data, .bss)
+
+每个段从新的页开始，虚拟地址为 0x08048000 + 文件偏移，
+整个文件先计算好大小再一次性分配，各个输入节的内容直接复制到最终的位置
+
+python src/linker.py -e main -o build/test build/test.o
+'''
+
+BASE = 0x08048000
+PAGE = 0x1000
+
+SHT = Elf32_Shdr.SHT
+SHF = Elf32_Shdr.SHF
+SHN = Elf32_Shdr.SHN
+STB = Elf32_Sym.STB
+STT = Elf32_Sym.STT
+PF = Elf32_Phdr.PF
+
+# 输出节: 节名, 类型, 标志, 所在的段
+OUTPUTS = (
+    ('.text', SHT.SHT_PROGBITS, SHF.SHF_ALLOC | SHF.SHF_EXECINSTR, PF.PF_R | PF.PF_X),
+    ('.rodata', SHT.SHT_PROGBITS, SHF.SHF_ALLOC, PF.PF_R),
+    ('.data', SHT.SHT_PROGBITS, SHF.SHF_ALLOC | SHF.SHF_WRITE, PF.PF_R | PF.PF_W),
+    ('.bss', SHT.SHT_NOBITS, SHF.SHF_ALLOC | SHF.SHF_WRITE, PF.PF_R | PF.PF_W),
+)
+
+SEGMENTS = (
+    PF.PF_R | PF.PF_X,
+    PF.PF_R,
+    PF.PF_R | PF.PF_W,
+)
+
+Definition = namedtuple('Definition', [
+    'input',
+    'index',
+    'bind',
+])
+
+InputFile = namedtuple('InputFile', [
+    'elf',
+    'symtab',
+    'reltabs',
+])
+
+
+def bfd_hash(name: str) -> int:
+    '''
+    BFD 哈希表的哈希函数 (bfd_hash_hash)
+    '''
+    value = 0
+    for char in name.encode('utf8'):
+        value = (value + char + (char << 17)) & 0xffffffff
+        value ^= value >> 2
+    length = len(name.encode('utf8'))
+    value = (value + length + (length << 17)) & 0xffffffff
+    value ^= value >> 2
+    return value
+
+
+def bfd_hash_size(count) -> int:
+    # 初始大小为 4051，元素数超过 3/4 时加倍
+    size = 4051
+    while count > size * 3 // 4:
+        size *= 2
+    return size
+
+
+def output_name(section) -> str:
+    '''
+    输入节合并到的输出节，.text.foo 合并到 .text，其它的按类型和标志归类
+    '''
+    name = section.name
+    for output, *_ in OUTPUTS:
+        if name == output or name.startswith(output + '.'):
+            return output
+    if section.sh_type == SHT.SHT_NOBITS:
+        return '.bss'
+    if section.sh_flags & SHF.SHF_EXECINSTR:
+        return '.text'
+    if section.sh_flags & SHF.SHF_WRITE:
+        return '.data'
+    return '.rodata'
+
+
+class Linker(object):
+
+    '''
+    inputs: 读入的文件，链接结束前保持打开
+    definitions: 全局符号名 -> Definition，强符号覆盖弱符号，两个强符号重复定义时报错
+    commons: SHN_COMMON 符号名 -> (大小, 对齐)，没有其它定义时放在 .bss 中
+    '''
+
+    def __init__(self, entry='_start'):
+        self.entry = entry
+        self.inputs = []
+        self.definitions = {}
+        self.commons = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        for input in self.inputs:
+            input.elf.close()
+        self.inputs.clear()
+
+    def add(self, filename):
+        elf = ElfFile(filename)
+        try:
+            elf.read_header()
+            header = elf.header
+            if elf.layout.bits != 32 or header.e_machine != Elf32_Ehdr.EM.EM_386:
+                raise ValueError(f'{filename} is not an i386 elf file')
+            if header.e_type != Elf32_Ehdr.ET.ET_REL:
+                raise ValueError(f'{filename} is not a relocatable file')
+            elf.read_shdrs()
+            symtab = read_symtab(elf)
+            if symtab is None:
+                raise ValueError(f'{filename} has no symbol table')
+            input = InputFile(elf, symtab, read_reltabs(elf))
+        except Exception:
+            elf.close()
+            raise
+
+        self.inputs.append(input)
+        self.define(len(self.inputs) - 1, symtab)
+        return input
+
+    def define(self, input, symtab: SymbolTable):
+        definitions = self.definitions
+        for index in range(symtab.shdr.sh_info, len(symtab)):
+            bind = symtab.bind[index]
+            if bind == STB.STB_LOCAL:
+                continue
+            shndx = symtab.st_shndx[index]
+            if shndx == SHN.SHN_UNDEF:
+                continue
+            name = symtab.get_name(index)
+            if shndx == SHN.SHN_COMMON:
+                size, alignment = self.commons.get(name, (0, 1))
+                self.commons[name] = (max(size, symtab.st_size[index]), max(alignment, symtab.st_value[index]))
+                continue
+
+            old = definitions.get(name)
+            if old is None or old.bind == STB.STB_WEAK and bind != STB.STB_WEAK:
+                definitions[name] = Definition(input, index, bind)
+            elif bind != STB.STB_WEAK and old.bind != STB.STB_WEAK:
+                filename = self.inputs[old.input].elf.filename
+                raise ValueError(f'multiple definition of {name}, first defined in {filename}')
+
+    def layout_sections(self):
+        '''
+        确定每个输入节在输出节中的偏移，返回 (placements, sizes, aligns, commons)
+        '''
+        placements = {}
+        sizes = {name: 0 for name, *_ in OUTPUTS}
+        aligns = {name: 1 for name, *_ in OUTPUTS}
+        for number, input in enumerate(self.inputs):
+            for section in input.elf.shdrs:
+                if not section.sh_flags & SHF.SHF_ALLOC:
+                    continue
+                name = output_name(section)
+                alignment = max(section.sh_addralign, 1)
+                offset = align(sizes[name], alignment)
+                placements[(number, section.index)] = (name, offset)
+                sizes[name] = offset + section.sh_size
+                aligns[name] = max(aligns[name], alignment)
+
+        commons = {}
+        for name, (size, alignment) in self.commons.items():
+            if name in self.definitions:
+                continue
+            alignment = max(alignment, 1)
+            offset = align(sizes['.bss'], alignment)
+            commons[name] = offset
+            sizes['.bss'] = offset + size
+            aligns['.bss'] = max(aligns['.bss'], alignment)
+        return placements, sizes, aligns, commons
+
+    def link(self) -> bytearray:
+        layout = ElfLayout.get(ElfIdent.CLASS.ELFCLASS32, ElfIdent.DATA.ELFDATA2LSB)
+        placements, sizes, aligns, commons = self.layout_sections()
+
+        # 只输出非空的节和段
+        outputs = [output for output in OUTPUTS if sizes[output[0]]]
+        segments = [flags for flags in SEGMENTS if any(output[3] == flags for output in outputs)]
+        phnum = 1 + len(segments)
+
+        # 分配地址：每个段从新的页开始，.bss 只占内存
+        addresses = {}
+        offsets = {}
+        loads = []
+        offset = sizeof(layout.Ehdr) + phnum * sizeof(layout.Phdr)
+        loads.append((PF.PF_R, 0, offset, offset))
+        for flags in segments:
+            offset = align(offset, PAGE)
+            start = offset
+            memory = offset
+            for name, sh_type, _, segment in outputs:
+                if segment != flags:
+                    continue
+                memory = align(memory, aligns[name])
+                addresses[name] = BASE + memory
+                # 与 ld 相同，.bss 的文件偏移为前面内容的结尾
+                offsets[name] = offset if sh_type == SHT.SHT_NOBITS else memory
+                memory += sizes[name]
+                if sh_type != SHT.SHT_NOBITS:
+                    offset = memory
+            loads.append((flags, start, offset - start, memory - start))
+        end = max(BASE + offset, *(address + sizes[name] for name, address in addresses.items()))
+
+        linker_symbols = self.linker_symbols(addresses, sizes, end)
+        symbols, first_global, values = self.collect_symbols(placements, addresses, commons, linker_symbols)
+
+        # 非分配的节：.symtab, .strtab, .shstrtab
+        section_names = [name for name, *_ in outputs] + ['.symtab', '.strtab', '.shstrtab']
+        indices = {name: index for index, name in enumerate(section_names, 1)}
+        strtab, st_names = build_strtab(symbol[0] for symbol in symbols[1:])
+        # 与 ld 相同，.shstrtab 中非分配的节名在前
+        names = section_names[-3:] + section_names[:-3]
+        shstrtab, positions = build_strtab(names)
+        sh_names = dict(zip(names, positions))
+
+        offset = align(offset, 4)
+        offsets['.symtab'] = offset
+        offset += len(symbols) * sizeof(layout.Sym)
+        offsets['.strtab'] = offset
+        offset += len(strtab)
+        offsets['.shstrtab'] = offset
+        offset += len(shstrtab)
+        shoff = align(offset, 4)
+        total = shoff + (len(section_names) + 1) * sizeof(layout.Shdr)
+
+        buf = bytearray(total)
+        view = memoryview(buf)
+
+        entry = values.get(self.entry)
+        if entry is None:
+            entry = addresses.get('.text', 0)
+            logger.warning("cannot find entry symbol %s; defaulting to %08x", self.entry, entry)
+        self.write_headers(buf, layout, entry, loads, shoff, len(section_names) + 1, indices['.shstrtab'])
+
+        # 各输入节的内容直接复制到最终的位置
+        for (number, index), (name, offset) in placements.items():
+            section = self.inputs[number].elf.shdrs[index]
+            if section.sh_type == SHT.SHT_NOBITS or not section.sh_size or name == '.bss':
+                continue
+            start = offsets[name] + offset
+            view[start:start + section.sh_size] = section.data
+
+        self.relocate(buf, placements, addresses, offsets)
+
+        buf[offsets['.strtab']:offsets['.strtab'] + len(strtab)] = strtab
+        buf[offsets['.shstrtab']:offsets['.shstrtab'] + len(shstrtab)] = shstrtab
+
+        shndx = array('H')
+        for symbol in symbols:
+            shndx.append(indices[symbol[4]] if isinstance(symbol[4], str) else symbol[4])
+        columns = {
+            'st_name': array('I', [0] + st_names),
+            'st_value': array('I', (symbol[1] for symbol in symbols)),
+            'st_size': array('I', (symbol[2] for symbol in symbols)),
+            'st_info': array('B', (symbol[3] for symbol in symbols)),
+            'st_shndx': shndx,
+        }
+        start = offsets['.symtab']
+        encode_columns(
+            view[start:start + len(symbols) * sizeof(layout.Sym)], sizeof(layout.Sym),
+            struct_layout(layout.Sym), columns)
+
+        shdrs = (layout.Shdr * (len(section_names) + 1)).from_buffer(buf, shoff)
+        for name, sh_type, flags, _ in outputs:
+            shdr = shdrs[indices[name]]
+            shdr.sh_type = sh_type
+            shdr.sh_flags = flags
+            shdr.sh_addr = addresses[name]
+            shdr.sh_size = sizes[name]
+            shdr.sh_addralign = aligns[name]
+        shdr = shdrs[indices['.symtab']]
+        shdr.sh_type = SHT.SHT_SYMTAB
+        shdr.sh_size = len(symbols) * sizeof(layout.Sym)
+        shdr.sh_link = indices['.strtab']
+        shdr.sh_info = first_global
+        shdr.sh_addralign = 4
+        shdr.sh_entsize = sizeof(layout.Sym)
+        for name, size in (('.strtab', len(strtab)), ('.shstrtab', len(shstrtab))):
+            shdr = shdrs[indices[name]]
+            shdr.sh_type = SHT.SHT_STRTAB
+            shdr.sh_size = size
+            shdr.sh_addralign = 1
+        for name, index in indices.items():
+            shdrs[index].sh_name = sh_names[name]
+            shdrs[index].sh_offset = offsets[name]
+
+        del shdrs
+        view.release()
+        return buf
+
+    def write_headers(self, buf: bytearray, layout: ElfLayout, entry, loads, shoff, shnum, shstrndx):
+        buf[0:4] = ElfIdent.MAGIC.ELFMAG.encode('latin1')
+        buf[4] = ElfIdent.CLASS.ELFCLASS32
+        buf[5] = ElfIdent.DATA.ELFDATA2LSB
+        buf[6] = Elf32_Ehdr.EV.EV_CURRENT
+
+        header = layout.Ehdr.from_buffer(buf, 0)
+        header.e_type = Elf32_Ehdr.ET.ET_EXEC
+        header.e_machine = Elf32_Ehdr.EM.EM_386
+        header.e_version = Elf32_Ehdr.EV.EV_CURRENT
+        header.e_entry = entry
+        header.e_phoff = sizeof(layout.Ehdr)
+        header.e_shoff = shoff
+        header.e_ehsize = sizeof(layout.Ehdr)
+        header.e_phentsize = sizeof(layout.Phdr)
+        header.e_phnum = len(loads)
+        header.e_shentsize = sizeof(layout.Shdr)
+        header.e_shnum = shnum
+        header.e_shstrndx = shstrndx
+
+        phdrs = (layout.Phdr * len(loads)).from_buffer(buf, header.e_phoff)
+        for phdr, (flags, offset, filesz, memsz) in zip(phdrs, loads):
+            phdr.p_type = Elf32_Phdr.PT.PT_LOAD
+            phdr.p_offset = offset
+            phdr.p_vaddr = phdr.p_paddr = BASE + offset
+            phdr.p_filesz = filesz
+            phdr.p_memsz = memsz
+            phdr.p_flags = flags
+            phdr.p_align = PAGE
+        del header, phdrs
+
+    def linker_symbols(self, addresses, sizes, end) -> Dict[str, Tuple[int, str]]:
+        # __bss_start 和 _edata 为 .data 的结尾，_end 为 .bss 的结尾
+        data = [name for name in ('.data', '.rodata', '.text') if name in addresses][:1]
+        section = data[0] if data else None
+        edata = addresses[section] + sizes[section] if section else BASE
+        result = {
+            '__bss_start': (edata, section),
+            '_edata': (edata, section),
+            '_end': (align(end, 4), section),
+        }
+        return {name: value for name, value in result.items() if name not in self.definitions}
+
+    def collect_symbols(self, placements, addresses, commons, linker_symbols):
+        '''
+        计算每个输入文件中每个符号的地址 (self.values)，返回输出的符号表：
+        [(名字, 值, 大小, st_info, 输出节名或 SHN_*)], 第一个全局符号的索引, 全局符号名 -> 地址
+        '''
+        values = {}
+        for name, (value, _) in linker_symbols.items():
+            values[name] = value
+        for name, offset in commons.items():
+            values[name] = addresses['.bss'] + offset
+
+        # 先计算已定义的符号的地址，未定义的符号之后按名字查找
+        self.values = []
+        for number, input in enumerate(self.inputs):
+            symtab = input.symtab
+            result = [0] * len(symtab)
+            st_value = symtab.st_value
+            for index, shndx in enumerate(symtab.st_shndx):
+                if shndx == SHN.SHN_UNDEF or shndx == SHN.SHN_COMMON:
+                    result[index] = None
+                elif shndx == SHN.SHN_ABS:
+                    result[index] = st_value[index]
+                elif shndx < SHN.SHN_LORESERVE:
+                    placement = placements.get((number, shndx))
+                    if placement is not None:
+                        name, offset = placement
+                        result[index] = addresses[name] + offset + st_value[index]
+            self.values.append(result)
+
+        for name, definition in self.definitions.items():
+            values[name] = self.values[definition.input][definition.index]
+        for number, input in enumerate(self.inputs):
+            result = self.values[number]
+            symtab = input.symtab
+            # 全局符号总是使用解析后的定义，弱定义可能被其它文件中的强定义覆盖
+            for index in range(symtab.shdr.sh_info, len(symtab)):
+                result[index] = values.get(symtab.get_name(index))
+
+        # 输出的符号表，局部符号在前
+        symbols = [('', 0, 0, 0, SHN.SHN_UNDEF)]
+        for number, input in enumerate(self.inputs):
+            symtab = input.symtab
+            start = len(symbols)
+            for index in range(1, symtab.shdr.sh_info):
+                type = symtab.type[index]
+                if type == STT.STT_SECTION:
+                    continue
+                shndx = symtab.st_shndx[index]
+                if type == STT.STT_FILE or shndx == SHN.SHN_ABS:
+                    section = SHN.SHN_ABS
+                else:
+                    placement = placements.get((number, shndx))
+                    if placement is None:
+                        continue
+                    section = placement[0]
+                symbols.append((symtab.get_name(index), self.values[number][index],
+                                symtab.st_size[index], symtab.st_info[index], section))
+            # 与 ld 相同，没有 STT_FILE 的文件以文件名作为局部符号的开头
+            if len(symbols) > start and symbols[start][3] & 0xf != STT.STT_FILE:
+                name = os.path.basename(input.elf.filename)
+                symbols.insert(start, (name, 0, 0, STB.STB_LOCAL << 4 | STT.STT_FILE, SHN.SHN_ABS))
+        first_global = len(symbols)
+
+        globals = []
+        for name, definition in self.definitions.items():
+            input = self.inputs[definition.input]
+            symtab = input.symtab
+            shndx = symtab.st_shndx[definition.index]
+            if shndx == SHN.SHN_ABS:
+                section = SHN.SHN_ABS
+            else:
+                placement = placements.get((definition.input, shndx))
+                section = placement[0] if placement else SHN.SHN_ABS
+            globals.append((name, values[name], symtab.st_size[definition.index],
+                            symtab.st_info[definition.index], section))
+        for name, offset in commons.items():
+            size = self.commons[name][0]
+            globals.append((name, values[name], size, STB.STB_GLOBAL << 4 | STT.STT_OBJECT, '.bss'))
+        for name, (value, section) in linker_symbols.items():
+            globals.append((name, value, 0, STB.STB_GLOBAL << 4 | STT.STT_NOTYPE,
+                            section if section else SHN.SHN_ABS))
+
+        # 按 ld 遍历 BFD 哈希表的顺序输出：桶号从小到大，同一个桶中后加入的在前
+        order = {symbol[0]: -number for number, symbol in enumerate(globals)}
+        size = bfd_hash_size(len(globals))
+        globals.sort(key=lambda symbol: (bfd_hash(symbol[0]) % size, order[symbol[0]]))
+        symbols.extend(globals)
+        return symbols, first_global, values
+
+    def relocate(self, buf: bytearray, placements, addresses, offsets):
+        '''
+        按重定位表整表应用 R_386_32 和 R_386_PC32，REL 的加数从目标位置读出；
+        目标位置不连续，读写只能逐项进行，循环中用到的方法和类型都预先取到局部变量
+        '''
+        R = Elf32_Rel.R
+        unpack_from = struct.Struct('<i').unpack_from
+        pack_into = struct.Struct('<I').pack_into
+        none = R.R_386_NONE
+        absolute = R.R_386_32
+        relative = {R.R_386_PC32, R.R_386_PLT32}
+        for number, input in enumerate(self.inputs):
+            values = self.values[number]
+            symtab = input.symtab
+            for reltab in input.reltabs:
+                placement = placements.get((number, reltab.target))
+                if placement is None:
+                    continue
+                name, offset = placement
+                if name == '.bss':
+                    continue
+                base = offsets[name] + offset
+                address = addresses[name] + offset
+
+                addends = reltab.r_addend if reltab.rela else None
+                for position, (r_offset, r_type, r_sym) in enumerate(
+                        zip(reltab.r_offset, reltab.r_type, reltab.r_sym)):
+                    if r_type == none:
+                        continue
+                    value = values[r_sym]
+                    if value is None:
+                        if symtab.bind[r_sym] != STB.STB_WEAK:
+                            raise ValueError(
+                                f'{input.elf.filename}: undefined reference to {symtab.get_name(r_sym)}')
+                        value = 0
+                    start = base + r_offset
+                    addend = addends[position] if addends is not None else unpack_from(buf, start)[0]
+                    if r_type == absolute:
+                        value += addend
+                    elif r_type in relative:
+                        value += addend - (address + r_offset)
+                    else:
+                        raise ValueError(f'{input.elf.filename}: unsupported relocation type {R.get_name(r_type)}')
+                    pack_into(buf, start, value & 0xffffffff)
+
+    def write(self, filename):
+        data = self.link()
+        with open(filename, 'wb') as file:
+            file.write(data)
+        os.chmod(filename, 0o755)
+        return filename
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='link i386 relocatable files into a static executable')
+    parser.add_argument('inputs', nargs='+', help='relocatable files')
+    parser.add_argument('-o', '--output', default='a.out', help='output file')
+    parser.add_argument('-e', '--entry', default='_start', help='entry symbol')
+    args = parser.parse_args(argv)
+
+    with Linker(args.entry) as linker:
+        for filename in args.inputs:
+            linker.add(filename)
+        linker.write(args.output)
+
+
+if __name__ == '__main__':
+    main()
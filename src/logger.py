@@ -6,11 +6,33 @@
 
 # coding=utf-8
 
+import os
 import sys
 import logging
 
-logging.basicConfig(
-    stream=sys.stdout,
-    level=logging.DEBUG,
-    format='[%(asctime)s] [%(filename)s:%(lineno)d] [%(levelno)s] %(message)s',)
-logger = logging.getLogger()
+'''
+导入时不再配置根 logger，由入口调用 setup 决定输出的位置和级别；
+没有调用 setup 时只有 WARNING 以上的消息会输出到 stderr。
+日志参数请使用 logger.debug("%s", value) 的形式，级别不够时不会格式化
+'''
+
+FORMAT = '[%(asctime)s] [%(filename)s:%(lineno)d] [%(levelno)s] %(message)s'
+
+logger = logging.getLogger('compiler')
+
+
+def setup(level=None, stream=None):
+    '''
+    level 可以是数字或名字，默认取环境变量 LOG_LEVEL，没有设置时为 WARNING
+    '''
+    if level is None:
+        level = os.environ.get('LOG_LEVEL', 'WARNING')
+    if isinstance(level, str):
+        level = level.upper()
+
+    handler = logging.StreamHandler(sys.stderr if stream is None else stream)
+    handler.setFormatter(logging.Formatter(FORMAT))
+    logger.handlers[:] = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
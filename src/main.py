@@ -4,10 +4,52 @@
 @date: 2021-07-13
 '''
 
+import argparse
+import os
+import sys
 
-def main():
-    print("This is a C compiler")
+from preprocessor import TARGET, TARGETS, HeaderCache, PreprocessError, Preprocessor, format_tokens
+
+
+def parse_define(text):
+    name, _, value = text.partition('=')
+    return name, value or '1'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='This is a C compiler')
+    parser.add_argument('sources', nargs='*', help='C source files')
+    parser.add_argument('-I', dest='include', action='append', default=[], help='add include directory')
+    parser.add_argument('-D', dest='defines', action='append', default=[], type=parse_define,
+                        help='define a macro, NAME or NAME=VALUE')
+    parser.add_argument('-U', dest='undefines', action='append', default=[], help='undefine a macro')
+    parser.add_argument('--target', choices=sorted(TARGETS), default=TARGET,
+                        help='target machine, selects predefined macros and system include directories')
+    args = parser.parse_args(argv)
+
+    # 暂时只做预处理，所有源文件共用头文件的缓存；
+    # 结果输出到 stdout，诊断信息输出到 stderr，出错的文件跳过，最后返回 1
+    cache = HeaderCache()
+    defines = args.defines + [(name, None) for name in args.undefines]
+    write = sys.stdout.write
+    status = 0
+    for filename in args.sources:
+        try:
+            preprocessor = Preprocessor(args.include, cache, defines, target=args.target)
+            for line in format_tokens(preprocessor.preprocess(filename)):
+                write(line + '\n')
+        except BrokenPipeError:
+            # 输出的管道已经关闭，例如 | head，退出时不再刷新 stdout
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 1
+        except PreprocessError as e:
+            sys.stderr.write(f'{parser.prog}: error: {e}\n')
+            status = 1
+        except OSError as e:
+            sys.stderr.write(f'{parser.prog}: error: {e.filename}: {e.strerror}\n')
+            status = 1
+    return status
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,1133 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import glob
+import os
+from array import array
+from collections import namedtuple
+from typing import *
+
+from lexer import Lexer, Token, keyword_table, tokenize
+from logger import logger
+
+'''
+C 预处理
+
+记号为元组 (种类, 文本, 空白, 隐藏集)：空白为 0 表示紧接前一个记号，
+1 表示前面有空白，2 表示在一行的开头；隐藏集为这个记号不能再展开的宏名 (frozenset)，
+按 Prosser 的算法处理宏的递归展开。
+
+头文件按路径缓存在 HeaderCache 中，修改时间和大小不变时直接复用记号、
+条件指令的跳转表和解析好的宏定义，一个 HeaderCache 可以在多个翻译单元之间共用。
+整个文件由 #ifndef X ... #endif 包围时记下保护宏 X，
+保护宏已经定义或者执行过 #pragma once 的头文件再次包含时不再打开。
+宏的替换结果（包括函数式宏实参的预先展开）按 (宏名, 实参, 隐藏集) 缓存，
+宏定义发生变化时清空
+
+    cache = HeaderCache()
+    for filename in filenames:
+        preprocessor = Preprocessor(['include'], cache)
+        for token in preprocessor.preprocess(filename):
+            ...
+'''
+
+EMPTY = frozenset()
+
+# ## 两边为空的实参
+PLACEMARKER = (None, '', 0, EMPTY)
+
+# 预处理时关键字也是标识符
+NAMES = {Token.IDENTIFIER, Token.KEYWORD}
+HASHES = {'#', '%:'}
+PASTES = {'##', '%:%:'}
+
+CONDITIONALS = {'if', 'ifdef', 'ifndef'}
+BRANCHES = {'elif', 'else', 'endif'}
+
+INCLUDE_DEPTH = 200
+EXPANSION_LIMIT = 1 << 16
+
+PREDEFINED = b'''
+#define __STDC__ 1
+#define __STDC_VERSION__ 201112L
+#define __STDC_HOSTED__ 1
+#define __linux__ 1
+#define __linux 1
+#define linux 1
+#define __unix__ 1
+#define __unix 1
+#define unix 1
+#define __ELF__ 1
+#define __CHAR_BIT__ 8
+#define __SIZEOF_SHORT__ 2
+#define __SIZEOF_INT__ 4
+#define __SIZEOF_LONG_LONG__ 8
+'''
+
+Target = namedtuple('Target', [
+    'multiarch',  # 系统头文件目录 /usr/include/<multiarch>
+    'predefined',  # 目标相关的预定义宏，在 PREDEFINED 之后
+])
+
+TARGETS = {
+    'i386': Target('i386-linux-gnu', b'''
+#define __i386__ 1
+#define __i386 1
+#define i386 1
+#define __SIZEOF_LONG__ 4
+#define __SIZEOF_POINTER__ 4
+#define __SIZE_TYPE__ unsigned int
+#define __PTRDIFF_TYPE__ int
+#define __WCHAR_TYPE__ long int
+'''),
+    'x86_64': Target('x86_64-linux-gnu', b'''
+#define __x86_64__ 1
+#define __x86_64 1
+#define __amd64__ 1
+#define __amd64 1
+#define __LP64__ 1
+#define _LP64 1
+#define __SIZEOF_LONG__ 8
+#define __SIZEOF_POINTER__ 8
+#define __SIZE_TYPE__ long unsigned int
+#define __PTRDIFF_TYPE__ long int
+#define __WCHAR_TYPE__ int
+'''),
+}
+
+# 默认的目标，与生成的代码一致
+TARGET = 'i386'
+
+# 值依赖于展开位置的宏，body 为 None
+DYNAMIC = ('__FILE__', '__LINE__')
+
+# 编译器的特性查询，都当作不支持
+HAS_CHECKS = {
+    '__has_attribute',
+    '__has_builtin',
+    '__has_c_attribute',
+    '__has_cpp_attribute',
+    '__has_declspec_attribute',
+    '__has_extension',
+    '__has_feature',
+    '__has_warning',
+}
+HAS_INCLUDES = {'__has_include', '__has_include_next'}
+
+# #if 中二元运算符的优先级
+BINARY = {
+    '||': 1,
+    '&&': 2,
+    '|': 3,
+    '^': 4,
+    '&': 5,
+    '==': 6, '!=': 6,
+    '<': 7, '>': 7, '<=': 7, '>=': 7,
+    '<<': 8, '>>': 8,
+    '+': 9, '-': 9,
+    '*': 10, '/': 10, '%': 10,
+}
+COMPARISONS = {'==', '!=', '<', '>', '<=', '>='}
+
+# #if 按 intmax_t 和 uintmax_t 计算
+BITS = 64
+MASK = (1 << BITS) - 1
+SIGN = 1 << (BITS - 1)
+
+ESCAPES = {
+    'a': 7, 'b': 8, 'f': 12, 'n': 10, 'r': 13, 't': 9, 'v': 11, 'e': 27,
+    '\\': 92, "'": 39, '"': 34, '?': 63,
+}
+
+Macro = namedtuple('Macro', [
+    'name',
+    'params',  # 参数名 -> 序号，对象式宏为 None
+    'variadic',
+    'body',
+])
+
+
+class PreprocessError(ValueError):
+    pass
+
+
+def system_include_paths(target=TARGET) -> List[str]:
+    '''
+    默认的系统头文件目录，编译器自带的 stddef.h, stdarg.h 等取版本最高的 gcc
+    '''
+    def version(path):
+        return [int(part) if part.isdigit() else 0 for part in path.split('/')[-2].split('.')]
+
+    paths = ['/usr/local/include']
+    paths.extend(sorted(glob.glob('/usr/lib/gcc/*/*/include'), key=version, reverse=True)[:1])
+    paths.append(f'/usr/include/{TARGETS[target].multiarch}')
+    paths.append('/usr/include')
+    return [path for path in paths if os.path.isdir(path)]
+
+
+def format_tokens(tokens: Iterable[tuple]) -> Iterator[str]:
+    '''
+    预处理的结果按行输出，只保留记号之间是否有空白
+    '''
+    parts = []
+    for token in tokens:
+        space = token[2]
+        if space == 2 and parts:
+            yield ''.join(parts)
+            parts.clear()
+        elif space and parts:
+            parts.append(' ')
+        parts.append(token[1])
+    if parts:
+        yield ''.join(parts)
+
+
+def wrap(value, unsigned) -> Tuple[int, bool]:
+    '''
+    截断为 64 位，返回 (值, 是否无符号)
+    '''
+    value &= MASK
+    if not unsigned and value & SIGN:
+        value -= 1 << BITS
+    return value, unsigned
+
+
+def divide(left, right) -> int:
+    # C 的除法向 0 取整
+    quotient = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
+
+
+def char_value(text) -> int:
+    body = text[text.index("'") + 1:-1]
+    if not body.startswith('\\'):
+        return ord(body[0]) if body else 0
+    escape = body[1:]
+    if escape[:1] == 'x':
+        return int(escape[1:], 16)
+    if escape[:1].isdigit():
+        return int(escape, 8)
+    return ESCAPES.get(escape, ord(escape[:1] or '\\'))
+
+
+def integer_value(text) -> Tuple[int, bool]:
+    digits = text.rstrip('uUlL')
+    unsigned = 'u' in text[len(digits):].lower()
+    if digits[:2] in ('0x', '0X'):
+        value = int(digits[2:], 16)
+    elif digits[:2] in ('0b', '0B'):
+        value = int(digits[2:], 2)
+    elif len(digits) > 1 and digits[0] == '0':
+        value = int(digits, 8)
+    else:
+        value = int(digits)
+    # intmax_t 放不下的常量为无符号数
+    return wrap(value, unsigned or value >= SIGN)
+
+
+class SourceFile(object):
+
+    '''
+    一个源文件预处理需要的、只依赖文件内容的信息，可以在翻译单元之间共用
+
+    tokens: 记号，lines: 每个记号所在的行
+    branches: 条件指令的 '#' 的下标 -> 同一组中下一个条件指令的 '#' 的下标
+    guard: 保护宏的名字，defines: #define 的 '#' 的下标 -> 解析好的宏
+    '''
+
+    def __init__(self, path, data, tokens: Iterable[tuple], mtime=0, size=0):
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.tokens = []
+        self.lines = array('I')
+        self.branches = {}
+        self.guard = None
+        self.defines = {}
+
+        self.read(data, tokens)
+        self.match_conditionals()
+        self.guard = self.find_guard()
+
+    def read(self, data, tokens: Iterable[tuple]):
+        append = self.tokens.append
+        append_line = self.lines.append
+        newline = Token.NEWLINE
+        line = 1
+        last = 0
+        space = 2
+        for kind, start, end, value in tokens:
+            if start != last:
+                # 注释和续行中的换行
+                if start - last > 1:
+                    line += data[last:start].count(b'\n')
+                if not space:
+                    space = 1
+            last = end
+            if kind == newline:
+                line += 1
+                space = 2
+                continue
+            if value is None:
+                value = str(data[start:end], 'utf8', 'surrogateescape')
+            append((kind, value, space, EMPTY))
+            append_line(line)
+            space = 0
+
+    def error(self, index, message) -> PreprocessError:
+        line = self.lines[min(index, len(self.lines) - 1)] if self.lines else 1
+        return PreprocessError(f'{self.path}:{line}: {message}')
+
+    def directive_name(self, index) -> Optional[str]:
+        '''
+        index 处为一行开头的 '#' 时返回指令名
+        '''
+        tokens = self.tokens
+        token = tokens[index]
+        if token[2] != 2 or token[1] not in HASHES or token[0] != Token.PUNCTUATOR:
+            return None
+        if index + 1 >= len(tokens) or tokens[index + 1][2] == 2:
+            return ''
+        return tokens[index + 1][1]
+
+    def match_conditionals(self):
+        stack = []
+        for index, token in enumerate(self.tokens):
+            if token[2] != 2 or token[1] not in HASHES:
+                continue
+            name = self.directive_name(index)
+            if name in CONDITIONALS:
+                stack.append(index)
+            elif name in BRANCHES:
+                if not stack:
+                    raise self.error(index, f'#{name} without #if')
+                self.branches[stack[-1]] = index
+                if name == 'endif':
+                    stack.pop()
+                else:
+                    stack[-1] = index
+        if stack:
+            raise self.error(stack[-1], 'unterminated conditional directive')
+
+    def find_guard(self) -> Optional[str]:
+        '''
+        文件的第一个指令为 #ifndef X 或 #if !defined X，
+        与之配对的 #endif 之后没有其它内容时，X 为保护宏
+        '''
+        tokens = self.tokens
+        if not tokens or self.directive_name(0) not in ('ifndef', 'if'):
+            return None
+        end = 2
+        while end < len(tokens) and tokens[end][2] != 2:
+            end += 1
+        condition = [token[1] for token in tokens[2:end]]
+        if tokens[1][1] == 'ifndef' and len(condition) == 1:
+            name = condition[0]
+        elif condition[:2] == ['!', 'defined'] and len(condition) == 3:
+            name = condition[2]
+        elif condition[:3] == ['!', 'defined', '('] and condition[4:] == [')'] and len(condition) == 5:
+            name = condition[3]
+        else:
+            return None
+
+        index = self.branches[0]
+        if self.directive_name(index) != 'endif':
+            return None
+        if any(token[2] == 2 for token in tokens[index + 1:]):
+            return None
+        return name
+
+    def parse_define(self, start, args: Sequence[tuple]) -> Macro:
+        if not args or args[0][0] not in NAMES:
+            raise self.error(start, 'macro names must be identifiers')
+        name = args[0][1]
+        if name == 'defined':
+            raise self.error(start, '"defined" cannot be used as a macro name')
+
+        # 函数式宏的名字和 '(' 之间没有空白
+        if len(args) < 2 or args[1][1] != '(' or args[1][2]:
+            return Macro(name, None, False, tuple(args[1:]))
+
+        params = {}
+        variadic = False
+        position = 2
+        if position < len(args) and args[position][1] == ')':
+            return Macro(name, params, variadic, tuple(args[position + 1:]))
+        while True:
+            if position >= len(args):
+                raise self.error(start, 'missing ")" in macro parameter list')
+            token = args[position]
+            position += 1
+            if token[1] == '...':
+                variadic = True
+                params['__VA_ARGS__'] = len(params)
+            elif token[0] in NAMES and token[1] not in params:
+                params[token[1]] = len(params)
+                # GNU 具名的可变参数 args...
+                if position < len(args) and args[position][1] == '...':
+                    variadic = True
+                    position += 1
+            else:
+                raise self.error(start, f'invalid macro parameter "{token[1]}"')
+
+            if position >= len(args):
+                raise self.error(start, 'missing ")" in macro parameter list')
+            token = args[position]
+            position += 1
+            if token[1] == ')':
+                break
+            if token[1] != ',' or variadic:
+                raise self.error(start, 'expected "," or ")" in macro parameter list')
+        return Macro(name, params, variadic, tuple(args[position:]))
+
+
+class HeaderCache(object):
+
+    '''
+    路径 -> SourceFile，修改时间或大小变化时重新读入；
+    所有文件共用一张名字表，同一个标识符只保存一份；
+    各个目标的预定义宏在第一次用到时解析
+    '''
+
+    def __init__(self):
+        self.names = keyword_table()
+        self.files = {}
+        self.builtins = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.files)
+
+    def builtin(self, target) -> SourceFile:
+        source = self.builtins.get(target)
+        if source is None:
+            source = self.builtins[target] = self.parse('<built-in>', PREDEFINED + TARGETS[target].predefined)
+        return source
+
+    def get(self, path) -> SourceFile:
+        stat = os.stat(path)
+        source = self.files.get(path)
+        if source is not None and source.mtime == stat.st_mtime_ns and source.size == stat.st_size:
+            self.hits += 1
+            return source
+
+        self.misses += 1
+        with Lexer(path, self.names) as lexer:
+            source = SourceFile(path, lexer.data, lexer.tokens(newlines=True), stat.st_mtime_ns, stat.st_size)
+        self.files[path] = source
+        return source
+
+    def parse(self, path, data: bytes) -> SourceFile:
+        return SourceFile(path, data, tokenize(data, self.names, newlines=True))
+
+
+class Frame(object):
+
+    '''
+    正在处理的一个文件，directory 为找到它的搜索目录的序号，供 #include_next 使用；
+    conditions 为未结束的条件指令中是否已经选中了一个分支
+    '''
+
+    def __init__(self, source: SourceFile, directory=None):
+        self.source = source
+        self.tokens = source.tokens
+        self.index = 0
+        self.directory = directory
+        self.conditions = []
+
+
+class Expression(object):
+
+    '''
+    #if 的常量表达式，宏已经展开，剩下的标识符为 0；
+    值为 (数值, 是否无符号)，有无符号数参与运算时两边都转换为无符号数，结果截断为 64 位；
+    live 为 False 的分支只检查语法，不会因为除以 0 出错
+    '''
+
+    def __init__(self, tokens: Sequence[tuple], error: Callable[[str], PreprocessError]):
+        self.tokens = tokens
+        self.position = 0
+        self.error = error
+
+    def peek(self) -> Optional[str]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position][1]
+        return None
+
+    def expect(self, text):
+        if self.peek() != text:
+            raise self.error(f'expected "{text}" in preprocessor expression')
+        self.position += 1
+
+    def parse(self) -> int:
+        if not self.tokens:
+            raise self.error('#if with no expression')
+        value = self.conditional(True)
+        if self.position < len(self.tokens):
+            raise self.error(f'missing binary operator before token "{self.peek()}"')
+        return value[0]
+
+    def conditional(self, live) -> Tuple[int, bool]:
+        condition = self.binary(1, live)
+        if self.peek() != '?':
+            return condition
+        self.position += 1
+        left = self.conditional(live and condition[0] != 0)
+        self.expect(':')
+        right = self.conditional(live and condition[0] == 0)
+        return wrap((left if condition[0] else right)[0], left[1] or right[1])
+
+    def binary(self, level, live) -> Tuple[int, bool]:
+        left = self.unary(live)
+        while True:
+            operator = self.peek()
+            precedence = BINARY.get(operator)
+            if precedence is None or precedence < level or self.tokens[self.position][0] != Token.PUNCTUATOR:
+                return left
+            self.position += 1
+            if operator == '&&':
+                right = self.binary(precedence + 1, live and left[0] != 0)
+                left = (int(left[0] != 0 and right[0] != 0), False)
+            elif operator == '||':
+                right = self.binary(precedence + 1, live and left[0] == 0)
+                left = (int(left[0] != 0 or right[0] != 0), False)
+            else:
+                right = self.binary(precedence + 1, live)
+                left = self.apply(operator, left, right, live)
+
+    def apply(self, operator, left, right, live) -> Tuple[int, bool]:
+        if operator in ('<<', '>>'):
+            # 移位的结果为左边的类型，移动 64 位以上时结果都一样
+            left, unsigned = left
+            right = right[0]
+            if right < 0:
+                operator = '>>' if operator == '<<' else '<<'
+                right = -right
+            right = min(right, BITS)
+            return wrap(left << right if operator == '<<' else left >> right, unsigned)
+
+        unsigned = left[1] or right[1]
+        left, right = left[0], right[0]
+        if unsigned:
+            left &= MASK
+            right &= MASK
+        if operator in ('/', '%'):
+            if right == 0:
+                if live:
+                    raise self.error('division by zero in #if')
+                return 0, unsigned
+            quotient = divide(left, right)
+            return wrap(quotient if operator == '/' else left - right * quotient, unsigned)
+        value = {
+            '|': lambda: left | right,
+            '^': lambda: left ^ right,
+            '&': lambda: left & right,
+            '==': lambda: int(left == right),
+            '!=': lambda: int(left != right),
+            '<': lambda: int(left < right),
+            '>': lambda: int(left > right),
+            '<=': lambda: int(left <= right),
+            '>=': lambda: int(left >= right),
+            '+': lambda: left + right,
+            '-': lambda: left - right,
+            '*': lambda: left * right,
+        }[operator]()
+        if operator in COMPARISONS:
+            return value, False
+        return wrap(value, unsigned)
+
+    def unary(self, live) -> Tuple[int, bool]:
+        if self.position >= len(self.tokens):
+            raise self.error('#if with incomplete expression')
+        kind, text, _, _ = self.tokens[self.position]
+        self.position += 1
+        if kind == Token.PUNCTUATOR:
+            if text == '(':
+                value = self.conditional(live)
+                self.expect(')')
+                return value
+            if text == '!':
+                return int(self.unary(live)[0] == 0), False
+            if text == '~':
+                value, unsigned = self.unary(live)
+                return wrap(~value, unsigned)
+            if text == '-':
+                value, unsigned = self.unary(live)
+                return wrap(-value, unsigned)
+            if text == '+':
+                return self.unary(live)
+        elif kind == Token.INTEGER:
+            return integer_value(text)
+        elif kind == Token.CHAR:
+            return char_value(text), False
+        elif kind in NAMES:
+            return 0, False
+        raise self.error(f'token "{text}" is not valid in preprocessor expressions')
+
+
+class Preprocessor(object):
+
+    '''
+    一个翻译单元的预处理，宏定义、#pragma once 和已知的保护宏只在这个翻译单元内有效；
+    include 为 -I 的目录，在系统目录之前查找；
+    defines 为命令行的 (名字, 值)，值为 None 时取消定义；
+    target 为 TARGETS 中的目标，决定预定义宏和默认的系统头文件目录
+    '''
+
+    def __init__(self, include: Sequence[str] = (), cache: HeaderCache = None,
+                 defines: Sequence[Tuple[str, Optional[str]]] = (), system=None, target=TARGET):
+        if target not in TARGETS:
+            raise ValueError(f'unknown target {target}')
+        self.cache = HeaderCache() if cache is None else cache
+        self.paths = list(include) + list(system_include_paths(target) if system is None else system)
+        self.macros = {name: Macro(name, None, False, None) for name in DYNAMIC}
+        # 替换结果的缓存：键 -> (结果, 替换时查看过的宏名)；宏名 -> 依赖它的键
+        self.expansions = {}
+        self.dependents = {}
+        self.depends = None
+        self.frames = []
+        self.stack = []
+        self.once = set()
+        self.guards = {}
+        self.resolved = {}
+        self.dynamic = False
+
+        self.execute(self.cache.builtin(target))
+        if defines:
+            lines = []
+            for name, value in defines:
+                if value is None:
+                    lines.append(f'#undef {name}\n')
+                else:
+                    lines.append(f'#define {name} {value}\n')
+            self.execute(self.cache.parse('<command-line>', ''.join(lines).encode('utf8')))
+
+    def execute(self, source: SourceFile):
+        self.frames.append(Frame(source))
+        for token in self.run():
+            raise source.error(0, f'unexpected token "{token[1]}"')
+
+    def preprocess(self, filename) -> Iterator[tuple]:
+        path = os.path.normpath(filename)
+        self.frames.append(Frame(self.cache.get(path)))
+        return self.run()
+
+    def run(self) -> Iterator[tuple]:
+        frames = self.frames
+        stack = self.stack
+        macros = self.macros
+        names = NAMES
+        hashes = HASHES
+        while True:
+            if stack:
+                token = stack.pop()
+            elif not frames:
+                return
+            else:
+                frame = frames[-1]
+                index = frame.index
+                if index >= len(frame.tokens):
+                    frames.pop()
+                    continue
+                token = frame.tokens[index]
+                frame.index = index + 1
+                if token[2] == 2 and token[1] in hashes and token[0] == Token.PUNCTUATOR:
+                    self.directive(frame, index)
+                    continue
+
+            text = token[1]
+            if token[0] in names and text in macros and text not in token[3]:
+                if self.expand(token, stack, frames[-1] if frames else None):
+                    continue
+            yield token
+
+    def error(self, frame: Frame, index, message) -> PreprocessError:
+        return frame.source.error(index, message)
+
+    # 宏展开
+
+    def is_defined(self, name) -> bool:
+        return name in self.macros or name in HAS_CHECKS
+
+    def define(self, macro: Macro):
+        self.macros[macro.name] = macro
+        self.invalidate(macro.name)
+
+    def undefine(self, name):
+        self.macros.pop(name, None)
+        self.invalidate(name)
+
+    def invalidate(self, name):
+        '''
+        删除依赖 name 的替换结果，其它结果仍然有效
+        '''
+        keys = self.dependents.pop(name, None)
+        if not keys:
+            return
+        for key in keys:
+            _, depends = self.expansions.pop(key)
+            for other in depends:
+                if other != name:
+                    self.dependents[other].discard(key)
+
+    @staticmethod
+    def next_token(stack: List[tuple], frame: Optional[Frame]) -> Optional[tuple]:
+        if stack:
+            return stack.pop()
+        if frame is not None and frame.index < len(frame.tokens):
+            frame.index += 1
+            return frame.tokens[frame.index - 1]
+        return None
+
+    @staticmethod
+    def peek_token(stack: List[tuple], frame: Optional[Frame]) -> Optional[tuple]:
+        if stack:
+            return stack[-1]
+        if frame is not None and frame.index < len(frame.tokens):
+            return frame.tokens[frame.index]
+        return None
+
+    def expand(self, token: tuple, stack: List[tuple], frame: Optional[Frame]) -> bool:
+        '''
+        展开 token 表示的宏，结果压回 stack 重新扫描；
+        函数式宏后面没有 '(' 时不展开，返回 False。
+        stack 用完之后从 frame 中继续读取实参
+        '''
+        name = token[1]
+        macro = self.macros[name]
+        if macro.body is None:
+            stack.append(self.dynamic_token(token))
+            return True
+
+        if macro.params is None:
+            result = self.substitute(macro, None, token[3] | {name})
+        else:
+            following = self.peek_token(stack, frame)
+            if following is None or following[1] != '(':
+                return False
+            self.next_token(stack, frame)
+            args, close = self.read_args(macro, stack, frame)
+            result = self.substitute(macro, args, (token[3] & close[3]) | {name})
+
+        # 展开结果的第一个记号继承宏名前面的空白
+        if result:
+            first = result[0]
+            stack.extend(reversed(result[1:]))
+            stack.append((first[0], first[1], token[2], first[3]))
+        return True
+
+    def dynamic_token(self, token: tuple) -> tuple:
+        self.dynamic = True
+        frame = self.frames[-1]
+        if token[1] == '__LINE__':
+            line = frame.source.lines[max(frame.index - 1, 0)] if frame.source.lines else 1
+            return (Token.INTEGER, str(line), token[2], EMPTY)
+        path = frame.source.path.replace('\\', '\\\\').replace('"', '\\"')
+        return (Token.STRING, f'"{path}"', token[2], EMPTY)
+
+    def read_args(self, macro: Macro, stack: List[tuple], frame: Optional[Frame]) -> Tuple[tuple, tuple]:
+        '''
+        读取实参，返回 (实参, 结尾的 ')')，可变参数的部分连同逗号合并为最后一个实参
+        '''
+        count = len(macro.params)
+        args = []
+        current = []
+        depth = 0
+        while True:
+            token = self.next_token(stack, frame)
+            if token is None:
+                raise self.error(self.frames[-1], self.frames[-1].index - 1,
+                                 f'unterminated argument list invoking macro "{macro.name}"')
+            text = token[1]
+            if text == '(':
+                depth += 1
+            elif text == ')':
+                if not depth:
+                    break
+                depth -= 1
+            elif text == ',' and not depth and not (macro.variadic and len(args) == count - 1):
+                args.append(tuple(current))
+                current = []
+                continue
+            current.append(token)
+
+        args.append(tuple(current))
+        if not count and args == [()]:
+            args = []
+        # 可变参数可以整个省略
+        if macro.variadic and len(args) == count - 1:
+            args.append(())
+        if len(args) != count:
+            raise self.error(self.frames[-1], self.frames[-1].index - 1,
+                             f'macro "{macro.name}" requires {count} arguments, but {len(args)} given')
+        return tuple(args), token
+
+    def substitute(self, macro: Macro, args: Optional[tuple], hideset: frozenset) -> tuple:
+        '''
+        替换的结果只取决于宏定义、实参和隐藏集，以及展开实参时查看过的宏名的定义，
+        这些宏名记录在 self.depends 中并计入外层的替换；展开了 __LINE__ 等的结果不缓存
+        '''
+        key = (macro.name, args, hideset)
+        cached = self.expansions.get(key)
+        if cached is not None:
+            result, depends = cached
+            if self.depends is not None:
+                self.depends |= depends
+            return result
+
+        dynamic = self.dynamic
+        outer = self.depends
+        self.dynamic = False
+        self.depends = {macro.name}
+        if args is None and not any(token[1] in PASTES and token[0] == Token.PUNCTUATOR for token in macro.body):
+            result = tuple((kind, text, space, hs | hideset) for kind, text, space, hs in macro.body)
+        else:
+            result = self.replace(macro, args or (), hideset)
+        depends = self.depends
+        if not self.dynamic:
+            if len(self.expansions) >= EXPANSION_LIMIT:
+                self.expansions.clear()
+                self.dependents.clear()
+            self.expansions[key] = (result, depends)
+            for name in depends:
+                self.dependents.setdefault(name, set()).add(key)
+        self.dynamic = self.dynamic or dynamic
+        if outer is not None:
+            outer |= depends
+        self.depends = outer
+        return result
+
+    def replace(self, macro: Macro, args: tuple, hideset: frozenset) -> tuple:
+        '''
+        处理 #, ## 和形参，## 两边的实参不展开，其它实参完全展开之后再替换；
+        对象式宏没有形参，只处理 ##
+        '''
+        body = macro.body
+        params = macro.params or {}
+        variadic = params.get('__VA_ARGS__', len(params) - 1) if macro.variadic else None
+        expanded = {}
+        out = []
+
+        def param(token) -> Optional[int]:
+            return params.get(token[1]) if token[0] in NAMES else None
+
+        position = 0
+        while position < len(body):
+            token = body[position]
+            text = token[1]
+            following = body[position + 1] if position + 1 < len(body) else None
+
+            if text in HASHES and token[0] == Token.PUNCTUATOR and following is not None:
+                index = param(following)
+                if index is not None:
+                    out.append(self.stringify(args[index], token[2]))
+                    position += 2
+                    continue
+
+            if text in PASTES and token[0] == Token.PUNCTUATOR:
+                if not out or following is None:
+                    raise self.error(self.frames[-1], self.frames[-1].index - 1,
+                                     '"##" cannot appear at either end of a macro expansion')
+                index = param(following)
+                right = (following, ) if index is None else args[index] or (PLACEMARKER, )
+                out[-1] = self.paste(out[-1], right[0])
+                out.extend(right[1:])
+                position += 2
+                continue
+
+            # GNU 扩展 , ## __VA_ARGS__：可变参数为空时去掉逗号
+            if text == ',' and variadic is not None and following is not None and following[1] in PASTES \
+                    and position + 2 < len(body) and param(body[position + 2]) == variadic:
+                if args[variadic]:
+                    out.append(token)
+                position += 2 if args[variadic] else 3
+                continue
+
+            index = param(token)
+            if index is None:
+                out.append(token)
+                position += 1
+                continue
+
+            arg = args[index]
+            if following is not None and following[1] in PASTES:
+                # ## 两边为空的实参替换为占位符，与另一边连接的结果就是另一边
+                out.extend(arg or (PLACEMARKER, ))
+                position += 1
+                continue
+
+            result = expanded.get(index)
+            if result is None:
+                result = expanded[index] = self.expand_all(arg)
+            if result:
+                first = result[0]
+                out.append((first[0], first[1], token[2], first[3]))
+                out.extend(result[1:])
+            position += 1
+
+        return tuple((kind, text, space, hs | hideset) for kind, text, space, hs in out if kind is not None)
+
+    def expand_all(self, tokens: Sequence[tuple]) -> List[tuple]:
+        '''
+        完全展开一段记号，不读取后面的内容
+        '''
+        stack = list(reversed(tokens))
+        macros = self.macros
+        depends = self.depends
+        out = []
+        while stack:
+            token = stack.pop()
+            text = token[1]
+            if token[0] in NAMES and text not in token[3]:
+                # 现在没有定义的名字以后定义了，结果也会不同；#if 和 #include 中的展开不在替换之内
+                if depends is not None:
+                    depends.add(text)
+                if text in macros and self.expand(token, stack, None):
+                    continue
+            out.append(token)
+        return out
+
+    @staticmethod
+    def stringify(arg: Sequence[tuple], space) -> tuple:
+        parts = []
+        for index, token in enumerate(arg):
+            if index and token[2]:
+                parts.append(' ')
+            text = token[1]
+            if token[0] in (Token.STRING, Token.CHAR):
+                text = text.replace('\\', '\\\\').replace('"', '\\"')
+            parts.append(text)
+        return (Token.STRING, '"' + ''.join(parts) + '"', space, EMPTY)
+
+    def paste(self, left: tuple, right: tuple) -> tuple:
+        if left is PLACEMARKER:
+            return right if right is PLACEMARKER else (right[0], right[1], left[2], right[3])
+        if right is PLACEMARKER:
+            return left
+        text = left[1] + right[1]
+        tokens = list(tokenize(text.encode('utf8', 'surrogateescape'), self.cache.names))
+        if len(tokens) != 1:
+            raise self.error(self.frames[-1], self.frames[-1].index - 1,
+                             f'pasting "{left[1]}" and "{right[1]}" does not give a valid preprocessing token')
+        kind, _, _, value = tokens[0]
+        return (kind, text if value is None else value, left[2], left[3])
+
+    # 指令
+
+    def directive(self, frame: Frame, start):
+        tokens = frame.tokens
+        end = start + 1
+        while end < len(tokens) and tokens[end][2] != 2:
+            end += 1
+        frame.index = end
+        if end == start + 1:
+            return
+
+        kind, name, _, _ = tokens[start + 1]
+        handler = getattr(self, f'do_{name}', None) if kind in NAMES else None
+        if handler is None:
+            # GNU 的行号标记 # 1 "file"
+            if kind == Token.INTEGER:
+                return
+            raise self.error(frame, start, f'invalid preprocessing directive #{name}')
+        handler(frame, start, tokens[start + 2:end])
+
+    def macro_name(self, frame: Frame, start, args: Sequence[tuple]) -> str:
+        if not args or args[0][0] not in NAMES:
+            raise self.error(frame, start, 'macro names must be identifiers')
+        return args[0][1]
+
+    def do_define(self, frame: Frame, start, args: Sequence[tuple]):
+        source = frame.source
+        macro = source.defines.get(start)
+        if macro is None:
+            macro = source.defines[start] = source.parse_define(start, args)
+        self.define(macro)
+
+    def do_undef(self, frame: Frame, start, args: Sequence[tuple]):
+        self.undefine(self.macro_name(frame, start, args))
+
+    def enter(self, frame: Frame, start, value):
+        frame.conditions.append(bool(value))
+        if not value:
+            frame.index = frame.source.branches[start]
+
+    def do_if(self, frame: Frame, start, args: Sequence[tuple]):
+        self.enter(frame, start, self.evaluate(frame, start, args))
+
+    def do_ifdef(self, frame: Frame, start, args: Sequence[tuple]):
+        self.enter(frame, start, self.is_defined(self.macro_name(frame, start, args)))
+
+    def do_ifndef(self, frame: Frame, start, args: Sequence[tuple]):
+        self.enter(frame, start, not self.is_defined(self.macro_name(frame, start, args)))
+
+    def do_elif(self, frame: Frame, start, args: Sequence[tuple]):
+        # 已经选中过分支时不再计算条件
+        if frame.conditions[-1] or not self.evaluate(frame, start, args):
+            frame.index = frame.source.branches[start]
+        else:
+            frame.conditions[-1] = True
+
+    def do_else(self, frame: Frame, start, args: Sequence[tuple]):
+        if frame.conditions[-1]:
+            frame.index = frame.source.branches[start]
+        else:
+            frame.conditions[-1] = True
+
+    def do_endif(self, frame: Frame, start, args: Sequence[tuple]):
+        frame.conditions.pop()
+
+    def do_include(self, frame: Frame, start, args: Sequence[tuple], next=False):
+        name, angled = self.header_name(frame, start, args)
+        path, directory = self.find_include(name, angled, frame, next)
+        if path is None:
+            raise self.error(frame, start, f'{name}: No such file or directory')
+
+        if path in self.once:
+            return
+        guard = self.guards.get(path)
+        if guard is not None and guard in self.macros:
+            return
+        if len(self.frames) >= INCLUDE_DEPTH:
+            raise self.error(frame, start, '#include nested too deeply')
+
+        source = self.cache.get(path)
+        if source.guard is not None:
+            self.guards[path] = source.guard
+            if source.guard in self.macros:
+                return
+        self.frames.append(Frame(source, directory))
+
+    def do_include_next(self, frame: Frame, start, args: Sequence[tuple]):
+        self.do_include(frame, start, args, True)
+
+    def header_name(self, frame: Frame, start, args: Sequence[tuple], expanded=False) -> Tuple[str, bool]:
+        '''
+        返回 (文件名, 是否为 <...>)，都不是时展开宏之后再试一次
+        '''
+        if args and args[0][0] == Token.STRING and args[0][1].startswith('"'):
+            return args[0][1][1:-1], False
+        if args and args[0][1] == '<':
+            parts = []
+            for index, token in enumerate(args[1:]):
+                if token[1] == '>':
+                    return ''.join(parts), True
+                if index and token[2]:
+                    parts.append(' ')
+                parts.append(token[1])
+        if not expanded:
+            return self.header_name(frame, start, self.expand_all(args), True)
+        raise self.error(frame, start, '#include expects "FILENAME" or <FILENAME>')
+
+    def find_include(self, name, angled, frame: Frame, next=False) -> Tuple[Optional[str], Optional[int]]:
+        '''
+        返回 (路径, 搜索目录的序号)，"..." 先在当前文件的目录中查找，序号为 None
+        '''
+        if os.path.isabs(name):
+            return (name, None) if os.path.isfile(name) else (None, None)
+
+        first = 0
+        current = None
+        if next and frame.directory is not None:
+            first = frame.directory + 1
+        elif not angled and not next:
+            current = os.path.dirname(frame.source.path)
+
+        key = (name, current, first)
+        result = self.resolved.get(key)
+        if result is not None:
+            return result
+
+        result = (None, None)
+        if current is not None and os.path.isfile(os.path.join(current, name)):
+            result = (os.path.normpath(os.path.join(current, name)), None)
+        else:
+            for index in range(first, len(self.paths)):
+                path = os.path.join(self.paths[index], name)
+                if os.path.isfile(path):
+                    result = (os.path.normpath(path), index)
+                    break
+        self.resolved[key] = result
+        return result
+
+    def do_pragma(self, frame: Frame, start, args: Sequence[tuple]):
+        # 其它的 #pragma 忽略
+        if args and args[0][1] == 'once':
+            self.once.add(frame.source.path)
+
+    def do_error(self, frame: Frame, start, args: Sequence[tuple]):
+        raise self.error(frame, start, '#error ' + ''.join(format_tokens(args)))
+
+    def do_warning(self, frame: Frame, start, args: Sequence[tuple]):
+        line = frame.source.lines[start]
+        logger.warning('%s:%d: #warning %s', frame.source.path, line, ''.join(format_tokens(args)))
+
+    def do_line(self, frame: Frame, start, args: Sequence[tuple]):
+        pass
+
+    def do_ident(self, frame: Frame, start, args: Sequence[tuple]):
+        pass
+
+    def evaluate(self, frame: Frame, start, args: Sequence[tuple]) -> int:
+        '''
+        先处理 defined 和 __has_include 等，再展开宏，展开的结果中可能又出现 __has_attribute 等，
+        再处理一次，最后计算表达式
+        '''
+        def error(message) -> PreprocessError:
+            return self.error(frame, start, message)
+
+        tokens = self.expand_all(self.replace_operators(frame, start, args))
+        return Expression(self.replace_operators(frame, start, tokens), error).parse()
+
+    def replace_operators(self, frame: Frame, start, args: Sequence[tuple]) -> List[tuple]:
+        tokens = []
+        position = 0
+        while position < len(args):
+            token = args[position]
+            text = token[1]
+            position += 1
+            if token[0] not in NAMES:
+                tokens.append(token)
+                continue
+
+            if text == 'defined':
+                paren = position < len(args) and args[position][1] == '('
+                if paren:
+                    position += 1
+                if position >= len(args) or args[position][0] not in NAMES:
+                    raise self.error(frame, start, 'operator "defined" requires an identifier')
+                value = self.is_defined(args[position][1])
+                position += 1
+                if paren:
+                    if position >= len(args) or args[position][1] != ')':
+                        raise self.error(frame, start, 'missing ")" after "defined"')
+                    position += 1
+                tokens.append((Token.INTEGER, '1' if value else '0', token[2], EMPTY))
+                continue
+
+            if text in HAS_INCLUDES or text in HAS_CHECKS:
+                if position >= len(args) or args[position][1] != '(':
+                    raise self.error(frame, start, f'missing "(" after "{text}"')
+                end = position + 1
+                depth = 0
+                while end < len(args) and (depth or args[end][1] != ')'):
+                    depth += {'(': 1, ')': -1}.get(args[end][1], 0)
+                    end += 1
+                if end >= len(args):
+                    raise self.error(frame, start, f'missing ")" after "{text}"')
+                value = False
+                if text in HAS_INCLUDES:
+                    name, angled = self.header_name(frame, start, args[position + 1:end])
+                    value = self.find_include(name, angled, frame, text == '__has_include_next')[0] is not None
+                position = end + 1
+                tokens.append((Token.INTEGER, '1' if value else '0', token[2], EMPTY))
+                continue
+
+            tokens.append(token)
+        return tokens
@@ -0,0 +1,158 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+from array import array
+from collections import namedtuple
+from ctypes import sizeof
+from typing import *
+
+from columns import decode_columns
+from elf import ElfFile, ElfLayout, Elf32_Shdr
+from stats import stage
+from symtab import SymbolTable
+
+Relocation = namedtuple('Relocation', [
+    'offset',
+    'type',
+    'sym',
+    'addend',
+    'name',
+    'value',
+    'shndx',
+])
+
+
+def reloc_layout(layout: ElfLayout, rela=False) -> list:
+    # r_info 的低位为 type，高位为符号索引 (ELF32 为 8/24 位，ELF64 为 32/32 位)，
+    # 按字节直接拆成两列
+    cls = layout.Rela if rela else layout.Rel
+    info = cls.r_info.offset
+    type_size = layout.r_shift // 8
+    sym_size = cls.r_info.size - type_size
+    if layout.byteorder == 'little':
+        type_offset = info
+        sym_offset = info + type_size
+    else:
+        sym_offset = info
+        type_offset = info + sym_size
+
+    fields = [
+        ('r_offset', cls.r_offset.offset, cls.r_offset.size),
+        ('r_type', type_offset, type_size),
+        ('r_sym', sym_offset, sym_size),
+    ]
+    if rela:
+        fields.append(('r_addend', cls.r_addend.offset, cls.r_addend.size))
+    return fields
+
+
+class RelocationTable(object):
+
+    '''
+    单个 REL/RELA 节的列式重定位表
+
+    target 为重定位作用的节索引 (sh_info)，link 为引用的符号表节索引 (sh_link)，
+    REL 节的加数隐含在被修改的位置上，r_addend 为 None
+    '''
+
+    def __init__(self, elf: ElfFile, shdr: Elf32_Shdr):
+        self.elf = elf
+        self.shdr = shdr
+        self.target = shdr.sh_info
+        self.link = shdr.sh_link
+        self.rela = shdr.sh_type == Elf32_Shdr.SHT.SHT_RELA
+
+        layout = elf.layout
+        cls = layout.Rela if self.rela else layout.Rel
+        entsize = shdr.sh_entsize or sizeof(cls)
+        columns = decode_columns(
+            shdr.data, entsize, reloc_layout(layout, self.rela),
+            layout.byteorder, signed=('r_addend',))
+
+        self.r_offset = columns['r_offset']
+        self.r_type = columns['r_type']
+        self.r_sym = columns['r_sym']
+        self.r_addend = columns.get('r_addend')
+
+        if elf.stats is not None:
+            elf.stats.structs += len(self.r_offset)
+
+    def __len__(self):
+        return len(self.r_offset)
+
+    def join(self, symtab: Optional[SymbolTable]) -> 'JoinedRelocations':
+        return JoinedRelocations(self, symtab)
+
+
+class JoinedRelocations(object):
+
+    '''
+    重定位表与符号表按符号索引连接后的结果，各列一次性批量生成；
+    没有符号表时 (sh_link 为 0，如去掉符号的静态文件中的 .rela.plt) 名字为 None，值和节索引为 0
+    '''
+
+    def __init__(self, reltab: RelocationTable, symtab: Optional[SymbolTable]):
+        self.reltab = reltab
+        self.symtab = symtab
+
+        sym = reltab.r_sym
+        if symtab is None:
+            self.name = [None] * len(sym)
+            self.value = array('Q', bytes(8 * len(sym)))
+            self.shndx = array('H', bytes(2 * len(sym)))
+            return
+        self.name = list(map(symtab.names.__getitem__, sym))
+        self.value = array(symtab.st_value.typecode, map(symtab.st_value.__getitem__, sym))
+        self.shndx = array(symtab.st_shndx.typecode, map(symtab.st_shndx.__getitem__, sym))
+
+    def __len__(self):
+        return len(self.reltab)
+
+    def __getitem__(self, index) -> Relocation:
+        reltab = self.reltab
+        addend = reltab.r_addend[index] if reltab.rela else None
+        return Relocation(
+            reltab.r_offset[index],
+            reltab.r_type[index],
+            reltab.r_sym[index],
+            addend,
+            self.name[index],
+            self.value[index],
+            self.shndx[index],
+        )
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+@stage
+def read_reltabs(elf: ElfFile) -> List[RelocationTable]:
+    types = {
+        Elf32_Shdr.SHT.SHT_REL,
+        Elf32_Shdr.SHT.SHT_RELA,
+    }
+    return [RelocationTable(elf, shdr) for shdr in elf.shdrs if shdr.sh_type in types]
+
+
+@stage
+def join_reltabs(elf: ElfFile, reltabs: List[RelocationTable] = None) -> List[JoinedRelocations]:
+    if reltabs is None:
+        reltabs = read_reltabs(elf)
+
+    # 多个重定位节通常引用同一张符号表，只解码一次
+    symtabs = {}
+    joined = []
+    for reltab in reltabs:
+        if not reltab.link:
+            joined.append(reltab.join(None))
+            continue
+        if reltab.link not in symtabs:
+            symtabs[reltab.link] = SymbolTable(elf, elf.shdrs[reltab.link])
+        joined.append(reltab.join(symtabs[reltab.link]))
+    return joined
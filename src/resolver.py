@@ -0,0 +1,180 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import sys
+from array import array
+from typing import *
+
+from elf import ElfFile, Elf32_Shdr
+from symtab import Symbol, SymbolTable
+
+
+def read_words(data: memoryview, offset, count, typecode='I', byteorder='little') -> array:
+    words = array(typecode)
+    end = offset + count * words.itemsize
+    words.frombytes(data[offset:end])
+    if len(words) != count:
+        raise ValueError('hash table is truncated')
+    if byteorder != sys.byteorder:
+        words.byteswap()
+    return words
+
+
+class SysvHashTable(object):
+
+    '''
+    .hash 节
+
+    nbucket, nchain, bucket[nbucket], chain[nchain]
+    '''
+
+    def __init__(self, elf: ElfFile, shdr: Elf32_Shdr, symtab: SymbolTable):
+        self.elf = elf
+        self.symtab = symtab
+
+        data = shdr.data
+        byteorder = elf.layout.byteorder
+        nbucket, nchain = read_words(data, 0, 2, byteorder=byteorder)
+        self.bucket = read_words(data, 8, nbucket, byteorder=byteorder)
+        self.chain = read_words(data, 8 + nbucket * 4, nchain, byteorder=byteorder)
+
+    def find(self, name: str) -> int:
+        if not self.bucket:
+            return -1
+        h = self.elf.elf_hash(name.encode('utf8'))
+        index = self.bucket[h % len(self.bucket)]
+        while index:
+            if self.symtab.get_name(index) == name:
+                return index
+            index = self.chain[index]
+        return -1
+
+
+class GnuHashTable(object):
+
+    '''
+    .gnu.hash 节
+
+    nbuckets, symoffset, bloom_size, bloom_shift,
+    bloom[bloom_size], buckets[nbuckets], chain[nsyms - symoffset]
+
+    bloom 的字长与文件类型一致，查找前先用 bloom 过滤掉绝大多数不存在的名字
+    '''
+
+    def __init__(self, elf: ElfFile, shdr: Elf32_Shdr, symtab: SymbolTable):
+        self.elf = elf
+        self.symtab = symtab
+
+        data = shdr.data
+        byteorder = elf.layout.byteorder
+        nbuckets, self.symoffset, bloom_size, self.bloom_shift = read_words(
+            data, 0, 4, byteorder=byteorder)
+
+        self.bits = elf.layout.bits
+        bloom_code = 'Q' if self.bits == 64 else 'I'
+
+        offset = 16
+        self.bloom = read_words(data, offset, bloom_size, bloom_code, byteorder)
+        offset += bloom_size * self.bits // 8
+        self.buckets = read_words(data, offset, nbuckets, byteorder=byteorder)
+        offset += nbuckets * 4
+        self.chain = read_words(
+            data, offset, max(len(symtab) - self.symoffset, 0), byteorder=byteorder)
+
+    def find(self, name: str) -> int:
+        if not self.buckets or not self.bloom:
+            return -1
+        h = self.elf.gnu_hash(name.encode('utf8'))
+
+        bits = self.bits
+        word = self.bloom[(h // bits) % len(self.bloom)]
+        mask = (1 << (h % bits)) | (1 << ((h >> self.bloom_shift) % bits))
+        if word & mask != mask:
+            return -1
+
+        index = self.buckets[h % len(self.buckets)]
+        if index < self.symoffset:
+            return -1
+
+        while index - self.symoffset < len(self.chain):
+            value = self.chain[index - self.symoffset]
+            if (h | 1) == (value | 1) and self.symtab.get_name(index) == name:
+                return index
+            # 最低位为 1 表示链结束
+            if value & 1:
+                break
+            index += 1
+        return -1
+
+
+class SymbolResolver(object):
+
+    '''
+    按名字查找符号
+
+    优先使用文件自带的 .gnu.hash 和 .hash 节，
+    没有哈希节的文件（例如可重定位文件）退化为在符号表上建立字典索引
+    '''
+
+    def __init__(self, elf: ElfFile):
+        self.elf = elf
+        self.symtab = None
+        self.table = None
+        self.index = None
+
+        hashes = {}
+        for shdr in elf.shdrs:
+            if shdr.sh_type in (Elf32_Shdr.SHT.SHT_GNU_HASH, Elf32_Shdr.SHT.SHT_HASH):
+                hashes[shdr.sh_type] = shdr
+
+        for sh_type, cls in (
+            (Elf32_Shdr.SHT.SHT_GNU_HASH, GnuHashTable),
+            (Elf32_Shdr.SHT.SHT_HASH, SysvHashTable),
+        ):
+            if sh_type not in hashes:
+                continue
+            shdr = hashes[sh_type]
+            self.symtab = SymbolTable(elf, elf.shdrs[shdr.sh_link])
+            self.table = cls(elf, shdr, self.symtab)
+            return
+
+        for sh_type in (Elf32_Shdr.SHT.SHT_DYNSYM, Elf32_Shdr.SHT.SHT_SYMTAB):
+            for shdr in elf.shdrs:
+                if shdr.sh_type == sh_type:
+                    self.symtab = SymbolTable(elf, shdr)
+                    break
+            if self.symtab is not None:
+                break
+
+    def build_index(self):
+        self.index = {}
+        names = self.symtab.names
+        shndx = self.symtab.st_shndx
+        # 同名符号保留第一个全局定义，其次是第一个出现的符号；未定义的引用不是定义，不放进索引
+        for index in range(len(names) - 1, 0, -1):
+            name = names[index]
+            if not name or shndx[index] == Elf32_Shdr.SHN.SHN_UNDEF:
+                continue
+            if name in self.index and self.symtab.bind[self.index[name]] and not self.symtab.bind[index]:
+                continue
+            self.index[name] = index
+
+    def find(self, name: str) -> int:
+        if self.symtab is None:
+            return -1
+        if self.table is not None:
+            return self.table.find(name)
+        if self.index is None:
+            self.build_index()
+        return self.index.get(name, -1)
+
+    def lookup(self, name: str) -> Optional[Symbol]:
+        index = self.find(name)
+        if index < 0:
+            return None
+        return self.symtab[index]
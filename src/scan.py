@@ -0,0 +1,196 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain
+from typing import *
+
+from cache import ElfCache
+from elf import ElfFile, Elf32_Ehdr, Elf32_Shdr, Elf32_Dyn, ElfIdent, DynamicTable
+from stats import ElfStats
+from stream import iter_tar
+from symtab import read_symtab
+
+'''
+批量扫描 ELF 文件，每个文件输出一行 JSON
+
+python src/scan.py /usr/lib
+find / -name '*.so*' | python src/scan.py -l -
+docker save image | python src/scan.py -t -
+'''
+
+MAGIC = ElfIdent.MAGIC.ELFMAG.encode('latin1')
+
+# 缓存目录 -> ElfCache，每个进程只建一次，缓存的总大小只在第一次写入时统计
+CACHES = {}
+
+
+def is_elf(filename) -> bool:
+    try:
+        with open(filename, 'rb') as file:
+            return file.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def walk(paths: Iterable[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for dirpath, _, filenames in os.walk(path):
+            for name in filenames:
+                filename = os.path.join(dirpath, name)
+                # 符号链接指向的文件会在别处被扫描到
+                if os.path.islink(filename) or not os.path.isfile(filename):
+                    continue
+                yield filename
+
+
+def read_list(filename) -> Iterator[str]:
+    file = sys.stdin if filename == '-' else open(filename)
+    with file:
+        for line in file:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def get_needed(elf: ElfFile) -> List[str]:
+    needed = []
+    for shdr in elf.shdrs:
+        if shdr.sh_type != Elf32_Shdr.SHT.SHT_DYNAMIC:
+            continue
+        strtab = elf.get_strtab(elf.shdrs[shdr.sh_link])
+        dynamic = DynamicTable(elf, shdr.data, shdr.sh_entsize)
+        for tag, val in zip(dynamic.columns['d_tag'], dynamic.columns['d_val']):
+            if tag == Elf32_Dyn.DT.DT_NEEDED:
+                needed.append(strtab.get(val))
+    return needed
+
+
+def get_cache(directory) -> ElfCache:
+    cache = CACHES.get(directory)
+    if cache is None:
+        cache = CACHES[directory] = ElfCache(directory)
+    return cache
+
+
+def summarize_cached(filename, cache: ElfCache) -> dict:
+    with cache.load(filename) as cached:
+        meta = cached.meta
+        tables = cached.tables
+        return {
+            'path': filename,
+            'class': meta['class'],
+            'byteorder': meta['byteorder'],
+            'type': Elf32_Ehdr.ET.get_name(meta['type']),
+            'machine': Elf32_Ehdr.EM.get_name(meta['machine']),
+            'sections': cached.section_names,
+            'symbols': len(tables['symtab']['st_name']) if 'symtab' in tables else 0,
+            'dynamic_symbols': len(tables['dynsym']['st_name']) if 'dynsym' in tables else 0,
+            'needed': cached.needed,
+        }
+
+
+def summarize_elf(elf: ElfFile, filename) -> dict:
+    elf.read_header()
+    elf.read_shdrs()
+    header = elf.header
+
+    sections = []
+    if elf.shdrs:
+        shstrtab = elf.shdrs[header.e_shstrndx]
+        sections = [elf.get_str(shstrtab, shdr.sh_name) for shdr in elf.shdrs]
+
+    symtab = read_symtab(elf)
+    dynsym = read_symtab(elf, Elf32_Shdr.SHT.SHT_DYNSYM)
+
+    return {
+        'path': filename,
+        'class': elf.layout.bits,
+        'byteorder': elf.layout.byteorder,
+        'type': header.ET.get_name(header.e_type),
+        'machine': header.EM.get_name(header.e_machine),
+        'sections': sections,
+        'symbols': len(symtab) if symtab is not None else 0,
+        'dynamic_symbols': len(dynsym) if dynsym is not None else 0,
+        'needed': get_needed(elf),
+    }
+
+
+def summarize(filename, cache_dir=None, stats=False) -> dict:
+    try:
+        if cache_dir is not None:
+            return summarize_cached(filename, get_cache(cache_dir))
+        with ElfFile(filename, ElfStats() if stats else None) as elf:
+            summary = summarize_elf(elf, filename)
+            if stats:
+                summary['stats'] = elf.stats.as_dict()
+            return summary
+    except (OSError, ValueError, IndexError) as e:
+        return {'path': filename, 'error': str(e)}
+
+
+def scan_tar(filename, stats=False) -> Iterator[dict]:
+    '''
+    tar 包按流的方式读取，包中的文件不解压到磁盘，暂存超过 spool_size 的大文件除外
+    '''
+    file = sys.stdin.buffer if filename == '-' else open(filename, 'rb')
+    with file:
+        for name, elf in iter_tar(file, stats):
+            try:
+                summary = summarize_elf(elf, f'{filename}:{name}')
+                if stats:
+                    summary['stats'] = elf.stats.as_dict()
+                yield summary
+            except (ValueError, IndexError) as e:
+                yield {'path': f'{filename}:{name}', 'error': str(e)}
+
+
+def scan(filenames: Iterable[str], workers=None, chunksize=16, cache_dir=None, stats=False) -> Iterator[dict]:
+    filenames = (filename for filename in filenames if is_elf(filename))
+    function = partial(summarize, cache_dir=cache_dir, stats=stats)
+    if workers == 1:
+        yield from map(function, filenames)
+        return
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        yield from executor.map(function, filenames, chunksize=chunksize)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='scan elf files and print json lines')
+    parser.add_argument('paths', nargs='*', help='files or directories to scan')
+    parser.add_argument('-l', '--list', help='read file names from a file, - for stdin')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes, default is cpu count')
+    parser.add_argument('-c', '--cache', help='directory of the parsed metadata cache')
+    parser.add_argument('-t', '--tar', action='append', default=[], help='scan members of a tar archive as a stream, - for stdin')
+    parser.add_argument('-s', '--stats', action='store_true', help='add per-stage reader statistics to each line')
+    args = parser.parse_args(argv)
+
+    filenames = walk(args.paths)
+    if args.list:
+        filenames = chain(read_list(args.list), filenames)
+
+    summaries = chain.from_iterable(scan_tar(filename, args.stats) for filename in args.tar)
+    if args.paths or args.list or not args.tar:
+        summaries = chain(summaries, scan(filenames, args.jobs, cache_dir=args.cache, stats=args.stats))
+
+    write = sys.stdout.write
+    for summary in summaries:
+        write(json.dumps(summary))
+        write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import time
+
+'''
+读取过程的统计
+
+给 ElfFile 传入 ElfStats 之后，各个 read_* 阶段记录耗时、读取的字节数、
+解码的结构体（表项）数和解析出的字符串数，可选地记录 tracemalloc 峰值和快照。
+没有传入时每个阶段只多一次 stats is None 的判断，
+tracemalloc 只在需要时才导入
+'''
+
+
+class StageStats(object):
+
+    FIELDS = ('calls', 'time', 'bytes', 'structs', 'strings', 'peak')
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.time = 0.0
+        self.bytes = 0
+        self.structs = 0
+        self.strings = 0
+        self.peak = 0
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+
+class ElfStats(object):
+
+    '''
+    bytes, structs 由读取器直接累加，strings 为字符串表中缓存的字符串数的增量；
+    阶段嵌套时外层阶段的数字包含内层阶段
+    '''
+
+    def __init__(self, trace_memory=False, snapshots=False):
+        self.trace_memory = trace_memory or snapshots
+        self.keep_snapshots = snapshots
+
+        self.bytes = 0
+        self.structs = 0
+        self.stages = {}
+        self.snapshots = {}
+        self.stack = []
+        self.nested = set()
+        self.started = False
+
+    def begin(self, name, strings=0):
+        if self.stack:
+            self.nested.add(name)
+        elif self.trace_memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started = True
+            tracemalloc.reset_peak()
+        self.stack.append((name, time.perf_counter(), self.bytes, self.structs, strings))
+
+    def end(self, strings=0):
+        name, start, bytes, structs, strings_start = self.stack.pop()
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = StageStats(name)
+        stage.calls += 1
+        stage.time += time.perf_counter() - start
+        stage.bytes += self.bytes - bytes
+        stage.structs += self.structs - structs
+        stage.strings += strings - strings_start
+
+        if not self.trace_memory:
+            return
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            stage.peak = max(stage.peak, tracemalloc.get_traced_memory()[1])
+            if self.keep_snapshots:
+                self.snapshots[name] = tracemalloc.take_snapshot()
+            if not self.stack and self.started:
+                tracemalloc.stop()
+                self.started = False
+
+    def total(self) -> StageStats:
+        # 只累加最外层的阶段，避免嵌套的阶段重复计算
+        total = StageStats('total')
+        for stage in self.stages.values():
+            if stage.name in self.nested:
+                continue
+            for name in ('calls', 'time', 'bytes', 'structs', 'strings'):
+                setattr(total, name, getattr(total, name) + getattr(stage, name))
+            total.peak = max(total.peak, stage.peak)
+        return total
+
+    def as_dict(self) -> dict:
+        stages = {name: stage.as_dict() for name, stage in self.stages.items()}
+        stages['total'] = self.total().as_dict()
+        return stages
+
+    def summary(self) -> str:
+        '''
+        一行文字的摘要，例如
+
+        header 0.01ms 64B | shdrs 0.02ms 1.2KiB 30 structs | total 0.03ms 1.3KiB 31 structs 0 strings
+        '''
+        parts = []
+        for stage in list(self.stages.values()) + [self.total()]:
+            part = f'{stage.name} {stage.time * 1000:.2f}ms {format_size(stage.bytes)}'
+            if stage.structs:
+                part += f' {stage.structs} structs'
+            if stage.strings or stage.name == 'total':
+                part += f' {stage.strings} strings'
+            if stage.peak:
+                part += f' peak {format_size(stage.peak)}'
+            parts.append(part)
+        return ' | '.join(parts)
+
+
+def format_size(size) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return f'{size:.1f}{unit}' if unit != 'B' else f'{size}B'
+        size /= 1024
+    return f'{size:.1f}GiB'
+
+
+def stage(function):
+    '''
+    把 read_* 函数记为一个阶段，第一个参数为 ElfFile，阶段名为去掉 read_ 前缀的函数名
+    '''
+    name = function.__name__
+    if name.startswith('read_'):
+        name = name[len('read_'):]
+
+    def wrapper(elf, *args, **kwargs):
+        stats = elf.stats
+        if stats is None:
+            return function(elf, *args, **kwargs)
+        stats.begin(name, elf.count_strings())
+        try:
+            return function(elf, *args, **kwargs)
+        finally:
+            stats.end(elf.count_strings())
+
+    # 不用 functools.wraps，少导入一个模块
+    wrapper.__name__ = function.__name__
+    wrapper.__qualname__ = function.__qualname__
+    wrapper.__doc__ = function.__doc__
+    wrapper.__wrapped__ = function
+    return wrapper
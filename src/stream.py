@@ -0,0 +1,310 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import struct
+import tarfile
+import tempfile
+from bisect import bisect_right
+from ctypes import sizeof
+from typing import *
+
+from elf import ElfFile, ElfIdent, ElfLayout, Elf32_Shdr, Elf32_Phdr
+from stats import ElfStats
+
+'''
+不可 seek 的输入（管道、tar 成员）的单遍解析
+
+输入只从前往后读一遍，只缓存之后会用到的区域
+'''
+
+# 默认需要保留内容的节
+WANTED = {
+    Elf32_Shdr.SHT.SHT_SYMTAB,
+    Elf32_Shdr.SHT.SHT_STRTAB,
+    Elf32_Shdr.SHT.SHT_RELA,
+    Elf32_Shdr.SHT.SHT_HASH,
+    Elf32_Shdr.SHT.SHT_DYNAMIC,
+    Elf32_Shdr.SHT.SHT_NOTE,
+    Elf32_Shdr.SHT.SHT_REL,
+    Elf32_Shdr.SHT.SHT_DYNSYM,
+    Elf32_Shdr.SHT.SHT_GNU_HASH,
+    Elf32_Shdr.SHT.SHT_GNU_verdef,
+    Elf32_Shdr.SHT.SHT_GNU_verneed,
+    Elf32_Shdr.SHT.SHT_GNU_versym,
+}
+
+# 没有节头表时，从程序头表中保留的段
+WANTED_SEGMENTS = {
+    Elf32_Phdr.PT.PT_DYNAMIC,
+    Elf32_Phdr.PT.PT_INTERP,
+    Elf32_Phdr.PT.PT_NOTE,
+}
+
+CHUNK = 1 << 20
+
+
+def wanted_section(shdr) -> bool:
+    return shdr.sh_type in WANTED
+
+
+def merge_ranges(ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged = []
+    for start, end in sorted(ranges):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_ranges(ranges: List[Tuple[int, int]], holes: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    '''
+    两边都是合并过的有序区间，返回 ranges 中不在 holes 里的部分
+    '''
+    result = []
+    for start, end in ranges:
+        for low, high in holes:
+            if high <= start or low >= end:
+                continue
+            if low > start:
+                result.append((start, low))
+            start = max(start, high)
+            if start >= end:
+                break
+        if start < end:
+            result.append((start, end))
+    return result
+
+
+class StreamElfFile(ElfFile):
+
+    '''
+    从流中按顺序读取 ELF
+
+    节头表通常在文件末尾，读到之前并不知道各个节的位置，
+    这之前经过的内容暂存在 SpooledTemporaryFile 中，
+    只有代码段（不在文件开头的可执行 PT_LOAD）可以确定用不到而直接跳过。
+    暂存的内容超过 spool_size 后会写入临时文件，读到节头表后删除，
+    所以这种情况下并不是完全不经过磁盘；需要时可以调大 spool_size。
+    读到节头表后只保留 wanted 选中的节，之后的内容按文件偏移顺序只读取需要的部分。
+
+    没有缓存的区域不能访问，get_data 等会抛出 ValueError
+    '''
+
+    def __init__(self, stream, filename='<stream>', wanted: Callable = wanted_section, spool_size=64 * 1024 * 1024,
+                 stats=None):
+        self.filename = filename
+        self.stats = stats
+        self.stream = stream
+        self.wanted = wanted
+        self.spool_size = spool_size
+
+        self.position = 0
+        self.starts = []
+        self.regions = []
+
+        self.spool = None
+        self.extents = []
+        self.skips = []
+        self.needed = None
+
+        self.reset()
+        self.load()
+
+    def close(self):
+        self.reset()
+        self.starts = []
+        self.regions = []
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+
+    def read(self, size) -> bytes:
+        data = self.stream.read(size)
+        while len(data) < size:
+            chunk = self.stream.read(size - len(data))
+            if not chunk:
+                raise ValueError(f'{self.filename}: unexpected end of stream')
+            data += chunk
+        self.position += size
+        return data
+
+    def add_region(self, offset, buffer: bytearray):
+        index = bisect_right(self.starts, offset)
+        self.starts.insert(index, offset)
+        self.regions.insert(index, buffer)
+
+    def get_buffer(self, offset, size):
+        index = bisect_right(self.starts, offset)
+        # 区域之间可能重叠，从起始位置不大于 offset 的区域往前找
+        while index > 0:
+            index -= 1
+            start = self.starts[index]
+            buffer = self.regions[index]
+            if offset + size <= start + len(buffer):
+                return buffer, offset - start
+        raise ValueError(f'{self.filename}: range 0x{offset:x}+0x{size:x} is not buffered')
+
+    def get_data(self, offset, size):
+        if size == 0:
+            return None
+        buffer, start = self.get_buffer(offset, size)
+        if self.stats is not None:
+            self.stats.bytes += size
+        return memoryview(buffer)[start:start + size]
+
+    def release_data(self, offset, size):
+        pass
+
+    def load(self):
+        ident = self.read(sizeof(ElfIdent))
+        if ident[:4] != ElfIdent.MAGIC.ELFMAG.encode('latin1'):
+            raise ValueError(f'{self.filename} is not an elf file')
+        layout = ElfLayout.get(ident[4], ident[5])
+        self.add_region(0, bytearray(ident + self.read(sizeof(layout.Ehdr) - len(ident))))
+        self.read_header()
+
+        header = self.header
+        tables = []
+        if header.e_phnum:
+            tables.append((header.e_phoff, header.e_phnum * header.e_phentsize, 'phdrs'))
+        if header.e_shnum:
+            tables.append((header.e_shoff, header.e_shnum * header.e_shentsize, 'shdrs'))
+        tables.sort()
+
+        for offset, size, name in tables:
+            if offset < self.position:
+                raise ValueError(f'{self.filename}: overlapping header tables')
+            self.consume(offset)
+            self.add_region(offset, bytearray(self.read(size)))
+            if name == 'phdrs':
+                self.read_phdrs()
+                self.plan_segments()
+            else:
+                self.read_shdrs()
+                self.plan_sections()
+
+        if self.needed is None:
+            self.plan_needed([
+                (phdr.p_offset, phdr.p_offset + phdr.p_filesz)
+                for phdr in self.phdrs if phdr.p_type in WANTED_SEGMENTS
+            ])
+        if self.needed:
+            self.consume(self.needed[-1][1])
+
+    def plan_segments(self):
+        # 不在文件开头的可执行段里只有代码，不会用到
+        for phdr in self.phdrs:
+            if phdr.p_type != Elf32_Phdr.PT.PT_LOAD or not phdr.p_flags & Elf32_Phdr.PF.PF_X:
+                continue
+            if phdr.p_offset == 0:
+                continue
+            self.skips.append((phdr.p_offset, phdr.p_offset + phdr.p_filesz))
+        self.skips = merge_ranges(self.skips)
+
+    def plan_sections(self):
+        ranges = []
+        for shdr in self.shdrs:
+            start, size = shdr.body_range()
+            if size and self.wanted(shdr):
+                ranges.append((start, start + size))
+        for phdr in self.phdrs:
+            if phdr.p_type in WANTED_SEGMENTS:
+                ranges.append((phdr.p_offset, phdr.p_offset + phdr.p_filesz))
+        self.plan_needed(ranges)
+
+    def plan_needed(self, ranges):
+        # 已经跳过的代码段取不回来，其中的节不分配区域，访问时报告没有缓存，而不是给出全 0 的内容
+        skipped = [(low, min(high, self.position)) for low, high in self.skips if low < self.position]
+        self.needed = subtract_ranges(merge_ranges(ranges), skipped)
+        for start, end in self.needed:
+            buffer = bytearray(end - start)
+            self.add_region(start, buffer)
+
+        if self.spool is None:
+            return
+
+        # 已经经过的部分从暂存文件中取回，两边都按偏移排序，顺序读取
+        for start, end in self.needed:
+            buffer, _ = self.get_buffer(start, end - start)
+            view = memoryview(buffer)
+            for offset, position, size in self.extents:
+                low = max(start, offset)
+                high = min(end, offset + size)
+                if low >= high:
+                    continue
+                self.spool.seek(position + low - offset)
+                self.spool.readinto(view[low - start:high - start])
+            view.release()
+
+        self.spool.close()
+        self.spool = None
+        self.extents = []
+
+    def consume(self, end):
+        while self.position < end:
+            offset = self.position
+            chunk = self.read(min(end - offset, CHUNK))
+            if self.needed is None:
+                self.spool_chunk(offset, chunk)
+            else:
+                self.keep_chunk(offset, chunk)
+
+    def spool_chunk(self, offset, chunk: bytes):
+        if self.spool is None:
+            self.spool = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+
+        end = offset + len(chunk)
+        pieces = []
+        start = offset
+        for low, high in self.skips:
+            if high <= start or low >= end:
+                continue
+            if low > start:
+                pieces.append((start, low))
+            start = high
+        if start < end:
+            pieces.append((start, end))
+
+        for low, high in pieces:
+            self.extents.append((low, self.spool.tell(), high - low))
+            self.spool.write(chunk[low - offset:high - offset])
+
+    def keep_chunk(self, offset, chunk: bytes):
+        end = offset + len(chunk)
+        for start, stop in self.needed:
+            low = max(start, offset)
+            high = min(stop, end)
+            if low >= high:
+                continue
+            buffer, position = self.get_buffer(start, stop - start)
+            buffer[position + low - start:position + high - start] = chunk[low - offset:high - offset]
+
+
+def iter_tar(fileobj, stats=False, **kwargs) -> Iterator[Tuple[str, StreamElfFile]]:
+    '''
+    按顺序解析 tar 包中的 ELF 文件，tar 包本身也以流的方式读取，成员不解压到磁盘
+    （单个成员的暂存内容超过 spool_size 时除外，见 StreamElfFile）；
+    每个 StreamElfFile 需要在取下一个之前用完，stats 为 True 时每个文件各有一个 ElfStats。
+    不是 ELF 或者头部已经损坏、读不完整的成员跳过
+    '''
+    with tarfile.open(fileobj=fileobj, mode='r|*') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            stream = tar.extractfile(member)
+            try:
+                elf = StreamElfFile(stream, member.name, stats=ElfStats() if stats else None, **kwargs)
+            except (ValueError, IndexError, struct.error, EOFError, OSError):
+                continue
+            try:
+                yield member.name, elf
+            finally:
+                elf.close()
@@ -0,0 +1,176 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import sys
+
+
+class StringTable(object):
+
+    '''
+    字符串表 (SHT_STRTAB)
+
+    data 可以是 bytes 或 mmap，只要支持 find 和切片，
+    offset 和 size 给出字符串表在 data 中的范围。
+    偏移 -> 字符串的结果会缓存下来，相同的名字只保留一份 (sys.intern)，
+    也支持名字 -> 偏移的反向查找
+    '''
+
+    def __init__(self, data, offset=0, size=None):
+        if size is None:
+            size = len(data) - offset
+        self.data = data
+        self.offset = offset
+        self.size = size
+
+        self.strings = {}
+        self.offsets = None
+
+    def __len__(self):
+        return self.size
+
+    def get(self, index) -> str:
+        string = self.strings.get(index)
+        if string is not None:
+            return string
+
+        start = self.offset + index
+        end = self.data.find(b'\0', start, self.offset + self.size)
+        if end == -1:
+            return ''
+        string = sys.intern(str(self.data[start:end], 'utf8'))
+        self.strings[index] = string
+        return string
+
+    __getitem__ = get
+
+    def build(self):
+        '''
+        一次性为表中所有字符串的起始偏移建立索引
+        '''
+        data = self.data[self.offset:self.offset + self.size]
+        index = 0
+        for string in bytes(data).split(b'\0'):
+            if index >= self.size:
+                break
+            if index not in self.strings:
+                self.strings[index] = sys.intern(str(string, 'utf8'))
+            index += len(string) + 1
+
+        self.offsets = {}
+        for index, string in self.strings.items():
+            if string not in self.offsets or index < self.offsets[string]:
+                self.offsets[string] = index
+
+    def find(self, name: str) -> int:
+        '''
+        反向查找，返回名字在表中的偏移，不存在时返回 -1
+        '''
+        if self.offsets is None:
+            self.build()
+        index = self.offsets.get(name)
+        if index is not None:
+            return index
+
+        # 名字可能是其它字符串的后缀，例如 .text 之于 .rel.text
+        start = self.data.find(name.encode('utf8') + b'\0', self.offset, self.offset + self.size)
+        if start == -1:
+            return -1
+        index = start - self.offset
+        self.offsets[name] = index
+        return index
+
+
+class StringTableBuilder(object):
+
+    '''
+    字符串表的生成
+
+    相同的名字只保存一份，一个名字是另一个名字的后缀时直接指向它的结尾，
+    例如 bar 复用 foobar，.text 复用 .rel.text。
+    finalize 把所有名字按反转后的字节串排序，后缀总是紧跟在以它结尾的名字之后，
+    一次遍历即可找出全部可以合并的名字，整体为 O(n log n)；
+    其余的名字按加入的顺序排列，与 ld 相同
+    '''
+
+    def __init__(self):
+        self.names = {}
+        self.offsets = None
+        self.data = None
+
+    def __len__(self):
+        return len(self.finalize())
+
+    def add(self, name: str):
+        if self.data is not None:
+            raise ValueError('string table is already finalized')
+        self.names.setdefault(name, None)
+
+    def update(self, names: 'Iterable[str]'):
+        if self.data is not None:
+            raise ValueError('string table is already finalized')
+        self.names.update(dict.fromkeys(names))
+
+    def finalize(self) -> bytes:
+        if self.data is not None:
+            return self.data
+
+        encoded = [name.encode('utf8') for name in self.names]
+        reversed_names = [name[::-1] for name in encoded]
+        count = len(encoded)
+
+        # 逆序排列时，以 r 为前缀的反转名字都排在 r 之前，且紧邻 r 的那个一定以 r 为前缀；
+        # parents 为合并到的名字，deltas 为在它里面的偏移
+        parents = [-1] * count
+        deltas = [0] * count
+        previous = -1
+        previous_name = b''
+        for index in sorted(range(count), key=reversed_names.__getitem__, reverse=True):
+            name = reversed_names[index]
+            if name and previous_name.startswith(name):
+                root = parents[previous]
+                parents[index] = previous if root < 0 else root
+                deltas[index] = deltas[previous] + len(previous_name) - len(name)
+            previous = index
+            previous_name = name
+
+        offsets = [0] * count
+        parts = [b'']
+        position = 1
+        for index, name in enumerate(encoded):
+            if name and parents[index] < 0:
+                offsets[index] = position
+                parts.append(name)
+                position += len(name) + 1
+        for index, parent in enumerate(parents):
+            if parent >= 0:
+                offsets[index] = offsets[parent] + deltas[index]
+
+        parts.append(b'')
+        self.data = b'\0'.join(parts)
+        self.offsets = dict(zip(self.names, offsets))
+        return self.data
+
+    def get_offset(self, name: str) -> int:
+        '''
+        名字在表中的偏移，即 st_name / sh_name
+        '''
+        self.finalize()
+        return self.offsets[name]
+
+    __getitem__ = get_offset
+
+
+def build_strtab(names: 'Iterable[str]') -> 'Tuple[bytes, List[int]]':
+    '''
+    批量生成字符串表，返回表的内容和每个名字的偏移
+    '''
+    names = list(names)
+    builder = StringTableBuilder()
+    builder.update(names)
+    data = builder.finalize()
+    return data, list(map(builder.offsets.__getitem__, names))
@@ -0,0 +1,104 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+from array import array
+from bisect import bisect_right
+from itertools import repeat
+from typing import *
+
+from elf import ElfFile, Elf32_Shdr, Elf32_Sym
+from symtab import SymbolTable, read_symtab
+
+
+class AddressIndex(object):
+
+    '''
+    地址 -> 符号 的区间索引
+
+    符号按 st_value 排序，每个符号覆盖 [st_value, st_value + st_size)，
+    大小为 0 的符号延伸到下一个符号或所在节的末尾。
+    适用于可执行文件和共享库，可重定位文件中的 st_value 是节内偏移
+    '''
+
+    TYPES = {
+        Elf32_Sym.STT.STT_NOTYPE,
+        Elf32_Sym.STT.STT_OBJECT,
+        Elf32_Sym.STT.STT_FUNC,
+        Elf32_Sym.STT.STT_GNU_IFUNC,
+    }
+
+    def __init__(self, elf: ElfFile, symtab: SymbolTable = None):
+        if symtab is None:
+            symtab = read_symtab(elf) or read_symtab(elf, Elf32_Shdr.SHT.SHT_DYNSYM)
+        self.symtab = symtab
+
+        entries = []
+        if symtab is not None:
+            st_value = symtab.st_value
+            st_size = symtab.st_size
+            st_shndx = symtab.st_shndx
+            types = symtab.type
+            for index in range(1, len(symtab)):
+                shndx = st_shndx[index]
+                if shndx == Elf32_Shdr.SHN.SHN_UNDEF or shndx >= Elf32_Shdr.SHN.SHN_LORESERVE:
+                    continue
+                if types[index] not in self.TYPES or not st_value[index]:
+                    continue
+                # 同一地址上的多个别名，优先保留较大的那个
+                entries.append((st_value[index], -st_size[index], shndx, index))
+        entries.sort()
+
+        self.starts = array('Q')
+        self.ends = array('Q')
+        self.indices = array('I')
+
+        shdrs = elf.shdrs
+        for position, (start, size, shndx, index) in enumerate(entries):
+            if self.starts and self.starts[-1] == start:
+                continue
+            if size:
+                end = start - size
+            else:
+                shdr = shdrs[shndx]
+                end = shdr.sh_addr + shdr.sh_size
+                if position + 1 < len(entries):
+                    end = min(end, entries[position + 1][0])
+            self.starts.append(start)
+            self.ends.append(max(end, start))
+            self.indices.append(index)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def lookup(self, address) -> Optional[Tuple[str, int]]:
+        '''
+        返回 (符号名, 地址相对于符号的偏移)，不在任何符号内时返回 None
+        '''
+        position = bisect_right(self.starts, address) - 1
+        if position < 0 or address >= self.ends[position]:
+            return None
+        return self.symtab.get_name(self.indices[position]), address - self.starts[position]
+
+    def lookup_many(self, addresses: Sequence[int]) -> List[Optional[Tuple[str, int]]]:
+        '''
+        批量符号化，所有地址的二分查找在一次 map 中完成
+        '''
+        starts = self.starts
+        ends = self.ends
+        names = self.symtab.names if self.symtab is not None else []
+        indices = self.indices
+
+        positions = map(bisect_right, repeat(starts), addresses)
+        result = []
+        for address, position in zip(addresses, positions):
+            position -= 1
+            if position < 0 or address >= ends[position]:
+                result.append(None)
+            else:
+                result.append((names[indices[position]], address - starts[position]))
+        return result
@@ -0,0 +1,102 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+from collections import namedtuple
+from ctypes import sizeof
+from typing import *
+
+from columns import decode_columns, struct_layout
+from elf import ElfFile, Elf32_Shdr
+from stats import stage
+
+# st_info 高 4 位为 bind，低 4 位为 type，查表即可整列拆分
+BIND_TABLE = bytes(info >> 4 for info in range(256))
+TYPE_TABLE = bytes(info & 0xf for info in range(256))
+
+Symbol = namedtuple('Symbol', [
+    'name',
+    'value',
+    'size',
+    'bind',
+    'type',
+    'other',
+    'shndx',
+])
+
+
+class SymbolTable(object):
+
+    '''
+    列式存储的符号表
+
+    st_name, st_value, st_size, st_info, st_other, st_shndx 各为一个 array 列，
+    bind 和 type 为 bytes 列，由 st_info 整列查表得到
+    '''
+
+    def __init__(self, elf: ElfFile, shdr: Elf32_Shdr):
+        self.elf = elf
+        self.shdr = shdr
+        self.strtab = elf.get_strtab(elf.shdrs[shdr.sh_link])
+
+        cls = elf.layout.Sym
+        entsize = shdr.sh_entsize or sizeof(cls)
+        columns = decode_columns(
+            shdr.data, entsize, struct_layout(cls), elf.layout.byteorder)
+
+        self.st_name = columns['st_name']
+        self.st_value = columns['st_value']
+        self.st_size = columns['st_size']
+        self.st_info = columns['st_info']
+        self.st_other = columns['st_other']
+        self.st_shndx = columns['st_shndx']
+
+        info = self.st_info.tobytes()
+        self.bind = info.translate(BIND_TABLE)
+        self.type = info.translate(TYPE_TABLE)
+
+        self._names = None
+
+        if elf.stats is not None:
+            elf.stats.structs += len(self.st_name)
+
+    def __len__(self):
+        return len(self.st_name)
+
+    def __getitem__(self, index) -> Symbol:
+        return Symbol(
+            self.get_name(index),
+            self.st_value[index],
+            self.st_size[index],
+            self.bind[index],
+            self.type[index],
+            self.st_other[index],
+            self.st_shndx[index],
+        )
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def get_name(self, index) -> str:
+        if self._names is not None:
+            return self._names[index]
+        return self.strtab.get(self.st_name[index])
+
+    @property
+    def names(self) -> List[str]:
+        if self._names is None:
+            self._names = list(map(self.strtab.get, self.st_name))
+        return self._names
+
+
+@stage
+def read_symtab(elf: ElfFile, sh_type=Elf32_Shdr.SHT.SHT_SYMTAB) -> Optional[SymbolTable]:
+    for shdr in elf.shdrs:
+        if shdr.sh_type == sh_type:
+            return SymbolTable(elf, shdr)
+    return None
@@ -0,0 +1,270 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+from array import array
+from collections import namedtuple
+from ctypes import sizeof
+from typing import *
+
+from columns import encode_columns, struct_layout
+from elf import ElfIdent, ElfLayout, Elf32_Ehdr, Elf32_Shdr, Elf32_Sym, Elf32_Rel
+from elfgen import align
+from strtab import build_strtab
+
+'''
+ELF32 可重定位文件的生成
+
+编译器输出的 .text, .data 的内容、符号和 .text 的重定位直接写成可重定位文件，不再调用汇编器。
+先确定所有节的偏移，再一次性分配整个文件，文件头和节头通过 from_buffer 写入，
+符号表和重定位表按列写入，最后一次 write 写出。节的布局与 nasm -f elf32 相同：
+
+    .text, .data, .shstrtab, .symtab, .strtab, .rel.text
+
+    writer = ObjectWriter('test.asm')
+    writer.text += code
+    writer.data += b'hello world!!!\\n\\r\\0'
+    writer.add_symbol('main', '.text', bind=Elf32_Sym.STB.STB_GLOBAL)
+    writer.add_symbol('message', '.data')
+    writer.add_relocation(11, 'message')
+    writer.write('build/test.o')
+'''
+
+ObjectSymbol = namedtuple('ObjectSymbol', [
+    'name',
+    'section',
+    'value',
+    'size',
+    'bind',
+    'type',
+])
+
+ObjectRelocation = namedtuple('ObjectRelocation', [
+    'offset',
+    'name',
+    'type',
+])
+
+SHT = Elf32_Shdr.SHT
+SHF = Elf32_Shdr.SHF
+
+# 节名, 类型, 标志, 对齐, 表项大小
+SECTIONS = (
+    ('.text', SHT.SHT_PROGBITS, SHF.SHF_ALLOC | SHF.SHF_EXECINSTR, 16, 0),
+    ('.data', SHT.SHT_PROGBITS, SHF.SHF_ALLOC | SHF.SHF_WRITE, 4, 0),
+    ('.shstrtab', SHT.SHT_STRTAB, 0, 1, 0),
+    ('.symtab', SHT.SHT_SYMTAB, 0, 4, sizeof(Elf32_Sym)),
+    ('.strtab', SHT.SHT_STRTAB, 0, 1, 0),
+    ('.rel.text', SHT.SHT_REL, 0, 4, sizeof(Elf32_Rel)),
+)
+
+INDICES = {name: index for index, (name, *_) in enumerate(SECTIONS, 1)}
+
+# 包含符号地址、写入时需要加上局部符号偏移的重定位类型
+ADDRESS_TYPES = {
+    Elf32_Rel.R.R_386_32,
+    Elf32_Rel.R.R_386_PC32,
+}
+
+
+class ObjectWriter(object):
+
+    '''
+    symbols 按加入的顺序保存，写出时局部符号在前；
+    引用局部符号的重定位改为引用所在节的节符号，符号的偏移加到 .text 中的隐含加数上
+    '''
+
+    def __init__(self, source=''):
+        self.source = source
+        self.text = bytearray()
+        self.data = bytearray()
+        self.symbols = {}
+        self.relocations = []
+
+    def add_symbol(self, name, section=None, value=0, size=0,
+                   bind=Elf32_Sym.STB.STB_LOCAL, type=Elf32_Sym.STT.STT_NOTYPE) -> ObjectSymbol:
+        '''
+        section 为 '.text' 或 '.data'，为 None 时是未定义的外部符号
+        '''
+        if section is not None and section not in ('.text', '.data'):
+            raise ValueError(f'symbol {name} is in unsupported section {section}')
+        old = self.symbols.get(name)
+        if old is not None and old.section is not None and section is not None:
+            raise ValueError(f'symbol {name} is already defined')
+        if old is not None and section is None:
+            return old
+        symbol = ObjectSymbol(name, section, value, size, bind, type)
+        self.symbols[name] = symbol
+        return symbol
+
+    def add_relocation(self, offset, name, type=Elf32_Rel.R.R_386_32) -> ObjectRelocation:
+        '''
+        .text 中 offset 处的 4 字节引用符号 name，还没有定义的符号先作为外部符号加入
+        '''
+        if name not in self.symbols:
+            self.add_symbol(name, bind=Elf32_Sym.STB.STB_GLOBAL)
+        relocation = ObjectRelocation(offset, name, type)
+        self.relocations.append(relocation)
+        return relocation
+
+    def order_symbols(self) -> List[ObjectSymbol]:
+        STB = Elf32_Sym.STB
+        STT = Elf32_Sym.STT
+        SHN = Elf32_Shdr.SHN
+
+        symbols = [ObjectSymbol('', None, 0, 0, STB.STB_LOCAL, STT.STT_NOTYPE)]
+        if self.source:
+            symbols.append(ObjectSymbol(self.source, SHN.SHN_ABS, 0, 0, STB.STB_LOCAL, STT.STT_FILE))
+        for name in ('.text', '.data'):
+            symbols.append(ObjectSymbol('', name, 0, 0, STB.STB_LOCAL, STT.STT_SECTION))
+
+        for symbol in self.symbols.values():
+            if symbol.bind != STB.STB_LOCAL:
+                continue
+            if symbol.section is None:
+                raise ValueError(f'local symbol {symbol.name} is not defined')
+            symbols.append(symbol)
+        symbols.extend(symbol for symbol in self.symbols.values() if symbol.bind != STB.STB_LOCAL)
+        return symbols
+
+    def build(self) -> bytearray:
+        layout = ElfLayout.get(ElfIdent.CLASS.ELFCLASS32, ElfIdent.DATA.ELFDATA2LSB)
+        STB = Elf32_Sym.STB
+
+        symbols = self.order_symbols()
+        first_global = sum(1 for symbol in symbols if symbol.bind == STB.STB_LOCAL)
+        strtab, st_names = build_strtab(symbol.name for symbol in symbols[1:])
+        shstrtab, sh_names = build_strtab(name for name, *_ in SECTIONS)
+
+        # 局部符号的重定位改为引用节符号
+        indices = {symbol.name: index for index, symbol in enumerate(symbols)
+                   if symbol.name and index >= first_global}
+        sections = {symbol.section: index for index, symbol in enumerate(symbols)
+                    if symbol.type == Elf32_Sym.STT.STT_SECTION}
+        r_offset = array('I')
+        r_info = array('I')
+        addends = []
+        for relocation in self.relocations:
+            if relocation.offset + 4 > len(self.text):
+                raise ValueError(f'relocation for {relocation.name} at {relocation.offset:#x} is out of .text')
+            symbol = self.symbols[relocation.name]
+            if symbol.bind == STB.STB_LOCAL:
+                index = sections[symbol.section]
+                if relocation.type in ADDRESS_TYPES and symbol.value:
+                    addends.append((relocation.offset, symbol.value))
+            else:
+                index = indices[relocation.name]
+            r_offset.append(relocation.offset)
+            r_info.append(index << layout.r_shift | relocation.type)
+
+        contents = {
+            '.text': self.text,
+            '.data': self.data,
+            '.shstrtab': shstrtab,
+            '.symtab': None,
+            '.strtab': strtab,
+            '.rel.text': None,
+        }
+        sizes = {
+            '.text': len(self.text),
+            '.data': len(self.data),
+            '.shstrtab': len(shstrtab),
+            '.symtab': len(symbols) * sizeof(layout.Sym),
+            '.strtab': len(strtab),
+            '.rel.text': len(r_offset) * sizeof(layout.Rel),
+        }
+
+        # 先确定所有偏移，再一次性分配整个文件
+        offsets = {}
+        offset = sizeof(layout.Ehdr)
+        for name, _, _, alignment, _ in SECTIONS:
+            offset = align(offset, alignment)
+            offsets[name] = offset
+            offset += sizes[name]
+        shoff = align(offset, 4)
+        total = shoff + (len(SECTIONS) + 1) * sizeof(layout.Shdr)
+
+        buf = bytearray(total)
+        view = memoryview(buf)
+
+        buf[0:4] = ElfIdent.MAGIC.ELFMAG.encode('latin1')
+        buf[4] = ElfIdent.CLASS.ELFCLASS32
+        buf[5] = ElfIdent.DATA.ELFDATA2LSB
+        buf[6] = Elf32_Ehdr.EV.EV_CURRENT
+
+        header = layout.Ehdr.from_buffer(buf, 0)
+        header.e_type = Elf32_Ehdr.ET.ET_REL
+        header.e_machine = Elf32_Ehdr.EM.EM_386
+        header.e_version = Elf32_Ehdr.EV.EV_CURRENT
+        header.e_shoff = shoff
+        header.e_ehsize = sizeof(layout.Ehdr)
+        header.e_shentsize = sizeof(layout.Shdr)
+        header.e_shnum = len(SECTIONS) + 1
+        header.e_shstrndx = INDICES['.shstrtab']
+
+        for name, data in contents.items():
+            if data:
+                buf[offsets[name]:offsets[name] + len(data)] = data
+
+        # 隐含加数在 .text 中，局部符号的偏移直接加上
+        text = offsets['.text']
+        for offset, value in addends:
+            start = text + offset
+            addend = int.from_bytes(buf[start:start + 4], 'little') + value
+            buf[start:start + 4] = (addend & 0xffffffff).to_bytes(4, 'little')
+
+        # 符号表和重定位表按列写入
+        st_shndx = array('H')
+        for symbol in symbols:
+            if symbol.section is None:
+                st_shndx.append(Elf32_Shdr.SHN.SHN_UNDEF)
+            elif isinstance(symbol.section, int):
+                st_shndx.append(symbol.section)
+            else:
+                st_shndx.append(INDICES[symbol.section])
+        columns = {
+            'st_name': array('I', [0] + st_names),
+            'st_value': array('I', (symbol.value for symbol in symbols)),
+            'st_size': array('I', (symbol.size for symbol in symbols)),
+            'st_info': array('B', (symbol.bind << 4 | symbol.type for symbol in symbols)),
+            'st_shndx': st_shndx,
+        }
+        start = offsets['.symtab']
+        encode_columns(
+            view[start:start + sizes['.symtab']], sizeof(layout.Sym),
+            struct_layout(layout.Sym), columns)
+
+        start = offsets['.rel.text']
+        encode_columns(
+            view[start:start + sizes['.rel.text']], sizeof(layout.Rel),
+            struct_layout(layout.Rel), {'r_offset': r_offset, 'r_info': r_info})
+
+        links = {
+            '.symtab': (INDICES['.strtab'], first_global),
+            '.rel.text': (INDICES['.symtab'], INDICES['.text']),
+        }
+        shdrs = (layout.Shdr * (len(SECTIONS) + 1)).from_buffer(buf, shoff)
+        for index, (name, sh_type, flags, alignment, entsize) in enumerate(SECTIONS, 1):
+            shdr = shdrs[index]
+            shdr.sh_name = sh_names[index - 1]
+            shdr.sh_type = sh_type
+            shdr.sh_flags = flags
+            shdr.sh_offset = offsets[name]
+            shdr.sh_size = sizes[name]
+            shdr.sh_link, shdr.sh_info = links.get(name, (0, 0))
+            shdr.sh_addralign = alignment
+            shdr.sh_entsize = entsize
+
+        del header, shdrs
+        view.release()
+        return buf
+
+    def write(self, filename):
+        data = self.build()
+        with open(filename, 'wb') as file:
+            file.write(data)
+        return filename
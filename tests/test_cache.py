@@ -0,0 +1,100 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from cache import CachedElf, ElfCache
+from elf import ElfFile
+from elfgen import write
+from scan import summarize
+from symtab import read_symtab
+
+
+def summary(cached: CachedElf) -> dict:
+    return {
+        'meta': {key: value for key, value in cached.meta.items() if key not in ('tables', 'blobs')},
+        'sections': cached.section_names,
+        'symtab': cached.symbol_names('symtab'),
+        'needed': cached.needed,
+        'tables': {
+            name: {column: view.tolist() for column, view in table.items()}
+            for name, table in cached.tables.items()
+        },
+    }
+
+
+class CacheTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ElfCache(os.path.join(self.directory.name, 'cache'))
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        super().tearDown()
+
+    def check(self, **kwargs):
+        filename = write(os.path.join(self.directory.name, 'gen.so'), symbols=500, dynamics=5, **kwargs)
+        self.assertIsNone(self.cache.get(filename))
+        with self.cache.load(filename) as cached:
+            miss = summary(cached)
+        with self.cache.get(filename) as cached:
+            hit = summary(cached)
+        self.assertEqual(hit, miss)
+
+        # 与直接解析的结果相同
+        with ElfFile(filename) as elf:
+            elf.read_header()
+            elf.read_shdrs()
+            self.assertEqual(miss['sections'], [shdr.name for shdr in elf.shdrs])
+            self.assertEqual(miss['symtab'], read_symtab(elf).names)
+        self.assertEqual(miss['needed'], [f'libgenerated{index}.so' for index in range(4)])
+
+    def test_elf32(self):
+        self.check(bits=32)
+
+    def test_elf64_big(self):
+        self.check(bits=64, byteorder='big')
+
+    def test_truncated(self):
+        filename = write(os.path.join(self.directory.name, 'gen.so'))
+        self.cache.load(filename).close()
+        path = self.cache.get_path(self.cache.get_key(filename))
+        with open(path, 'r+b') as file:
+            file.truncate(os.path.getsize(path) // 2)
+        self.assertIsNone(self.cache.get(filename))
+        with self.cache.load(filename) as cached:
+            self.assertEqual(len(cached.symbol_names()), 1025)
+
+    def test_evicted(self):
+        # 检查键之后、更新修改时间之前被其它进程删除，当作没有命中
+        filename = write(os.path.join(self.directory.name, 'gen.so'))
+        self.cache.load(filename).close()
+        with mock.patch('os.utime', side_effect=FileNotFoundError):
+            self.assertIsNone(self.cache.get(filename))
+
+    def test_scan_reuses_cache(self):
+        # 同一个进程共用一个 ElfCache，冷启动时只扫描一次缓存目录
+        directory = os.path.join(self.directory.name, 'scan')
+        filenames = [write(os.path.join(self.directory.name, f'gen{index}.so'), symbols=10) for index in range(5)]
+        with mock.patch.object(ElfCache, 'scan', autospec=True, side_effect=ElfCache.scan) as scan:
+            summaries = [summarize(filename, directory) for filename in filenames]
+        self.assertEqual(scan.call_count, 1)
+        self.assertEqual([summary['path'] for summary in summaries], filenames)
+        self.assertTrue(all(summary['symbols'] == 11 for summary in summaries))
+
+
+if __name__ == '__main__':
+    unittest.main()
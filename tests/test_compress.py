@@ -0,0 +1,116 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from compress import DecompressCache, get_compression
+from elf import ElfFile
+
+SOURCE = ''.join(f'int function_{index}(int x) {{ int y = x * {index}; return y + {index}; }}\n'
+                 for index in range(100))
+
+
+def debug_contents(filename) -> dict:
+    with ElfFile(filename) as elf:
+        elf.read_header()
+        elf.read_shdrs()
+        return {
+            shdr.name: bytes(shdr.contents)
+            for shdr in elf.shdrs if shdr.name.startswith(('.debug', '.zdebug'))
+        }
+
+
+class CompressTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        super().tearDown()
+
+    def build(self, *compressions) -> list:
+        if shutil.which('gcc') is None or shutil.which('objcopy') is None:
+            self.skipTest('gcc or objcopy not found')
+        directory = self.directory.name
+        source = os.path.join(directory, 'test.c')
+        with open(source, 'w') as file:
+            file.write(SOURCE)
+        filename = os.path.join(directory, 'test.o')
+        result = subprocess.run(['gcc', '-g', '-c', source, '-o', filename], capture_output=True)
+        if result.returncode:
+            self.skipTest(f'gcc failed: {result.stderr.decode(errors="replace")}')
+
+        filenames = [filename]
+        for compression in compressions:
+            output = os.path.join(directory, f'test-{compression}.o')
+            result = subprocess.run(
+                ['objcopy', f'--compress-debug-sections={compression}', filename, output], capture_output=True)
+            if result.returncode:
+                self.skipTest(f'objcopy failed: {result.stderr.decode(errors="replace")}')
+            filenames.append(output)
+        return filenames
+
+    def test_contents(self):
+        # SHF_COMPRESSED 和 .zdebug 的节解压后与未压缩的节相同
+        original, gabi, gnu = self.build('zlib-gabi', 'zlib-gnu')
+        expected = debug_contents(original)
+        self.assertIn('.debug_info', expected)
+        self.assertEqual(debug_contents(gabi), expected)
+        self.assertEqual(
+            {name.replace('.zdebug', '.debug', 1): data for name, data in debug_contents(gnu).items()},
+            expected)
+
+    def test_lazy(self):
+        original, gabi = self.build('zlib-gabi')
+        with ElfFile(original) as elf:
+            elf.read_header()
+            elf.read_shdrs()
+            expected = bytes(next(shdr for shdr in elf.shdrs if shdr.name == '.debug_info').data)
+
+        with ElfFile(gabi) as elf:
+            elf.read_header()
+            elf.read_shdrs()
+            section = next(shdr for shdr in elf.shdrs if shdr.name == '.debug_info')
+            self.assertIsNotNone(get_compression(section))
+            self.assertIsNone(elf.decompressed)
+
+            # 流式解压不进入缓存
+            chunks = list(section.iter_contents(64))
+            self.assertEqual(b''.join(chunks), expected)
+            self.assertTrue(all(len(chunk) <= 64 for chunk in chunks))
+            self.assertIsNone(elf.decompressed)
+
+            self.assertEqual(bytes(section.contents), expected)
+            self.assertEqual(len(elf.decompressed), 1)
+            self.assertIs(section.contents.obj, section.contents.obj)
+
+    def test_cache_limit(self):
+        cache = DecompressCache(10)
+        cache.put(1, b'aaaa')
+        cache.put(2, b'bbbb')
+        cache.get(1)
+        cache.put(3, b'cccc')
+        # 最久未使用的 2 被丢弃，超过限制的结果不缓存
+        self.assertEqual(list(cache.items), [1, 3])
+        self.assertEqual(cache.size, 8)
+        cache.put(4, b'd' * 11)
+        self.assertIsNone(cache.get(4))
+        self.assertEqual(cache.size, 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from deps import DependencyGraph
+
+
+class DependencyGraphTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        super().tearDown()
+
+    def graph(self, edges: dict) -> DependencyGraph:
+        # 直接给出依赖边，不需要真实的库文件
+        graph = DependencyGraph([], [])
+        for name, needed in edges.items():
+            graph.edges[self.path(name)] = [(dep, self.path(dep)) for dep in needed]
+        return graph
+
+    def path(self, name) -> str:
+        return os.path.realpath(os.path.join(self.directory.name, name))
+
+    def test_self_edge(self):
+        graph = self.graph({'a': ['a', 'b'], 'b': ['b']})
+        self.assertEqual(graph.closure(self.path('a')), {self.path('b')})
+        self.assertEqual(graph.closure(self.path('b')), set())
+
+    def test_cycle(self):
+        graph = self.graph({'a': ['b'], 'b': ['c'], 'c': ['b', 'd'], 'd': []})
+        self.assertEqual(graph.closure(self.path('a')), {self.path(name) for name in 'bcd'})
+        self.assertEqual(graph.closure(self.path('b')), {self.path(name) for name in 'cd'})
+        self.assertEqual(graph.closure(self.path('c')), {self.path(name) for name in 'bd'})
+        self.assertEqual(graph.closure(self.path('d')), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import logger
+from dump import TABLES, Dumper
+from elf import ElfFile
+from elfgen import write
+
+
+class CountingWriter(io.StringIO):
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+class Lazy(object):
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return 'lazy'
+
+
+class DumpTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        super().tearDown()
+
+    def test_text(self):
+        filename = write(os.path.join(self.directory.name, 'gen.so'), bits=64, symbols=100, relocations=50, dynamics=3)
+        file = CountingWriter()
+        with ElfFile(filename) as elf:
+            Dumper(elf, file).dump()
+        # 每张表只写一次
+        self.assertEqual(file.writes, len(TABLES))
+
+        text = file.getvalue()
+        self.assertIn('  Class:                             ELFCLASS64\n', text)
+        self.assertIn("Symbol table '.symtab' contains 101 entries:\n", text)
+        self.assertIn("Relocation section '.rela.text.0' at offset ", text)
+        self.assertIn('Shared library: [libgenerated1.so]', text)
+        self.assertIn(' generated_symbol_99\n', text)
+
+    def test_json(self):
+        filename = write(os.path.join(self.directory.name, 'gen.so'), bits=32, byteorder='big',
+                         symbols=100, relocations=50, dynamics=3)
+        file = io.StringIO()
+        with ElfFile(filename) as elf:
+            elf.read_header()
+            elf.read_shdrs()
+            names = [shdr.name for shdr in elf.shdrs]
+            Dumper(elf, file).dump_json()
+        result = json.loads(file.getvalue())
+
+        self.assertEqual(list(result), list(TABLES))
+        self.assertEqual(result['header']['Data'], 'ELFDATA2MSB')
+        self.assertEqual([section['name'] for section in result['sections']], names)
+        symbols = result['symbols']['.symtab']
+        self.assertEqual(len(symbols), 101)
+        self.assertEqual(symbols[100]['name'], 'generated_symbol_99')
+        self.assertEqual((symbols[100]['bind'], symbols[100]['type']), ('GLOBAL', 'FUNC'))
+        self.assertEqual(len(result['relocations']['.rel.text.0']), 50)
+        self.assertEqual([dyn['string'] for dyn in result['dynamic'] if dyn['type'] == 'NEEDED'],
+                         ['libgenerated0.so', 'libgenerated1.so'])
+
+    def test_logger(self):
+        # 导入时不配置根 logger，级别不够的消息不做格式化
+        self.assertFalse(any(handler.stream is sys.stdout for handler in logging.getLogger().handlers
+                             if isinstance(handler, logging.StreamHandler)))
+        log = logger.logger
+        saved = log.handlers[:], log.level, log.propagate
+        stream = io.StringIO()
+        lazy = Lazy()
+        logger.setup('warning', stream)
+        try:
+            log.debug('%s', lazy)
+            self.assertEqual(lazy.formatted, 0)
+            logger.setup('debug', stream)
+            log.debug('%s', lazy)
+            self.assertEqual(lazy.formatted, 1)
+            self.assertTrue(stream.getvalue().rstrip().endswith('lazy'))
+        finally:
+            log.handlers[:], log.level, log.propagate = saved
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from dump import Dumper, format_struct
+from elf import ElfFile, BaseStructure, Elf32_Ehdr, Elf32_Shdr
+from logger import logger, setup
+from stats import ElfStats
+
+
+class ElfTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        # 测试时默认输出 INFO，可以通过环境变量 LOG_LEVEL 修改
+        setup(os.environ.get('LOG_LEVEL', 'INFO'))
+
+    def setUp(self) -> None:
+        super().setUp()
+        dirname = os.path.dirname(__file__)
+        # filename = os.path.join(dirname, "../build/test.o")
+        # filename = os.path.join(dirname, "../build/test")
+        filename = os.path.join(dirname, "../build/test.so")
+        # 可以通过环境变量指定其它文件，例如 64 位或大端的 ELF
+        filename = os.environ.get('ELF_FILE', filename)
+        if not os.path.exists(filename):
+            self.skipTest(f'{filename} not found, run make build/test.so first')
+        # ELF_STATS=1 时在结束后输出各阶段的统计
+        stats = ElfStats() if os.environ.get('ELF_STATS') else None
+        self.elf = ElfFile(filename, stats)
+
+    def tearDown(self) -> None:
+        if self.elf.stats is not None:
+            logger.info("stats %s", self.elf.stats.summary())
+        self.elf.close()
+        super().tearDown()
+
+    def dumper(self):
+        return Dumper(self.elf)
+
+    def print_header(self):
+        self.dumper().header()
+
+    def print_shdrs(self):
+        self.dumper().sections()
+
+    def print_struct(self, instance: BaseStructure):
+        logger.debug("%s", format_struct(instance))
+
+    def print_symbols(self):
+        self.dumper().symbols()
+
+    def print_rel(self):
+        self.dumper().relocations()
+
+    def print_phdrs(self):
+        self.dumper().segments()
+
+    def print_dyns(self):
+        self.dumper().dynamic()
+
+    def test(self):
+        elf = self.elf
+
+        elf.read_header()
+        # self.print_header()
+
+        elf.read_shdrs()
+        # self.print_shdrs()
+
+        elf.read_symbols()
+        # self.print_symbols()
+
+        elf.read_rel()
+        self.print_rel()
+
+        elf.read_phdrs()
+        # self.print_phdrs()
+
+        elf.read_dyns()
+        # self.print_dyns()
+
+        elf.read_got()
+
+
+class ConstantTestCase(unittest.TestCase):
+
+    def test_mixed_case(self):
+        SHT = Elf32_Shdr.SHT
+        self.assertEqual(SHT.get_name(0x6ffffffd), 'SHT_GNU_verdef')
+        self.assertEqual(SHT.get_name(0x6ffffffe), 'SHT_GNU_verneed')
+        # 同一个值以最先定义的名字为准，其它名字在 ALIASES 中
+        self.assertEqual(SHT.get_name(0x6fffffff), 'SHT_GNU_versym')
+        self.assertIn('SHT_HISUNW', SHT.ALIASES[0x6fffffff])
+        self.assertIn('SHT_SUNW_move', SHT.ALIASES[0x6ffffffa])
+
+    def test_helpers(self):
+        # Constant 自身的属性和 __module__ 等不是常量
+        SHT = Elf32_Shdr.SHT
+        self.assertEqual(SHT.get_name(SHT.DENSE_LIMIT), 'undefined')
+        self.assertEqual(SHT.get_name(SHT.__module__), 'undefined')
+        self.assertEqual(Elf32_Ehdr.ET.get_name(2), 'ET_EXEC')
+        self.assertEqual(Elf32_Shdr.SHF.get_flags(6), ('SHF_ALLOC', 'SHF_EXECINSTR'))
+
+
+if __name__ == '__main__':
+    unittest.main()
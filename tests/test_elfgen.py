@@ -0,0 +1,81 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import bench
+from elf import ElfFile
+from elfgen import generate_corpus
+from reloc import read_reltabs
+from symtab import read_symtab
+
+
+class ElfgenTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        super().tearDown()
+
+    def test_corpus(self):
+        for byteorder in ('little', 'big'):
+            filenames = generate_corpus(self.directory.name, (100, 1000), (32, 64), byteorder)
+            self.assertEqual(len(filenames), 4)
+            for filename, (bits, size) in zip(filenames, [(32, 100), (32, 1000), (64, 100), (64, 1000)]):
+                with self.subTest(filename=os.path.basename(filename)):
+                    self.check(filename, bits, byteorder, size)
+
+    def check(self, filename, bits, byteorder, size):
+        with ElfFile(filename) as elf:
+            elf.read_header()
+            elf.read_shdrs()
+            elf.read_phdrs()
+            elf.read_dyns()
+            self.assertEqual((elf.layout.bits, elf.layout.byteorder), (bits, byteorder))
+            names = [shdr.name for shdr in elf.shdrs]
+            self.assertEqual(sum(name.startswith('.text.') for name in names), max(size // 100, 1))
+            self.assertEqual(len(read_symtab(elf)), size + 1)
+            reltab, = read_reltabs(elf)
+            self.assertEqual(len(reltab), size)
+            self.assertEqual(reltab.rela, bits == 64)
+            self.assertEqual(elf.dyns.needed, [f'libgenerated{index}.so' for index in range(size // 100)])
+
+        # 生成的文件对 readelf 也是合法的
+        if shutil.which('readelf') is not None:
+            result = subprocess.run(['readelf', '-a', '-W', filename], capture_output=True)
+            self.assertEqual(result.returncode, 0)
+            self.assertEqual(result.stderr, b'')
+
+    def test_bench(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            bench.main(['--sizes', '100', '--classes', '32,64', '-n', '1', '--json'])
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        stages = [name for name, _, _ in bench.STAGES]
+        self.assertEqual([result['stage'] for result in results], stages * 2)
+        self.assertEqual({result['file'] for result in results}, {'gen32-little-100.so', 'gen64-little-100.so'})
+        for result in results:
+            self.assertGreaterEqual(result['time'], 0)
+            self.assertGreater(result['peak'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from got import JMP_ABSOLUTE, JMP_EBX, PltIndex
+
+
+class DecodeJumpTestCase(unittest.TestCase):
+
+    def test_absolute(self):
+        # 跳转位于项的最后 6 个字节
+        data = b'\x90' * 10 + JMP_ABSOLUTE + (0x804a00c).to_bytes(4, 'little')
+        self.assertEqual(PltIndex.decode_jump(data, 0, len(data), 0x8049000, 0, False), 0x804a00c)
+        # 跳转越过项的结尾时不解码
+        self.assertIsNone(PltIndex.decode_jump(data, 0, len(data) - 1, 0x8049000, 0, False))
+
+    def test_rip_relative(self):
+        data = b'\xf3\x0f\x1e\xfa' + b'\x90' * 6 + JMP_ABSOLUTE + (0x2fe2).to_bytes(4, 'little', signed=True)
+        self.assertEqual(PltIndex.decode_jump(data, 0, 16, 0x1020, 0, True), 0x1020 + 16 + 0x2fe2)
+
+    def test_ebx(self):
+        data = b'\x90' * 2 + JMP_EBX + (-4).to_bytes(4, 'little', signed=True)
+        self.assertEqual(PltIndex.decode_jump(data, 0, 8, 0, 0x4000, False), 0x3ffc)
+        self.assertIsNone(PltIndex.decode_jump(data, 0, 8, 0, 0x4000, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from lexer import Lexer, Token, keyword_table, tokenize
+
+
+def kinds_and_texts(data: bytes, **kwargs) -> list:
+    return [(kind, data[start:end].decode()) for kind, start, end, _ in tokenize(data, **kwargs)]
+
+
+class LexerTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        super().tearDown()
+
+    def test_kinds(self):
+        data = (
+            b'static int x_1 = 0x1fUL + 07 + 1.5e-3f + 0x1.p3 + .5 + 1e;\n'
+            b"char c = L'\\'', *s = u8\"a\\\"b\" /* comment */ \"c\"; // tail\n"
+            b'a <<= b ... %:%: ->x @ \\\n\xe4\xb8\xad'
+        )
+        self.assertEqual(kinds_and_texts(data), [
+            (Token.KEYWORD, 'static'), (Token.KEYWORD, 'int'), (Token.IDENTIFIER, 'x_1'),
+            (Token.PUNCTUATOR, '='), (Token.INTEGER, '0x1fUL'), (Token.PUNCTUATOR, '+'),
+            (Token.INTEGER, '07'), (Token.PUNCTUATOR, '+'), (Token.FLOAT, '1.5e-3f'),
+            (Token.PUNCTUATOR, '+'), (Token.FLOAT, '0x1.p3'), (Token.PUNCTUATOR, '+'),
+            (Token.FLOAT, '.5'), (Token.PUNCTUATOR, '+'), (Token.OTHER, '1e'), (Token.PUNCTUATOR, ';'),
+            (Token.KEYWORD, 'char'), (Token.IDENTIFIER, 'c'), (Token.PUNCTUATOR, '='),
+            (Token.CHAR, "L'\\''"), (Token.PUNCTUATOR, ','), (Token.PUNCTUATOR, '*'),
+            (Token.IDENTIFIER, 's'), (Token.PUNCTUATOR, '='), (Token.STRING, 'u8"a\\"b"'),
+            (Token.STRING, '"c"'), (Token.PUNCTUATOR, ';'),
+            (Token.IDENTIFIER, 'a'), (Token.PUNCTUATOR, '<<='), (Token.IDENTIFIER, 'b'),
+            (Token.PUNCTUATOR, '...'), (Token.PUNCTUATOR, '%:%:'), (Token.PUNCTUATOR, '->'),
+            (Token.IDENTIFIER, 'x'), (Token.OTHER, '@'), (Token.OTHER, '中'),
+        ])
+
+    def test_newlines(self):
+        data = b'a\nb /* x\ny */ c\n'
+        self.assertEqual([kind for kind, _ in kinds_and_texts(data)], [Token.IDENTIFIER] * 3)
+        self.assertEqual([text for _, text in kinds_and_texts(data, newlines=True)], ['a', '\n', 'b', 'c', '\n'])
+
+    def test_interned(self):
+        # 共用名字表的两段输入中，同一个名字是同一个字符串对象
+        names = keyword_table()
+        first = [token[3] for token in tokenize(b'value + int', names)]
+        second = [token[3] for token in tokenize(b'int  value', names)]
+        self.assertIs(first[0], second[1])
+        self.assertIs(first[2], second[0])
+        self.assertEqual(first[1], '+')
+        self.assertIsNone(next(tokenize(b'1'))[3])
+
+    def test_file(self):
+        filename = os.path.join(self.directory.name, 'test.c')
+        with open(filename, 'wb') as file:
+            file.write(b'int main(void)\n{\n    return "ok"[0];\n}\n')
+        with Lexer(filename) as lexer:
+            tokens = list(lexer)
+            self.assertEqual([lexer.text(token) for token in tokens],
+                             ['int', 'main', '(', 'void', ')', '{', 'return', '"ok"', '[', '0', ']', ';', '}'])
+            self.assertEqual(lexer.position(tokens[6][1]), (3, 5))
+            self.assertEqual(lexer.position(tokens[-1][1]), (4, 1))
+
+        empty = os.path.join(self.directory.name, 'empty.c')
+        open(empty, 'wb').close()
+        with Lexer(empty) as lexer:
+            self.assertEqual(list(lexer), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from linker import Linker
+from test_writer import build_test_object
+
+
+class LinkerTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        if shutil.which('ld') is None:
+            self.skipTest('ld not found')
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        super().tearDown()
+
+    def test_same_as_ld(self):
+        directory = self.directory.name
+        filename = build_test_object(os.path.join(directory, 'test.o'))
+        expected = os.path.join(directory, 'ld.out')
+        result = subprocess.run(
+            ['ld', '-m', 'elf_i386', '-static', '-e', 'main', filename, '-o', expected],
+            capture_output=True)
+        if result.returncode:
+            self.skipTest(f'ld -m elf_i386 failed: {result.stderr.decode(errors="replace")}')
+
+        with Linker('main') as linker:
+            linker.add(filename)
+            data = linker.link()
+        with open(expected, 'rb') as file:
+            self.assertEqual(bytes(data), file.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from lexer import Token, tokenize
+from preprocessor import PreprocessError, Preprocessor, format_tokens
+
+
+class PreprocessorTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        super().tearDown()
+
+    def tokens(self, source, **kwargs) -> list:
+        # 不使用系统头文件，结果不依赖于机器
+        filename = os.path.join(self.directory.name, 'test.c')
+        with open(filename, 'w') as file:
+            file.write(source)
+        kwargs.setdefault('system', [])
+        return list(Preprocessor(**kwargs).preprocess(filename))
+
+    def preprocess(self, source, **kwargs) -> list:
+        return list(format_tokens(self.tokens(source, **kwargs)))
+
+    def test_rescan(self):
+        # C11 6.10.3.5 的例子
+        tokens = self.tokens(
+            '#define x 3\n'
+            '#define f(a) f(x * (a))\n'
+            '#undef x\n'
+            '#define x 2\n'
+            '#define g f\n'
+            '#define z z[0]\n'
+            '#define h g(~\n'
+            '#define m(a) a(w)\n'
+            '#define w 0,1\n'
+            '#define t(a) a\n'
+            'f(y+1) + f(f(z)) % t(t(g)(0) + t)(1);\n'
+            'g(x+(3,4)-w) | h 5) & m\n'
+            '(f)^m(m);\n'
+        )
+        expected = (
+            b'f(2 * (y+1)) + f(2 * (f(2 * (z[0])))) % f(2 * (0)) + t(1);\n'
+            b'f(2 * (2+(3,4)-0,1)) | f(2 * (~ 5)) & f(2 * (0,1))^m(0,1);\n'
+        )
+        self.assertEqual(
+            [(kind, text) for kind, text, _, _ in tokens],
+            [(kind, expected[start:end].decode()) for kind, start, end, _ in tokenize(expected)])
+        # 不再展开的宏名带有隐藏集
+        self.assertIn('f', tokens[0][3])
+        self.assertEqual(tokens[0][0], Token.IDENTIFIER)
+
+    def test_redefine(self):
+        source = (
+            '#define f(a) (a)\n'
+            '#define Y 1\n'
+            'f(X) f(Y)\n'
+            '#define X 2\n'
+            '#define Z 3\n'
+            'f(X) f(Y)\n'
+            '#undef Y\n'
+            'f(X) f(Y)\n'
+        )
+        self.assertEqual(self.preprocess(source), ['(X) (1)', '(2) (1)', '(2) (Y)'])
+
+        # 重新定义一个宏只让用到它的替换结果失效
+        filename = os.path.join(self.directory.name, 'test.c')
+        preprocessor = Preprocessor(system=[])
+        with mock.patch.object(preprocessor, 'replace', wraps=preprocessor.replace) as replace:
+            list(preprocessor.preprocess(filename))
+        self.assertEqual(
+            [''.join(token[1] for token in call.args[1][0]) for call in replace.call_args_list],
+            ['X', 'Y', 'X', 'Y'])
+
+    def test_object_paste(self):
+        lines = self.preprocess(
+            '#define AB foo ## bar\n'
+            'int AB;\n'
+        )
+        self.assertEqual(lines, ['int foobar;'])
+
+    def test_hash_hash(self):
+        # C11 6.10.3.3 的例子，## 连接出的 ## 不再是运算符
+        lines = self.preprocess(
+            '#define hash_hash # ## #\n'
+            '#define mkstr(a) # a\n'
+            '#define in_between(a) mkstr(a)\n'
+            '#define join(c, d) in_between(c hash_hash d)\n'
+            'char p[] = join(x, y);\n'
+        )
+        self.assertEqual(lines, ['char p[] = "x ## y";'])
+
+    def test_skipped_group(self):
+        # 跳过的部分不需要由合法的记号组成
+        lines = self.preprocess(
+            '#if 0\n'
+            "#error don't do this\n"
+            "it's @ `\n"
+            '#endif\n'
+            'int x;\n'
+        )
+        self.assertEqual(lines, ['int x;'])
+
+    def test_error(self):
+        with self.assertRaisesRegex(PreprocessError, "test.c:1: #error can't build here"):
+            self.preprocess("#error can't build here\n")
+
+    def test_other_tokens(self):
+        lines = self.preprocess(
+            '#define str(x) #x\n'
+            '#define CAT(a, b) a ## b\n'
+            'const char *s = str(: @\n);\n'
+            'double d = CAT(1, e) + .5;\n'
+        )
+        self.assertEqual(lines, ['const char *s = ": @";', 'double d = 1e + .5;'])
+
+    def test_expression(self):
+        # 按 intmax_t 和 uintmax_t 计算，有无符号数时两边都转换为无符号数
+        lines = self.preprocess(
+            '#if -1 > 0u\n'
+            'a\n'
+            '#endif\n'
+            '#if 0x7fffffffffffffff + 1 < 0 && 18446744073709551615 == -1\n'
+            'b\n'
+            '#endif\n'
+            '#if -7 / 2 == -3 && -7 % 3 == -1 && (1 ? -1 : 0u) > 0 && -1 >> 1 == -1\n'
+            'c\n'
+            '#endif\n'
+            '#if 1 << 64 && 1 / 0\n'
+            '#endif\n'
+        )
+        self.assertEqual(lines, ['a', 'b', 'c'])
+
+    def test_target(self):
+        source = 'int p = __SIZEOF_POINTER__;\n__SIZE_TYPE__ s;\n'
+        self.assertEqual(self.preprocess(source), ['int p = 4;', 'unsigned int s;'])
+        self.assertEqual(self.preprocess(source, target='x86_64'), ['int p = 8;', 'long unsigned int s;'])
+
+
+if __name__ == '__main__':
+    unittest.main()
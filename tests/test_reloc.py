@@ -0,0 +1,81 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from elf import ElfFile
+from elfgen import write
+from reloc import Relocation, join_reltabs, read_reltabs
+from symtab import read_symtab
+
+
+class RelocationTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        super().tearDown()
+
+    def test_join(self):
+        # 整表解码、连接的结果与逐项用结构体解码、查找符号的结果相同
+        for bits in (32, 64):
+            for byteorder in ('little', 'big'):
+                with self.subTest(bits=bits, byteorder=byteorder):
+                    filename = write(os.path.join(self.directory.name, f'gen{bits}{byteorder}.so'),
+                                     bits=bits, byteorder=byteorder, symbols=300, relocations=1000)
+                    self.check(filename)
+
+    def check(self, filename):
+        with ElfFile(filename) as elf:
+            elf.read_header()
+            elf.read_shdrs()
+            symtab = read_symtab(elf)
+            reltabs = read_reltabs(elf)
+            self.assertEqual(len(reltabs), 1)
+            reltab = reltabs[0]
+            shdr = reltab.shdr
+            self.assertEqual(elf.shdrs[reltab.target].name, '.text.0')
+            self.assertEqual(elf.shdrs[reltab.link].sh_offset, symtab.shdr.sh_offset)
+
+            cls = elf.layout.Rela if reltab.rela else elf.layout.Rel
+            data = bytes(shdr.data)
+            expected = []
+            for offset in range(0, len(data), shdr.sh_entsize):
+                rel = cls.from_buffer_copy(data, offset)
+                sym = elf.get_r_sym(rel.r_info)
+                expected.append(Relocation(
+                    rel.r_offset,
+                    elf.get_r_type(rel.r_info),
+                    sym,
+                    rel.r_addend if reltab.rela else None,
+                    symtab.get_name(sym),
+                    symtab.st_value[sym],
+                    symtab.st_shndx[sym],
+                ))
+            self.assertEqual(len(expected), 1000)
+
+            joined, = join_reltabs(elf, reltabs)
+            self.assertEqual(list(joined), expected)
+
+            # 没有符号表时只有重定位本身的各列
+            unlinked = list(reltab.join(None))
+            self.assertEqual([relocation[:4] for relocation in unlinked],
+                             [relocation[:4] for relocation in expected])
+            self.assertEqual({relocation[4:] for relocation in unlinked}, {(None, 0, 0)})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from elf import ElfFile, Elf32_Rel, Elf32_Shdr, Elf32_Sym
+from elfgen import write
+from resolver import GnuHashTable, SymbolResolver, SysvHashTable
+from writer import ObjectWriter
+
+SOURCE = ''.join(f'int function_{index}(void) {{ return {index}; }}\nint variable_{index} = {index};\n'
+                 for index in range(300))
+
+MISSES = ['', 'function_', 'function_300', 'variable_1000', 'printf', 'main']
+
+
+class ResolverTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        super().tearDown()
+
+    def build(self, style) -> str:
+        if shutil.which('gcc') is None:
+            self.skipTest('gcc not found')
+        source = os.path.join(self.directory.name, 'test.c')
+        with open(source, 'w') as file:
+            file.write(SOURCE)
+        filename = os.path.join(self.directory.name, f'lib{style}.so')
+        result = subprocess.run(
+            ['gcc', '-shared', '-fPIC', f'-Wl,--hash-style={style}', source, '-o', filename],
+            capture_output=True)
+        if result.returncode:
+            self.skipTest(f'gcc failed: {result.stderr.decode(errors="replace")}')
+        return filename
+
+    def check(self, filename, cls):
+        with ElfFile(filename) as elf:
+            elf.read_header()
+            elf.read_shdrs()
+            resolver = SymbolResolver(elf)
+            self.assertIsInstance(resolver.table, cls)
+
+            symtab = resolver.symtab
+            count = 0
+            for index, name in enumerate(symtab.names):
+                if not name or symtab.st_shndx[index] == Elf32_Shdr.SHN.SHN_UNDEF:
+                    continue
+                self.assertEqual(resolver.find(name), index, name)
+                count += 1
+            self.assertGreaterEqual(count, 600)
+            for name in MISSES:
+                self.assertEqual(resolver.find(name), -1, name)
+            self.assertEqual(resolver.lookup('variable_7').size, 4)
+
+    def test_sysv(self):
+        self.check(self.build('sysv'), SysvHashTable)
+
+    def test_gnu(self):
+        self.check(self.build('gnu'), GnuHashTable)
+
+    def test_index(self):
+        # 没有哈希节时在符号表上建立索引
+        filename = write(os.path.join(self.directory.name, 'gen.so'), symbols=100)
+        with ElfFile(filename) as elf:
+            elf.read_header()
+            elf.read_shdrs()
+            resolver = SymbolResolver(elf)
+            self.assertIsNone(resolver.table)
+            self.assertEqual(resolver.find('generated_symbol_42'), 43)
+            self.assertEqual(resolver.find('generated_symbol_100'), -1)
+
+    def test_index_undefined(self):
+        # 可重定位文件中的外部引用不能当作定义返回
+        writer = ObjectWriter('test.c')
+        writer.text += bytes(16)
+        writer.add_symbol('main', '.text', bind=Elf32_Sym.STB.STB_GLOBAL)
+        writer.add_relocation(4, 'puts', Elf32_Rel.R.R_386_PC32)
+        filename = writer.write(os.path.join(self.directory.name, 'test.o'))
+        with ElfFile(filename) as elf:
+            elf.read_header()
+            elf.read_shdrs()
+            resolver = SymbolResolver(elf)
+            self.assertIn('puts', resolver.symtab.names)
+            self.assertEqual(resolver.find('puts'), -1)
+            self.assertEqual(resolver.symtab.names[resolver.find('main')], 'main')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from elfgen import write
+from scan import main
+
+
+class ScanTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        root = self.directory.name
+        os.makedirs(os.path.join(root, 'lib', 'sub'))
+        self.files = [
+            write(os.path.join(root, 'lib', 'gen32.so'), bits=32, symbols=10, dynamics=3),
+            write(os.path.join(root, 'lib', 'sub', 'gen64.so'), bits=64, byteorder='big', symbols=20, dynamics=1),
+        ]
+        # 不是 ELF 的文件和符号链接都不输出
+        with open(os.path.join(root, 'lib', 'README'), 'w') as file:
+            file.write('not an elf file\n')
+        os.symlink(self.files[0], os.path.join(root, 'lib', 'link.so'))
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        super().tearDown()
+
+    def scan(self, *argv) -> dict:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main(list(argv))
+        summaries = [json.loads(line) for line in output.getvalue().splitlines()]
+        return {summary['path']: summary for summary in summaries}
+
+    def test_directory(self):
+        summaries = self.scan('-j', '1', os.path.join(self.directory.name, 'lib'))
+        self.assertEqual(sorted(summaries), sorted(self.files))
+
+        gen32 = summaries[self.files[0]]
+        self.assertEqual(gen32['class'], 32)
+        self.assertEqual(gen32['byteorder'], 'little')
+        self.assertEqual(gen32['type'], 'ET_DYN')
+        self.assertEqual(gen32['symbols'], 11)
+        self.assertEqual(gen32['needed'], ['libgenerated0.so', 'libgenerated1.so'])
+        self.assertIn('.symtab', gen32['sections'])
+
+        gen64 = summaries[self.files[1]]
+        self.assertEqual((gen64['class'], gen64['byteorder'], gen64['symbols']), (64, 'big', 21))
+        self.assertEqual(gen64['needed'], [])
+
+    def test_pool_and_list(self):
+        # 进程池、文件列表和缓存的输出都与单进程扫描相同
+        expected = self.scan('-j', '1', os.path.join(self.directory.name, 'lib'))
+        listing = os.path.join(self.directory.name, 'files.txt')
+        with open(listing, 'w') as file:
+            file.write('\n'.join(self.files) + '\n')
+        self.assertEqual(self.scan('-j', '2', '-l', listing), expected)
+        cache = os.path.join(self.directory.name, 'cache')
+        self.assertEqual(self.scan('-j', '2', '-c', cache, os.path.join(self.directory.name, 'lib')), expected)
+
+    def test_error(self):
+        filename = os.path.join(self.directory.name, 'broken.so')
+        with open(filename, 'wb') as file:
+            file.write(b'\x7fELF\x09')
+        summaries = self.scan('-j', '1', filename)
+        self.assertEqual(list(summaries), [filename])
+        self.assertIn('error', summaries[filename])
+
+
+if __name__ == '__main__':
+    unittest.main()
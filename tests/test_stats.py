@@ -0,0 +1,85 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import os
+import sys
+import tempfile
+import tracemalloc
+import unittest
+from ctypes import sizeof
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from elf import ElfFile, ElfIdent
+from elfgen import write
+from stats import ElfStats, stage
+from symtab import read_symtab
+
+
+@stage
+def read_names(elf: ElfFile):
+    return read_symtab(elf).names
+
+
+class StatsTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = write(os.path.join(self.directory.name, 'gen.so'), bits=64, symbols=200)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        super().tearDown()
+
+    def test_counters(self):
+        stats = ElfStats()
+        with ElfFile(self.filename, stats) as elf:
+            elf.read_header()
+            elf.read_shdrs()
+            names = read_names(elf)
+            header = elf.header
+
+        stages = stats.as_dict()
+        self.assertEqual(list(stages), ['header', 'shdrs', 'symtab', 'names', 'total'])
+        self.assertEqual(stages['header']['structs'], 2)
+        self.assertEqual(stages['header']['bytes'], sizeof(ElfIdent) + header.e_ehsize)
+        self.assertEqual(stages['shdrs']['structs'], header.e_shnum)
+        self.assertEqual(stages['shdrs']['bytes'], header.e_shnum * header.e_shentsize)
+        self.assertEqual(stages['symtab']['structs'], 201)
+        self.assertEqual(stages['names']['strings'], len(set(names)))
+
+        # 嵌套的 symtab 已经计入 names，总数中不重复计算
+        total = stages['total']
+        self.assertEqual(total['calls'], 3)
+        self.assertEqual(total['structs'], 2 + header.e_shnum + 201)
+        self.assertEqual(total['bytes'], sum(stages[name]['bytes'] for name in ('header', 'shdrs', 'names')))
+        self.assertTrue(stats.summary().startswith('header '))
+        self.assertIn('| total ', stats.summary())
+
+    def test_memory(self):
+        stats = ElfStats(snapshots=True)
+        with ElfFile(self.filename, stats) as elf:
+            elf.read_header()
+            elf.read_shdrs()
+            read_names(elf)
+        self.assertGreater(stats.stages['names'].peak, 0)
+        self.assertEqual(set(stats.snapshots), {'header', 'shdrs', 'symtab', 'names'})
+        # 由统计启动的 tracemalloc 在最外层阶段结束后停止
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_disabled(self):
+        with ElfFile(self.filename) as elf:
+            self.assertIsNone(elf.stats)
+            elf.read_header()
+            elf.read_shdrs()
+            self.assertEqual(len(read_names(elf)), 201)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from elf import ElfFile
+from elfgen import write
+from reloc import join_reltabs
+from stream import StreamElfFile, iter_tar
+from symtab import read_symtab
+
+
+class Unseekable(io.RawIOBase):
+
+    '''
+    只能顺序读取的流，每次最多返回 size 个字节中的一部分
+    '''
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), len(self.data) - self.position, 4096)
+        buffer[:size] = self.data[self.position:self.position + size]
+        self.position += size
+        return size
+
+
+def summary(elf: ElfFile) -> dict:
+    elf.read_header()
+    elf.read_phdrs()
+    elf.read_shdrs()
+    elf.read_dyns()
+    symtab = read_symtab(elf)
+    return {
+        'sections': [shdr.name for shdr in elf.shdrs],
+        'symtab': symtab.names if symtab is not None else None,
+        'relocations': [list(relocations) for relocations in join_reltabs(elf)],
+        'needed': elf.dyns.needed if elf.dyns else None,
+    }
+
+
+class StreamTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        super().tearDown()
+
+    def check(self, filename) -> StreamElfFile:
+        with ElfFile(filename) as elf:
+            expected = summary(elf)
+        with open(filename, 'rb') as file:
+            elf = StreamElfFile(Unseekable(file.read()), filename)
+        self.addCleanup(elf.close)
+        self.assertEqual(summary(elf), expected)
+        return elf
+
+    def test_generated(self):
+        for bits in (32, 64):
+            filename = write(os.path.join(self.directory.name, f'gen{bits}.so'), bits=bits, dynamics=5)
+            self.assertEqual(self.check(filename).dyns.needed[:2], ['libgenerated0.so', 'libgenerated1.so'])
+
+    def test_shared(self):
+        if shutil.which('gcc') is None:
+            self.skipTest('gcc not found')
+        source = os.path.join(self.directory.name, 'test.c')
+        with open(source, 'w') as file:
+            file.write('int value = 1;\nint get(void) { return value; }\n')
+        filename = os.path.join(self.directory.name, 'libtest.so')
+        result = subprocess.run(['gcc', '-shared', '-fPIC', source, '-o', filename], capture_output=True)
+        if result.returncode:
+            self.skipTest(f'gcc failed: {result.stderr.decode(errors="replace")}')
+
+        elf = self.check(filename)
+        # 跳过的代码段不能访问，不会给出全 0 的内容
+        text = next(shdr for shdr in elf.shdrs if shdr.name == '.text')
+        if any(low <= text.sh_offset < high for low, high in elf.skips):
+            with self.assertRaisesRegex(ValueError, 'not buffered'):
+                text.data
+
+    def test_tar(self):
+        names = []
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w') as tar:
+            for bits in (32, 64):
+                filename = write(os.path.join(self.directory.name, f'gen{bits}.so'), bits=bits, symbols=100)
+                tar.add(filename, os.path.basename(filename))
+                names.append(os.path.basename(filename))
+        buffer.seek(0)
+        symbols = [(name, read_symtab(elf).names[-1]) for name, elf in iter_tar(Unseekable(buffer.getvalue()))]
+        self.assertEqual(symbols, [(name, 'generated_symbol_99') for name in names])
+
+    def test_tar_broken_member(self):
+        # 截断的成员跳过，后面的成员照常解析
+        filename = write(os.path.join(self.directory.name, 'gen.so'), symbols=100)
+        with open(filename, 'rb') as file:
+            data = file.read()
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w') as tar:
+            for name, content in (('truncated.so', data[:len(data) // 2]), ('header.so', data[:40]), ('gen.so', data)):
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                tar.addfile(info, io.BytesIO(content))
+        names = [name for name, _ in iter_tar(Unseekable(buffer.getvalue()))]
+        self.assertEqual(names, ['gen.so'])
+
+
+if __name__ == '__main__':
+    unittest.main()
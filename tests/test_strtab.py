@@ -0,0 +1,44 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from strtab import StringTable, StringTableBuilder, build_strtab
+
+
+class StringTableTestCase(unittest.TestCase):
+
+    def test_suffix(self):
+        data, offsets = build_strtab(['.text', '.rel.text', 'foobar', 'bar', 'foobar', 'r', ''])
+        # 后缀指向以它结尾的名字，重复的名字只保存一份
+        self.assertEqual(data, b'\0.rel.text\0foobar\0')
+        self.assertEqual(offsets, [5, 1, 11, 14, 11, 16, 0])
+
+    def test_round_trip(self):
+        names = [f'{prefix}{index}{suffix}' for index in range(200)
+                 for prefix in ('', '_', 'lib_') for suffix in ('', '_end')]
+        names += ['end', 'd', 'x', '']
+        data, offsets = build_strtab(names)
+        table = StringTable(data)
+        self.assertEqual([table.get(offset) for offset in offsets], names)
+        self.assertLess(len(data), sum(len(name) + 1 for name in set(names)))
+
+    def test_finalized(self):
+        builder = StringTableBuilder()
+        builder.add('main')
+        self.assertEqual(builder['main'], 1)
+        with self.assertRaises(ValueError):
+            builder.add('message')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from elf import ElfFile, Elf32_Sym
+from elfgen import write
+from symbolize import AddressIndex
+from symtab import read_symtab
+
+
+class AddressIndexTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        super().tearDown()
+
+    def test_generated(self):
+        # 一个 256 字节的节中依次排列 16 个 16 字节的符号
+        filename = write(os.path.join(self.directory.name, 'gen.so'), sections=1, symbols=16, section_size=256)
+        with ElfFile(filename) as elf:
+            elf.read_header()
+            elf.read_shdrs()
+            index = AddressIndex(elf)
+            text = next(shdr for shdr in elf.shdrs if shdr.name == '.text.0')
+            base = text.sh_addr
+
+            self.assertEqual(len(index), 16)
+            addresses = [base - 1, base, base + 15, base + 16, base + 255, base + 256]
+            expected = [
+                None,
+                ('generated_symbol_0', 0),
+                ('generated_symbol_0', 15),
+                ('generated_symbol_1', 0),
+                ('generated_symbol_15', 15),
+                None,
+            ]
+            self.assertEqual([index.lookup(address) for address in addresses], expected)
+            self.assertEqual(index.lookup_many(addresses), expected)
+
+    def test_shared(self):
+        if shutil.which('gcc') is None:
+            self.skipTest('gcc not found')
+        source = os.path.join(self.directory.name, 'test.c')
+        with open(source, 'w') as file:
+            file.write(''.join(f'int function_{number}(int x) {{ return x * {number} + 1; }}\n'
+                               for number in range(50)))
+        filename = os.path.join(self.directory.name, 'libtest.so')
+        result = subprocess.run(['gcc', '-shared', '-fPIC', source, '-o', filename], capture_output=True)
+        if result.returncode:
+            self.skipTest(f'gcc failed: {result.stderr.decode(errors="replace")}')
+
+        with ElfFile(filename) as elf:
+            elf.read_header()
+            elf.read_shdrs()
+            index = AddressIndex(elf)
+            symtab = read_symtab(elf)
+            functions = {
+                symtab.get_name(number): (symtab.st_value[number], symtab.st_size[number])
+                for number in range(len(symtab))
+                if symtab.type[number] == Elf32_Sym.STT.STT_FUNC and symtab.get_name(number).startswith('function_')
+            }
+            self.assertEqual(len(functions), 50)
+
+            addresses = []
+            expected = []
+            for name, (value, size) in sorted(functions.items()):
+                addresses.extend((value, value + size - 1))
+                expected.extend(((name, 0), (name, size - 1)))
+            self.assertEqual(index.lookup_many(addresses), expected)
+            self.assertEqual([index.lookup(address) for address in addresses], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from elf import ElfFile, Elf32_Sym
+from elfgen import write
+from symtab import Symbol, read_symtab
+from test_writer import build_test_object
+
+
+class SymbolTableTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        super().tearDown()
+
+    def test_columns(self):
+        # 整表解码的结果与逐项用结构体解码的结果相同
+        for bits in (32, 64):
+            for byteorder in ('little', 'big'):
+                with self.subTest(bits=bits, byteorder=byteorder):
+                    filename = write(os.path.join(self.directory.name, f'gen{bits}{byteorder}.so'),
+                                     bits=bits, byteorder=byteorder, symbols=500)
+                    symtab = self.check(filename)
+                    self.assertEqual(symtab.names[-1], 'generated_symbol_499')
+
+    def test_bind_type(self):
+        # 局部的文件符号、节符号和全局符号
+        symtab = self.check(build_test_object(os.path.join(self.directory.name, 'test.o')))
+        self.assertEqual(symtab.bind, bytes([
+            Elf32_Sym.STB.STB_LOCAL, Elf32_Sym.STB.STB_LOCAL, Elf32_Sym.STB.STB_LOCAL,
+            Elf32_Sym.STB.STB_LOCAL, Elf32_Sym.STB.STB_LOCAL, Elf32_Sym.STB.STB_GLOBAL,
+        ]))
+        self.assertEqual(symtab.type[1:4], bytes([
+            Elf32_Sym.STT.STT_FILE, Elf32_Sym.STT.STT_SECTION, Elf32_Sym.STT.STT_SECTION,
+        ]))
+
+    def check(self, filename):
+        with ElfFile(filename) as elf:
+            elf.read_header()
+            elf.read_shdrs()
+            symtab = read_symtab(elf)
+            shdr = symtab.shdr
+            data = bytes(shdr.data)
+            strtab = elf.get_strtab(elf.shdrs[shdr.sh_link])
+            self.assertEqual(len(symtab), len(data) // shdr.sh_entsize)
+
+            expected = []
+            for offset in range(0, len(data), shdr.sh_entsize):
+                sym = elf.layout.Sym.from_buffer_copy(data, offset)
+                expected.append(Symbol(
+                    strtab.get(sym.st_name),
+                    sym.st_value,
+                    sym.st_size,
+                    elf.get_st_bind(sym.st_info),
+                    elf.get_st_type(sym.st_info),
+                    sym.st_other,
+                    sym.st_shndx,
+                ))
+            self.assertEqual(list(symtab), expected)
+            self.assertEqual(symtab.names, [symbol.name for symbol in expected])
+            return symtab
+
+
+if __name__ == '__main__':
+    unittest.main()
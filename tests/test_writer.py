@@ -0,0 +1,82 @@
+'''
+(C) Copyright 2021 Steven;
+@author: Steven kangweibaby@163.com
+@date: 2021-07-13
+'''
+
+# coding=utf-8
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from elf import ElfFile, Elf32_Ehdr, Elf32_Rel, Elf32_Sym
+from reloc import join_reltabs
+from symtab import read_symtab
+from writer import ObjectWriter
+
+# tests/test.asm 汇编后的 .text，偏移 11 处为 message 的地址
+TEXT = bytes.fromhex(
+    'b804000000' 'bb01000000' 'b900000000' 'ba11000000' 'cd80'
+    'b801000000' 'bb00000000' 'cd80'
+)
+DATA = b'hello world!!!\n\r\0'
+
+
+def build_test_object(filename):
+    writer = ObjectWriter('test.asm')
+    writer.text += TEXT
+    writer.data += DATA
+    writer.add_symbol('main', '.text', bind=Elf32_Sym.STB.STB_GLOBAL)
+    writer.add_symbol('message', '.data')
+    writer.add_relocation(11, 'message')
+    return writer.write(filename)
+
+
+class WriterTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        super().tearDown()
+
+    def test_round_trip(self):
+        filename = build_test_object(os.path.join(self.directory.name, 'test.o'))
+        with ElfFile(filename) as elf:
+            elf.read_header()
+            elf.read_shdrs()
+            self.assertEqual(elf.header.e_type, Elf32_Ehdr.ET.ET_REL)
+            self.assertEqual(elf.header.e_machine, Elf32_Ehdr.EM.EM_386)
+
+            shdrs = {shdr.name: shdr for shdr in elf.shdrs}
+            self.assertEqual(
+                [shdr.name for shdr in elf.shdrs],
+                ['', '.text', '.data', '.shstrtab', '.symtab', '.strtab', '.rel.text'])
+            self.assertEqual(bytes(shdrs['.text'].data), TEXT)
+            self.assertEqual(bytes(shdrs['.data'].data), DATA)
+
+            symtab = read_symtab(elf)
+            self.assertEqual(symtab.names, ['', 'test.asm', '', '', 'message', 'main'])
+            main = symtab[5]
+            self.assertEqual(main.bind, Elf32_Sym.STB.STB_GLOBAL)
+            self.assertEqual(main.shndx, 1)
+            # 局部符号之后是第一个全局符号
+            self.assertEqual(shdrs['.symtab'].sh_info, 5)
+
+            relocations = join_reltabs(elf)
+            self.assertEqual(len(relocations), 1)
+            relocation = relocations[0][0]
+            self.assertEqual(relocation.offset, 11)
+            self.assertEqual(relocation.type, Elf32_Rel.R.R_386_32)
+            # message 是局部符号，引用改为 .data 的节符号
+            self.assertEqual(relocation.shndx, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()